@@ -1,4 +1,23 @@
+import os, re, json
+import time
+import hashlib
+import logging
+import threading
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Union
+
+import numpy as np
+import pandas as pd
 import requests
+from urllib3.util.retry import Retry
+
+import schema
+import sampling
+import instrumentation
+
+log = logging.getLogger('Client')
 
 __version__ = 'v1.0.0'
 __author__ = 'Benjamin Thomas Schwertfeger'
@@ -9,9 +28,15 @@ __status__ = 'Production'
 
 class Client(object):
     '''
-        Stores the API Key and can be used to query data from the mySQL Database by sending 
+        Stores the API Key and can be used to query data from the mySQL Database by sending
         requests to the Express-Web-Application of the Pepper Project.
 
+        All requests share one pooled keep-alive session, so only the first request pays
+        for the TCP/TLS handshake. Requests that could not connect or were answered with 5xx
+        are retried with exponential backoff. A request that timed out while waiting for the
+        response is not sent again (unless {retry_reads}): the backend may still be running
+        its sql query, a retry would start the same query a second time.
+
         ------ P A R A M E T E R S ------
         :param API_KEY: str | required
             The key to access the restricted api endpoints
@@ -19,6 +44,38 @@ class Client(object):
         :param sandbox: bool | optional
             Use localhost webapp or the production Mandatory
 
+        :param verbose: int | optional
+            0 prints the result of the connection test on creation
+
+        :param url: str | optional
+            Overwrites the base url (e.g. a local stand-in of the web app)
+
+        :param pool_size: int | optional
+            Number of keep-alive connections kept open to the web app
+
+        :param max_retries: int | optional
+            How often a failed request is retried before raising
+
+        :param backoff_factor: float | optional
+            Sleep {backoff_factor} * 2 ** ({retry} - 1) seconds between retries
+
+        :param retry_reads: bool | optional
+            Also retry requests whose response timed out or broke off | default: False
+
+        :param cache: QueryCache | optional
+            Serves repeated sql queries from a result cache instead of the backend
+
+        :param wire_format: str | optional
+            Response format query_frame asks for: 'json', 'columns', 'ndjson', 'arrow' or
+            'auto' (every format this client can decode, most compact first). Servers
+            that do not know a format answer with plain json, which is always accepted.
+            Responses are gzip/deflate compressed if the server supports it.
+
+        :param hooks: list | optional
+            Callables that receive a record with timings (connect, ttfb, download,
+            decode, total in seconds), request/response bytes and row count of every request
+            (see instrumentation.Metrics)
+
         ------ E X A M P L E ------
 
         > client = Client(API_KEY='n6C?q*QuDA', sandbox=True)
@@ -30,6 +87,23 @@ class Client(object):
             'ts': '2022-01-11T12:34:50.000Z'
         }]
 
+        > client.query_frame('select * from pepper_emotion_table').dtypes
+        data_id                      int64
+        identifier                  object
+        distance                   float32
+        age                          int64
+        gender                    category
+        ...
+        dialog_time                float32
+        ts                  datetime64[ns]
+
+        > for chunk in client.iter_query('select * from pepper_emotion_table', chunk_rows=10000):
+        >     chunk.groupby('gender').dialog_time.sum()
+
+        > with Client(API_KEY='n6C?q*QuDA', sandbox=True, verbose=1) as client:
+        >     client.sql_query('select count(*) from pepper_emotion_table')
+        [{'count(*)': 1000}]
+
     '''
 
     VERSION = 'v0.0.1'
@@ -38,34 +112,206 @@ class Client(object):
     BASE_URL = 'https://informatik.hs-bremerhaven.de/docker-hbv-kms-http'
     SANDBOX_URL = 'http://localhost:3000/docker-hbv-kms-http'
 
+    USER_AGENT = 'hbv-kms-pepper-team'
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+    WIRE_FORMATS = {
+        'arrow': schema.ARROW,
+        'columns': schema.COLUMNS_JSON,
+        'ndjson': schema.NDJSON,
+        'json': schema.JSON
+    }
+
     timeout = 10
 
-    def __init__(self, API_KEY: str, sandbox: bool=False, verbose: int=0):
+    def __init__(
+        self, API_KEY: str, sandbox: bool=False, verbose: int=0, url: str=None,
+        pool_size: int=10, max_retries: int=3, backoff_factor: float=0.3, retry_reads: bool=False,
+        cache=None, wire_format: str='auto', hooks: list=None
+    ):
         self.API_KEY = API_KEY
-        if not sandbox:
+        self.cache = cache
+        self.hooks = list(hooks or [])
+        self.accept = self._accept_header(wire_format)
+        if url is not None:
+            self.url = url.rstrip('/')
+        elif not sandbox:
             self.url = self.BASE_URL
         else:
             self.url = self.SANDBOX_URL
 
+        self.session = self._create_session(pool_size, max_retries, backoff_factor, retry_reads)
+
         if verbose == 0:
             print(self.test_connection())
-        
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''Closes all pooled connections of the session.'''
+        self.session.close()
+
+    def add_hook(self, hook) -> None:
+        '''Registers {hook}, which is called with the record of every following request.'''
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook) -> None:
+        self.hooks.remove(hook)
+
+    def _create_session(self, pool_size: int, max_retries: int, backoff_factor: float, retry_reads: bool) -> requests.Session:
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries if retry_reads else False, # False raises the ReadTimeout at once
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUS_CODES,
+            allowed_methods=None, # the sql endpoint only runs SELECTs, so a rejected POST can be sent again
+            raise_on_status=False
+        )
+        adapter = instrumentation.TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': self.USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate', # decompressed transparently by requests
+            'Connection': 'keep-alive'
+        })
+        return session
+
+    def _accept_header(self, wire_format: str) -> str:
+        if wire_format == 'auto':
+            formats = [f for f in self.WIRE_FORMATS if f != 'arrow' or schema.pyarrow is not None]
+        elif wire_format in self.WIRE_FORMATS:
+            formats = [wire_format, 'json']
+        else:
+            raise ValueError(f'Unknown wire format {wire_format}, use one of: auto, {", ".join(self.WIRE_FORMATS)}')
+
+        content_types = list(OrderedDict.fromkeys(self.WIRE_FORMATS[f] for f in formats))
+        return ', '.join(
+            content_type if i == 0 else f'{content_type};q={1 - i / 10:.1f}'
+            for i, content_type in enumerate(content_types)
+        )
+
     def test_connection(self) -> dict:
         payload = { 'subject': 'test' }
         return self._request('POST', params=payload, uri='/api/v1/sql')
 
-    def sql_query(self, query: str) -> dict:
-        return self._send_sql_query(query)
+    def sql_query(self, query: str, ttl: float=None) -> dict:
+        '''Returns the result of {query}, from the cache if one is set and holds a valid entry.
+
+            ----- Keyword arguments -----
+            ttl: float | Time to live of the cached result in seconds | default: cache.ttl
+        '''
+        if self.cache is None:
+            return self._send_sql_query(query)
 
-    def _send_sql_query(self, query: str) -> dict:
+        key = self.cache.key(query, namespace=self.url)
+        rows = self.cache.get(key)
+        if rows is None:
+            rows = self._send_sql_query(query)
+            self.cache.put(key, rows, ttl=ttl)
+        return rows
+
+    def query_frame(self, query: str, table: str=None, use_cache: bool=True) -> pd.DataFrame:
+        '''Returns the result of {query} as DataFrame typed by the declared schema of {table}
+            (see schema.py), which is guessed from the query if not set.
+
+            Without a cache (or with {use_cache}=False) the response is requested in the most
+            compact wire format the server offers and decoded straight into columns, so no
+            dict is created per row.
+        '''
+        table = table or schema.table_of(query)
+        if self.cache is not None and use_cache:
+            return schema.frame_from_rows(self.sql_query(query), table)
+        return self._send_sql_query(
+            query, headers={ 'Accept': self.accept }, decoder=lambda response: self.decode_frame(response, table)
+        )
+
+    @staticmethod
+    def decode_frame(response_data, table: str=None) -> pd.DataFrame:
+        '''Decodes a response of the sql endpoint by its content type into a typed DataFrame.'''
+        content_type = response_data.headers.get('Content-Type', schema.JSON)
+        if content_type.startswith(schema.NDJSON):
+            return schema.decode_ndjson(response_data.iter_lines(chunk_size=64 * 1024), table)
+        return schema.decode(response_data.content, table, content_type=content_type)
+
+    def iter_query(self, query: str, chunk_rows: int=10000, key: str='data_id', after: int=None) -> Iterator[pd.DataFrame]:
+        '''Yields the result of {query} as typed DataFrames of at most {chunk_rows} rows.
+
+            Pages through the result by keyset pagination on {key}, so only one chunk is
+            held in memory at a time, no matter how large the table is. The key column
+            must be part of the selected columns. Since data_id is auto incremented, the
+            chunks also arrive in ts order. {after} skips all rows up to this key value.
+
+            ----- Example -----
+            > for chunk in client.iter_query('SELECT * FROM pepper_emotion_table', chunk_rows=5000):
+            >     ...
+        '''
+        table = schema.table_of(query)
+        last_key = after
+        while True:
+            # pages are never cached, a cached empty page past the last key would hide new rows
+            chunk = self.query_frame(self._page_query(query, chunk_rows, key, last_key), table=table, use_cache=False)
+            if chunk.empty:
+                return
+
+            last_key = chunk[key].iloc[-1]
+            yield chunk
+
+            if len(chunk) < chunk_rows:
+                return
+
+    def sample(self, table: str, n: int, by: str=None, **kwargs) -> pd.DataFrame:
+        '''Returns a random sample of about {n} rows of {table}, stratified by the column or
+            derived dimension (weekday, hour, day) {by}, with a transfer of about {n} rows
+            (key-range sampling on data_id, see sampling.sample for the keyword arguments).
+
+            ----- Example -----
+            > client.sample('pepper_emotion_table', 500, by='weekday', where='WHERE ts > NOW() - INTERVAL 30 day', seed=42)
+        '''
+        kwargs.setdefault('dialect', 'mysql') # the web app, a Client of another backend may pass its own
+        return sampling.sample(self, table, n, by=by, **kwargs)
+
+    def iter_rows(self, query: str, chunk_rows: int=10000, key: str='data_id', after: int=None) -> Iterator[list]:
+        '''Yields the rows of {query} page by page (like iter_query) as returned by the api,
+            starting after the key value {after}.
+        '''
+        last_key = after
+        while True:
+            rows = self._send_sql_query(self._page_query(query, chunk_rows, key, last_key)) # not cached, see iter_query
+            if not rows:
+                return
+
+            last_key = rows[-1][key]
+            yield rows
+
+            if len(rows) < chunk_rows:
+                return
+
+    @staticmethod
+    def _page_query(query: str, chunk_rows: int, key: str, last_key: int=None) -> str:
+        where = '' if last_key is None else f'WHERE page.{key} > {int(last_key)} '
+        return f'SELECT * FROM ({query.strip().rstrip(";")}) AS page {where}ORDER BY page.{key} LIMIT {int(chunk_rows)}'
+
+    def _send_sql_query(self, query: str, headers: dict=None, decoder=None) -> dict:
         payload = {
             'subject': 'sql_query',
             'query_str': f'{query};'
         }
-        return self._request('POST', params=payload, uri='/api/v1/sql')
+        return self._request('POST', params=payload, uri='/api/v1/sql', headers=headers, decoder=decoder)
 
-    def _request(self, method: str, params: dict={}, uri: str='', headers: dict={}) -> dict:
+    def _request(self, method: str, params: dict=None, uri: str='', headers: dict=None, decoder=None) -> dict:
         uri_path = uri
+        params = dict(params or {})
+        headers = dict(headers or {})
+
         data_json = ''
         if method in ['GET', 'DELETE']:
             if params:
@@ -77,26 +323,328 @@ class Client(object):
         else:
             if params:
                 params['auth_key'] = self.API_KEY
-                data_json = params 
-       
-        headers['User-Agent'] = 'hbv-kms-pepper-team'
+                data_json = params
+
         url = f'{self.url}{uri}'
+        record = { 'method': method, 'uri': uri_path, 'subject': params.get('subject') }
+        timings = instrumentation.start_request()
+        start = time.perf_counter()
 
-        if method in ['GET', 'DELETE']:
-            response_data = requests.request(method, url, headers=headers, timeout=self.timeout)
-        else:
-            response_data = requests.request(method, url, headers=headers, data=data_json, timeout=self.timeout)
+        response_data = None
+        try:
+            # headers arrive first, the body is read afterwards (or streamed by the decoder)
+            if method in ['GET', 'DELETE']:
+                response_data = self.session.request(method, url, headers=headers, timeout=self.timeout, stream=True)
+            else:
+                response_data = self.session.request(method, url, headers=headers, data=data_json, timeout=self.timeout, stream=True)
+            record['ttfb'] = time.perf_counter() - start
+
+            if not response_data.headers.get('Content-Type', '').startswith(schema.NDJSON):
+                response_data.content
+            received = time.perf_counter()
+            record['download'] = received - start - record['ttfb']
 
-        return self.check_response_data(response_data)
+            data = self.check_response_data(response_data, decoder=decoder)
+            record['decode'] = time.perf_counter() - received
+            record['rows'] = len(data) if isinstance(data, (list, pd.DataFrame)) else None
+            return data
+        except Exception as e:
+            record['error'] = repr(e)
+            raise
+        finally:
+            record['total'] = time.perf_counter() - start
+            record.update(timings)
+            if response_data is not None:
+                record.update(self._transfer_sizes(response_data))
+            for hook in self.hooks: # a failing hook never changes the result of the request
+                try:
+                    hook(record)
+                except Exception:
+                    log.exception(f'Hook {hook!r} failed on the record of {uri_path}')
 
     @staticmethod
-    def check_response_data(response_data) -> dict:
+    def _transfer_sizes(response_data) -> dict:
+        request = response_data.request
+        body = request.body or b''
+        raw = response_data.raw
+        return {
+            'status': response_data.status_code,
+            'request_bytes': len(body) + sum(len(k) + len(v) + 4 for k, v in request.headers.items()),
+            'response_bytes': raw.tell() if hasattr(raw, 'tell') else len(response_data.content),
+            'retries': len(raw.retries.history) if getattr(raw, 'retries', None) is not None else 0
+        }
+
+    @staticmethod
+    def check_response_data(response_data, decoder=None) -> dict:
         if response_data.status_code == 200:
             try:
-                data = response_data.json()
+                data = response_data.json() if decoder is None else decoder(response_data)
             except ValueError:
                 raise Exception(response_data.content)
             else:
                 return data
         else:
-            raise Exception(f'{response_data.status_code}-{esponse_data.text}')
+            raise Exception(f'{response_data.status_code}-{response_data.text}')
+
+
+class QueryCache(object):
+    '''
+        Opt-in result cache for the Client, keyed by the normalized sql text (whitespace
+        and letter case outside of string literals do not matter).
+
+        Results live in an in-memory LRU tier and, if {directory} is set, in an on-disk
+        tier of compressed columnar .npz files (one array per column), which survives
+        restarts of the notebook kernel or the report script. Every entry expires after
+        its ttl; the disk tier evicts the least recently used files once it grows beyond
+        {max_disk_bytes}.
+
+        ------ P A R A M E T E R S ------
+        :param ttl: float | optional
+            Default time to live of an entry in seconds
+
+        :param max_entries: int | optional
+            Number of results kept in memory
+
+        :param directory: str | optional
+            Directory of the on-disk tier, None disables it
+
+        :param max_disk_bytes: int | optional
+            Size limit of the on-disk tier
+
+        ------ E X A M P L E ------
+
+        > cache = QueryCache(ttl=3600, directory='.cache')
+        > client = Client(API_KEY='n6C?q*QuDA', sandbox=True, cache=cache)
+        > client.sql_query('SELECT * FROM pepper_emotion_table LIMIT 500')
+        > client.sql_query('select *  from pepper_emotion_table limit 500') # served from cache
+        > cache.stats()
+        {'memory_hits': 1, 'disk_hits': 0, 'misses': 1, 'evictions': 0, 'entries': 1, 'disk_bytes': 10562}
+
+    '''
+
+    def __init__(
+        self, ttl: float=900, max_entries: int=128,
+        directory: str=None, max_disk_bytes: int=256 * 1024 ** 2
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory_hits, self.disk_hits, self.misses, self.evictions = 0, 0, 0, 0
+        self._entries = OrderedDict() # key -> (expires, rows)
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        '''Collapses whitespace and lower cases everything outside of string literals.'''
+        parts = re.split(r'''('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")''', query.strip().rstrip(';').strip())
+        return ''.join(part if i % 2 else re.sub(r'\s+', ' ', part).lower() for i, part in enumerate(parts))
+
+    def key(self, query: str, namespace: str='') -> str:
+        return hashlib.sha1(f'{namespace}|{self.normalize(query)}'.encode()).hexdigest()
+
+    def get(self, key: str):
+        '''Returns the cached rows of {key} or None if there is no valid entry.'''
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        rows = self._read(key, now)
+        with self._lock:
+            if rows is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        return rows
+
+    def put(self, key: str, rows: list, ttl: float=None) -> None:
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(key, expires, rows)
+        if self.directory is not None:
+            self._write(key, expires, rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        for path in self._files():
+            os.remove(path)
+
+    def stats(self) -> dict:
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'disk_bytes': sum(os.path.getsize(path) for path in self._files())
+        }
+
+    def _remember(self, key: str, expires: float, rows: list) -> None:
+        with self._lock:
+            self._entries[key] = (expires, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # ----- on-disk tier -----
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def _files(self) -> list:
+        if self.directory is None:
+            return []
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.npz')]
+
+    def _read(self, key: str, now: float):
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with np.load(self._path(key)) as npz:
+                expires = float(npz['__expires__'])
+                if expires <= now:
+                    os.remove(self._path(key))
+                    return None
+                rows = self._decode(npz)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        os.utime(self._path(key)) # mark as recently used
+        self._remember(key, expires, rows)
+        return rows
+
+    def _write(self, key: str, expires: float, rows: list) -> None:
+        tmp_path = f'{self._path(key)}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, __expires__=np.float64(expires), **self._encode(rows))
+        os.replace(tmp_path, self._path(key))
+
+        files = sorted(self._files(), key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in files)
+        while total > self.max_disk_bytes and files:
+            path = files.pop(0)
+            total -= os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                self.evictions += 1
+
+    @staticmethod
+    def _encode(rows: list) -> dict:
+        '''Returns the rows as columnar arrays: one array of values and one null mask per column.'''
+        columns = list(rows[0].keys()) if rows else []
+        arrays = { '__columns__': np.array(columns, dtype=str), '__json__': np.zeros(len(columns), dtype=bool) }
+        for i, column in enumerate(columns):
+            values = [row.get(column) for row in rows]
+            nulls = np.array([value is None for value in values], dtype=bool)
+            sample = next((value for value in values if value is not None), '')
+
+            array = None
+            # typed arrays only for columns of one python type, np.asarray would convert mixed values
+            if not isinstance(sample, (dict, list)) and all(type(value) is type(sample) for value in values if value is not None):
+                fill = type(sample)()
+                array = np.asarray([fill if null else value for value, null in zip(values, nulls)])
+            if array is None or array.dtype == object:
+                array = np.array([json.dumps(value) for value in values], dtype=str)
+                arrays['__json__'][i] = True
+
+            arrays[f'values_{i}'], arrays[f'nulls_{i}'] = array, nulls
+        return arrays
+
+    @staticmethod
+    def _decode(npz) -> list:
+        columns = npz['__columns__'].tolist()
+        is_json = npz['__json__']
+        decoded = []
+        for i in range(len(columns)):
+            values = npz[f'values_{i}'].tolist()
+            if is_json[i]:
+                values = [json.loads(value) for value in values]
+            else:
+                for j in np.flatnonzero(npz[f'nulls_{i}']):
+                    values[j] = None
+            decoded.append(values)
+        return [dict(zip(columns, row)) for row in zip(*decoded)]
+
+
+class AsyncClient(object):
+    '''
+        asyncio front end of the Client which runs a batch of sql queries concurrently,
+        so fetching several tables takes as long as the slowest query instead of the sum
+        of all queries. Every query is sent through the pooled session of a Client in a
+        worker thread, at most {max_concurrency} at the same time.
+
+        ------ P A R A M E T E R S ------
+        :param API_KEY: str | required
+            The key to access the restricted api endpoints
+
+        :param max_concurrency: int | optional
+            Maximum number of queries in flight at the same time
+
+        All other keyword arguments are passed to the Client.
+
+        ------ E X A M P L E ------
+
+        > with AsyncClient(API_KEY='n6C?q*QuDA', sandbox=True, verbose=1) as client:
+        >     client.fetch_all({
+        >         'emotion': 'select * from pepper_emotion_table',
+        >         'use_case': 'select * from pepper_use_case_table'
+        >     })
+        { 'emotion': [{ ... }, ...], 'use_case': [{ ... }, ...] }
+
+        > async with AsyncClient(API_KEY='n6C?q*QuDA', sandbox=True, verbose=1) as client:
+        >     emotion, use_case = await client.sql_queries([
+        >         'select * from pepper_emotion_table', 'select * from pepper_use_case_table'
+        >     ])
+
+    '''
+
+    def __init__(self, API_KEY: str, max_concurrency: int=4, **kwargs):
+        kwargs.setdefault('pool_size', max_concurrency)
+        self.client = Client(API_KEY, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''Stops the worker threads and closes the connections of the underlying Client.'''
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def sql_query(self, query: str) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.client.sql_query, query)
+
+    async def sql_queries(self, queries: Union[list, dict]) -> Union[list, dict]:
+        '''Runs all {queries} concurrently and returns the results in the same order
+            or, if {queries} is a dict, under the same keys.
+        '''
+        if isinstance(queries, dict):
+            results = await asyncio.gather(*[self.sql_query(query) for query in queries.values()])
+            return dict(zip(queries.keys(), results))
+        return list(await asyncio.gather(*[self.sql_query(query) for query in queries]))
+
+    def fetch_all(self, queries: Union[list, dict]) -> Union[list, dict]:
+        '''Blocking version of sql_queries for scripts without a running event loop.'''
+        return asyncio.run(self.sql_queries(queries))
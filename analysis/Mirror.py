@@ -0,0 +1,168 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import schema
+import sampling
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+
+class Mirror(object):
+    '''
+        Local SQLite mirror of the pepper_* tables. Every sync only fetches the rows past
+        the last data_id (the watermark) of each table through the Client and appends them,
+        so overlapping report windows never download a row twice. Afterwards the data can
+        be queried without any network round trip.
+
+        Rows are stored exactly as the api returns them (ts as '%Y-%m-%dT%H:%M:%S.000Z' in
+        UTC), so Mirror.sql_query can be used as a drop-in replacement of Client.sql_query
+        for plain SELECT statements.
+
+        ------ P A R A M E T E R S ------
+        :param path: str | optional
+            Location of the SQLite database file
+
+        ------ E X A M P L E ------
+
+        > mirror = Mirror('pepper_mirror.db')
+        > mirror.sync(client)
+        {'pepper_emotion_table': 12, 'pepper_use_case_table': 31, 'pepper_did_not_understand_table': 40}
+        > mirror.sql_query(f'SELECT * FROM pepper_use_case_table {mirror.where_lookback(7)}')
+        [{
+            'data_id': 1,
+            'identifier': '7ce287b890cd497c9c2ae05c1dd2ae20',
+            'use_case': 'SmallTalk',
+            'ts': '2022-01-11T12:34:50.000Z'
+        }, ... ]
+
+    '''
+
+    TABLES = {
+        'pepper_emotion_table': {
+            'data_id': 'INTEGER PRIMARY KEY',
+            'identifier': 'TEXT',
+            'distance': 'REAL',
+            'age': 'INTEGER',
+            'gender': 'TEXT',
+            'basic_emotion': 'TEXT',
+            'pleasure_state': 'TEXT',
+            'excitement_state': 'TEXT',
+            'smile_state': 'TEXT',
+            'dialog_time': 'REAL',
+            'ts': 'TEXT'
+        },
+        'pepper_use_case_table': {
+            'data_id': 'INTEGER PRIMARY KEY',
+            'identifier': 'TEXT',
+            'use_case': 'TEXT',
+            'ts': 'TEXT'
+        },
+        'pepper_did_not_understand_table': {
+            'data_id': 'INTEGER PRIMARY KEY',
+            'identifier': 'TEXT',
+            'phrase': 'TEXT',
+            'ts': 'TEXT'
+        }
+    }
+
+    TS_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+    def __init__(self, path: str='pepper_mirror.db'):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._create_tables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _create_tables(self) -> None:
+        with self.connection:
+            for table, columns in self.TABLES.items():
+                definition = ', '.join(f'{column} {dtype}' for column, dtype in columns.items())
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({definition})')
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_ts ON {table} (ts)')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    table_name TEXT PRIMARY KEY, data_id INTEGER, ts TEXT, synced_at REAL
+                )
+            ''')
+
+    def watermark(self, table: str) -> tuple:
+        '''Returns (data_id, ts) of the newest mirrored row of {table} or (None, None).'''
+        row = self.connection.execute(
+            'SELECT data_id, ts FROM sync_state WHERE table_name = ?', (table,)
+        ).fetchone()
+        return row if row is not None else (None, None)
+
+    def sync(self, client, tables: list=None, chunk_rows: int=10000) -> dict:
+        '''Fetches all rows past the watermark of every table and returns the number of new rows per table.
+
+            ----- Keyword arguments -----
+            client: Client | Client (or anything with iter_rows) connected to the web app
+            tables: list | Tables to sync | default: all pepper_* tables
+            chunk_rows: int | Rows per request
+        '''
+        new_rows = {}
+        for table in tables or self.TABLES:
+            columns = list(self.TABLES[table])
+            insert = (
+                f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) '
+                f'VALUES ({", ".join("?" for _ in columns)})'
+            )
+            last_id, _ = self.watermark(table)
+
+            new_rows[table] = 0
+            for rows in client.iter_rows(f'SELECT * FROM {table}', chunk_rows=chunk_rows, after=last_id):
+                with self.connection: # every chunk is committed together with its watermark
+                    self.connection.executemany(insert, [tuple(row.get(column) for column in columns) for row in rows])
+                    self.connection.execute(
+                        'INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                        (table, rows[-1]['data_id'], rows[-1]['ts'], time.time())
+                    )
+                new_rows[table] += len(rows)
+        return new_rows
+
+    def sql_query(self, query: str) -> list:
+        '''Runs {query} against the mirror and returns the rows as list of dicts (like Client.sql_query).'''
+        cursor = self.connection.execute(query.strip().rstrip(';'))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def iter_query(self, query: str, chunk_rows: int=10000, key: str='data_id', after: int=None):
+        '''Yields the result of {query} as typed DataFrames of at most {chunk_rows} rows (like Client.iter_query).'''
+        table = schema.table_of(query)
+        last_key = after
+        while True:
+            where = '' if last_key is None else f'WHERE page.{key} > {int(last_key)} '
+            rows = self.sql_query(f'SELECT * FROM ({query.strip().rstrip(";")}) AS page {where}ORDER BY page.{key} LIMIT {int(chunk_rows)}')
+            if not rows:
+                return
+
+            last_key = rows[-1][key]
+            yield schema.frame_from_rows(rows, table)
+
+            if len(rows) < chunk_rows:
+                return
+
+    def sample(self, table: str, n: int, by: str=None, **kwargs):
+        '''Returns a random sample of about {n} rows of {table} (like Client.sample).'''
+        kwargs.setdefault('dialect', 'sqlite')
+        return sampling.sample(self, table, n, by=by, **kwargs)
+
+    @classmethod
+    def where_lookback(cls, days: int) -> str:
+        '''Returns the WHERE clause for rows of the last {days} days (the mirror equivalent
+            of WHERE ts > NOW() - INTERVAL {days} day).
+        '''
+        return f"WHERE ts > '{(datetime.now(timezone.utc) - timedelta(days=days)).strftime(cls.TS_FORMAT)}'"
@@ -0,0 +1,107 @@
+'''
+    bench_client.py
+    ===================================
+
+    Compares the latency per query of the old Client (one bare `requests.request` and
+    therefore one new connection per query) with the pooled keep-alive session of the
+    current Client. Both run against a local stand-in of the /api/v1/sql endpoint, so
+    no running instance of the node application is needed.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_client.py -n 500
+    queries: 500 | rows per query: 50
+    bare requests.request      total:   1.081s | mean:  2.16ms | p50:  2.30ms | p95:  2.76ms
+    pooled Client.session      total:   0.782s | mean:  1.56ms | p50:  1.72ms | p95:  1.99ms
+
+    Against the production web app every bare request additionally pays for a TLS handshake.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import json
+import time
+import threading
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Client import Client
+
+# ----- S T A N D - I N ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+URI = '/docker-hbv-kms-http/api/v1/sql'
+
+def make_handler(rows: list):
+    body = json.dumps(rows).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_stand_in(rows: list) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(rows))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ----- B E N C H M A R K ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def timed(fn, n: int) -> np.ndarray:
+    latencies = np.empty(n)
+    for i in range(n):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+def report(name: str, latencies: np.ndarray) -> None:
+    ms = latencies * 1000
+    print(
+        f'{name:<26} total: {latencies.sum():7.3f}s | mean: {ms.mean():5.2f}ms | '
+        f'p50: {np.percentile(ms, 50):5.2f}ms | p95: {np.percentile(ms, 95):5.2f}ms'
+    )
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark bare requests against the pooled Client session')
+    parser.add_argument('-n', type=int, dest='n', default=500, help='number of queries per run | default: 500')
+    parser.add_argument('-r', '--rows', type=int, dest='rows', default=50, help='rows per query result | default: 50')
+    args = parser.parse_args()
+
+    rows = [{
+        'data_id': i, 'identifier': '7ce287b890cd497c9c2ae05c1dd2ae20',
+        'phrase': 'q76lx76ydl0l93qu2o', 'ts': '2022-01-11T12:34:50.000Z'
+    } for i in range(args.rows)]
+    server = start_stand_in(rows)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/docker-hbv-kms-http'
+    payload = { 'subject': 'sql_query', 'query_str': 'SELECT * FROM pepper_did_not_understand_table;', 'auth_key': 'bench' }
+
+    print(f'queries: {args.n} | rows per query: {args.rows}')
+    report('bare requests.request', timed(
+        lambda: requests.request('POST', f'{base_url}/api/v1/sql', data=payload, timeout=Client.timeout).json(), args.n
+    ))
+    with Client('bench', verbose=1, url=base_url) as client:
+        report('pooled Client.session', timed(
+            lambda: client.sql_query('SELECT * FROM pepper_did_not_understand_table'), args.n
+        ))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
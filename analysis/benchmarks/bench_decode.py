@@ -0,0 +1,98 @@
+'''
+    bench_decode.py
+    ===================================
+
+    Compares the old decoding of sql responses (list of dicts -> pd.DataFrame -> casting
+    columns by hand) with the typed columnar decoding of schema.decode on synthetic
+    pepper_emotion_table responses. Reports rows/sec and the peak memory (tracemalloc)
+    of each path.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_decode.py -n 10000 100000 500000
+        rows path                 rows/sec   peak MiB  frame MiB
+       10000 list of dicts         115,752       12.3        1.6
+       10000 columnar              113,021        6.2        0.7
+      100000 list of dicts         120,710      123.1       16.1
+      100000 columnar              122,182       61.2        7.3
+      500000 list of dicts         119,864      616.3       80.5
+      500000 columnar              140,719      308.2       36.7
+
+    Both paths are bound by the json parser of the standard library. The columnar path
+    types every column on top and still halves the peak memory.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import json
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schema
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def make_response(n: int, seed: int=42) -> bytes:
+    '''Returns a json response like the api sends it for SELECT * FROM pepper_emotion_table.'''
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp('2022-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 90 * 86400, n)), unit='s')
+    rows = [{
+        'data_id': i + 1,
+        'identifier': '7ce287b890cd497c9c2ae05c1dd2ae20',
+        'distance': round(float(distance), 4),
+        'age': int(age),
+        'gender': gender,
+        'basic_emotion': emotion,
+        'pleasure_state': pleasure,
+        'excitement_state': excitement,
+        'smile_state': smile,
+        'dialog_time': f'{dialog_time:.2f}', # decimal columns arrive as strings
+        'ts': t.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    } for i, (distance, age, gender, emotion, pleasure, excitement, smile, dialog_time, t) in enumerate(zip(
+        rng.random(n) * 2, rng.integers(3, 80, n), rng.choice(['male', 'female'], n),
+        rng.choice(schema.CATEGORIES['basic_emotion'], n), rng.choice(schema.CATEGORIES['pleasure_state'], n),
+        rng.choice(schema.CATEGORIES['excitement_state'], n), rng.choice(schema.CATEGORIES['smile_state'], n),
+        np.abs(rng.normal(3, 3, n)) + 1, ts
+    ))]
+    return json.dumps(rows).encode()
+
+def decode_rows(content: bytes) -> pd.DataFrame:
+    '''The old path: response.json() and the hand written casts of weekly-report.py.'''
+    df = pd.DataFrame(data=json.loads(content))
+    df['dialog_time'] = np.array([x for x in df['dialog_time']]).astype('float32')
+    return df
+
+def decode_columns(content: bytes) -> pd.DataFrame:
+    return schema.decode(content, 'pepper_emotion_table')
+
+def measure(fn, content: bytes) -> tuple:
+    start = time.perf_counter()
+    fn(content)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    df = fn(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, df.memory_usage(deep=True).sum()
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark decoding of sql responses')
+    parser.add_argument('-n', type=int, nargs='+', dest='sizes', default=[10000, 100000, 500000], help='rows per response')
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} {"path":<16} {"rows/sec":>12} {"peak MiB":>10} {"frame MiB":>10}')
+    for n in args.sizes:
+        content = make_response(n)
+        for name, fn in [('list of dicts', decode_rows), ('columnar', decode_columns)]:
+            seconds, peak, frame_bytes = measure(fn, content)
+            print(f'{n:>8} {name:<16} {n / seconds:>12,.0f} {peak / 2 ** 20:>10.1f} {frame_bytes / 2 ** 20:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
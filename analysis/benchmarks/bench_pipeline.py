@@ -0,0 +1,265 @@
+'''
+    bench_pipeline.py
+    ===================================
+
+    Benchmark suite of the analysis pipeline at several scales (default: 10k, 100k and 1M
+    interactions, about a semester of a busy robot). For every scale synthetic pepper
+    tables are generated with the value domains of create_dummy_conversation_data.py
+    (0 - 5 use cases per interaction, gender 'other' in 0.01 %, dialog times > 1 min, ...),
+    loaded into the local stand-in of the web app, which runs in its own process, and
+    the stages of weekly-report.py and main.ipynb are timed in a fresh process:
+
+        fetch        SELECT * of both tables, paged by data_id (Client.iter_query), time on the wire
+        decode       typed columnar decoding of the responses (schema.py)
+        preprocess   preprocessing.preprocess of both tables
+        aggregate    the GROUP BY queries of the report panels (QueryPlan), in the stand-in
+        aggregate_pandas  the same panels from the preprocessed frames (like main.ipynb)
+        render       drawing all pages of the report (figures.render_page, in this process)
+        pdf          writing the pages into the pdf
+
+    Besides the seconds, every stage records the peak resident memory of the process while
+    it ran (VmHWM, reset before each stage via /proc/self/clear_refs; fetch and decode are
+    interleaved and share one peak). The results are written as json together with the
+    commit and the versions, so runs of two commits can be compared with --compare.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_pipeline.py -o pipeline.json
+        rows stage                seconds   rows/sec   peak MiB
+      ...
+      100000 fetch                  3.951     25,309      251.4
+      100000 decode                 0.664    150,540      251.4
+      100000 preprocess             0.025  4,036,126      236.2
+      100000 aggregate              1.172     85,345      237.5
+      100000 aggregate_pandas       0.052  1,939,941      239.2
+      100000 render                 0.666    150,111      252.1
+      100000 pdf                    0.354    282,560      252.1
+     1000000 fetch                 39.859     25,088      509.2
+     1000000 decode                 6.517    153,444      509.2
+     1000000 preprocess             0.298  3,351,333      596.3
+     1000000 aggregate             14.833     67,415      597.7
+     1000000 aggregate_pandas       0.480  2,083,390      683.9
+     1000000 render                 0.992  1,008,505      590.8
+     1000000 pdf                    0.571  1,750,781      590.8
+
+    analysis~$ git checkout other-branch && python3 benchmarks/bench_pipeline.py -o other.json --compare pipeline.json
+        rows stage                seconds   rows/sec   peak MiB   before s    ratio
+       10000 fetch                  0.696     14,374      190.1      0.640    1.09x
+       ...
+
+    (single cpu, rows/sec are interactions per second, the use case table holds ~2.5 rows
+    per interaction) Fetching the raw rows dominates and grows linearly, at 1M interactions
+    it takes 40 s through the json of the stand-in; the GROUP BY of the report is bound
+    by the WEEKDAY callback of the stand-in. Rendering and writing the pdf do not depend
+    on the number of interactions. ~185 MiB of the peaks are the imports.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import re
+import json
+import time
+import platform
+import resource
+import subprocess
+import tempfile
+from argparse import ArgumentParser, SUPPRESS
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import matplotlib
+from matplotlib.backends.backend_pdf import PdfPages
+
+ANALYSIS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_BACKEND = os.path.join(os.path.dirname(ANALYSIS), 'local-backend')
+sys.path.insert(0, ANALYSIS)
+sys.path.insert(0, LOCAL_BACKEND)
+from Client import Client
+from planner import QueryPlan
+import figures
+import preprocessing
+import schema
+from local_backend import LocalBackend
+from bench_pushdown import PANELS, aggregate_frames
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+STAGES = ['fetch', 'decode', 'preprocess', 'aggregate', 'aggregate_pandas', 'render', 'pdf']
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def synthesize(n: int, days: int=120, seed: int=42) -> dict:
+    '''Returns { table: DataFrame } of {n} interactions over the last {days} days with the
+        value domains of create_dummy_conversation_data.py, data_id in order of ts.
+    '''
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp.now('UTC').tz_convert(None).floor('s') - pd.to_timedelta(np.sort(rng.integers(0, days * 86400, n))[::-1], unit='s')
+    identifiers = pd.Series(rng.integers(0, 2 ** 63, n)).map('{:016x}'.format) + pd.Series(rng.integers(0, 2 ** 63, n)).map('{:016x}'.format)
+
+    dialog_time = rng.normal(3, 3, n)
+    while (short := dialog_time <= 1).any(): # only dialogs longer than a minute, like the generator
+        dialog_time[short] = rng.normal(3, 3, short.sum())
+
+    emotions = pd.DataFrame({
+        'identifier': identifiers,
+        'distance': (rng.random(n) * 2).round(4),
+        'age': rng.integers(3, 80, n),
+        'gender': np.where(rng.random(n) > 0.0001, rng.choice(['male', 'female'], n), 'other'),
+        'basic_emotion': rng.choice(schema.CATEGORIES['basic_emotion'], n),
+        'pleasure_state': rng.choice(schema.CATEGORIES['pleasure_state'], n),
+        'excitement_state': rng.choice(schema.CATEGORIES['excitement_state'], n),
+        'smile_state': rng.choice(schema.CATEGORIES['smile_state'], n),
+        'dialog_time': dialog_time.round(2),
+        'ts': ts.strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+    per_interaction = rng.integers(0, len(schema.CATEGORIES['use_case']), n) # 0 - 5 use cases
+    use_cases = pd.DataFrame({
+        'identifier': np.repeat(emotions['identifier'].to_numpy(), per_interaction),
+        'use_case': rng.choice(schema.CATEGORIES['use_case'], per_interaction.sum()),
+        'ts': np.repeat(emotions['ts'].to_numpy(), per_interaction)
+    })
+    return { 'pepper_emotion_table': emotions, 'pepper_use_case_table': use_cases }
+
+def load(path: str, tables: dict) -> None:
+    '''Writes {tables} into the SQLite database of the stand-in at {path}.'''
+    with LocalBackend(port=0, db=path) as backend:
+        with backend.lock, backend.connection:
+            for table, df in tables.items():
+                backend.connection.executemany(
+                    f'INSERT INTO {table} ({", ".join(df.columns)}) VALUES ({", ".join("?" for _ in df.columns)})',
+                    df.itertuples(index=False, name=None)
+                )
+
+def reset_peak() -> None:
+    '''Resets the peak resident memory (VmHWM) of this process, linux only.'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+def peak_rss() -> float:
+    '''Peak resident memory of this process in MiB (since the last reset_peak).'''
+    try:
+        with open('/proc/self/status') as status:
+            return next(int(line.split()[1]) for line in status if line.startswith('VmHWM')) / 2 ** 10
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10 # KiB on linux
+
+def run(url: str, out_dir: str) -> dict:
+    '''Runs all stages against the stand-in at {url} and returns { stage: { seconds, peak_mib } }.'''
+    figures.setup()
+    records, stages = [], {}
+    client = Client('sandbox', url=url, verbose=1, hooks=[records.append])
+
+    def timed(stage: str, fn):
+        reset_peak()
+        start = time.perf_counter()
+        result = fn()
+        stages[stage] = { 'seconds': time.perf_counter() - start, 'peak_mib': peak_rss() }
+        return result
+
+    frames = timed('fetch', lambda: {
+        table: pd.concat(list(client.iter_query(f'SELECT * FROM {table}', chunk_rows=100000)), ignore_index=True)
+        for table in ('pepper_emotion_table', 'pepper_use_case_table')
+    })
+    # fetch and decode alternate page by page, the records of the Client split them
+    peak = stages['fetch']['peak_mib']
+    stages['fetch'] = { 'seconds': sum(record['ttfb'] + record['download'] for record in records), 'peak_mib': peak }
+    stages['decode'] = { 'seconds': sum(record['decode'] for record in records), 'peak_mib': peak }
+
+    emotion_states_df, use_case_df = timed('preprocess', lambda: (
+        preprocessing.preprocess(frames['pepper_emotion_table']), preprocessing.preprocess(frames['pepper_use_case_table'])
+    ))
+    panels = timed('aggregate', lambda: QueryPlan(PANELS).run(client))
+    timed('aggregate_pandas', lambda: aggregate_frames(emotion_states_df, use_case_df))
+    pages = timed('render', lambda: [
+        figures.render_page(page, [panels[name] for name in names]) for page, names in figures.PAGES
+    ])
+
+    def write():
+        with PdfPages(os.path.join(out_dir, 'report.pdf')) as pdf:
+            for fig, bbox in pages:
+                pdf.savefig(fig, bbox_inches=bbox)
+    timed('pdf', write)
+
+    client.close()
+    return { 'rows': { table: len(df) for table, df in frames.items() }, 'stages': stages }
+
+def environment() -> dict:
+    '''Commit and versions the results belong to.'''
+    def git(*arguments):
+        try:
+            return subprocess.run(['git', *arguments], cwd=ANALYSIS, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {
+        'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()
+    }
+
+def measure(n: int, days: int) -> dict:
+    '''Fills a stand-in with {n} interactions and runs the stages in a fresh process.'''
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pepper.db')
+        load(path, synthesize(n, days))
+
+        backend = subprocess.Popen(
+            [sys.executable, os.path.join(LOCAL_BACKEND, 'local_backend.py'), '--db', path, '--port', '0'],
+            stdout=subprocess.PIPE, text=True
+        )
+        try:
+            url = re.search(r'Serving (\S+)/api/v1', backend.stdout.readline()).group(1)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', url, directory],
+                check=True, capture_output=True, text=True
+            ).stdout
+        finally:
+            backend.terminate()
+            backend.wait()
+    return { 'interactions': n, 'days': days, **json.loads(output.strip().splitlines()[-1]) }
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark the stages of the analysis pipeline at several scales')
+    parser.add_argument('-n', type=int, nargs='+', dest='sizes', default=[10000, 100000, 1000000], help='interactions')
+    parser.add_argument('-d', type=int, dest='days', default=120, help='days the interactions are spread over')
+    parser.add_argument('-o', dest='out', default='bench_pipeline.json', help='json file the results are written to')
+    parser.add_argument('--compare', dest='compare', default=None, help='json file of an earlier run to compare with')
+    parser.add_argument('--run', nargs=2, default=None, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None: # one scale, in its own process
+        print(json.dumps(run(*args.run)))
+        return
+
+    before = {}
+    if args.compare is not None:
+        with open(args.compare) as f:
+            before = { result['interactions']: result['stages'] for result in json.load(f)['results'] }
+
+    print(
+        f'{"rows":>8} {"stage":<18} {"seconds":>9} {"rows/sec":>10} {"peak MiB":>10}'
+        + (f' {"before s":>10} {"ratio":>8}' if before else '')
+    )
+    results = []
+    for n in args.sizes:
+        result = measure(n, args.days)
+        results.append(result)
+        for stage in STAGES:
+            seconds, peak = result['stages'][stage]['seconds'], result['stages'][stage]['peak_mib']
+            line = f'{n:>8} {stage:<18} {seconds:>9.3f} {n / seconds if seconds else 0:>10,.0f} {peak:>10.1f}'
+            if stage in before.get(n, {}):
+                line += f' {before[n][stage]["seconds"]:>10.3f} {seconds / before[n][stage]["seconds"]:>7.2f}x'
+            print(line)
+
+    with open(args.out, 'w') as f:
+        json.dump({ 'environment': environment(), 'results': results }, f, indent=2)
+    print(f'Results written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
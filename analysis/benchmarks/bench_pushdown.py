@@ -0,0 +1,125 @@
+'''
+    bench_pushdown.py
+    ===================================
+
+    Builds the panels of weekly-report.py twice against the local stand-in of the web app
+    (local-backend/local_backend.py) filled with synthetic interactions of the last days:
+    once the old way (SELECT * of the tables, preprocessing, value_counts and pivot tables
+    in pandas) and once through the QueryPlan of planner.py (GROUP BY queries). Reports
+    the wall time, the number of requests and the bytes on the wire of both.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_pushdown.py -n 10000 100000 500000
+        rows path           requests    wire KiB    seconds
+       10000 SELECT *              2       368.0      0.419
+       10000 GROUP BY              6         2.7      0.149
+      100000 SELECT *              2      3734.1      4.087
+      100000 GROUP BY              6         2.8      1.506
+      500000 SELECT *              2     18907.5     43.220
+      500000 GROUP BY              6         2.8     10.099
+
+    The responses of the aggregate queries only grow with the number of categories (the
+    stand-in gzips, so the plain json of SELECT * is ~10x larger). At 500k rows the SELECT *
+    requests run into the timeout of the Client and are retried. What remains proportional
+    to the interactions is the scan in the database, in the stand-in WEEKDAY is a python
+    callback of SQLite and dominates the GROUP BY time.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'local-backend'))
+from Client import Client
+from planner import Aggregate, QueryPlan
+import preprocessing
+import schema
+from local_backend import LocalBackend
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+PANELS = { # the panels of weekly-report.py
+    'use_case': Aggregate('pepper_use_case_table', ['use_case']),
+    'gender': Aggregate('pepper_emotion_table', ['gender']),
+    'basic_emotion': Aggregate('pepper_emotion_table', ['basic_emotion']),
+    'emotion_by_gender': Aggregate('pepper_emotion_table', ['gender', 'basic_emotion']),
+    'pleasure_by_gender': Aggregate('pepper_emotion_table', ['gender', 'pleasure_state']),
+    'emotion_by_weekday': Aggregate('pepper_emotion_table', ['weekday', 'basic_emotion']),
+    'gender_by_weekday': Aggregate('pepper_emotion_table', ['weekday', 'gender']),
+    'dialog_time_by_weekday': Aggregate('pepper_emotion_table', ['weekday'], mean=['dialog_time']),
+    'use_case_by_weekday': Aggregate('pepper_use_case_table', ['weekday', 'use_case'])
+}
+
+WHERE = 'WHERE ts > NOW() - INTERVAL 7 day'
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def fill(backend: LocalBackend, n: int, seed: int=42) -> None:
+    '''Inserts {n} interactions (and as many use cases) of the last 6 days into the stand-in.'''
+    rng = np.random.default_rng(seed)
+    ts = (pd.Timestamp.now('UTC').tz_convert(None) - pd.to_timedelta(rng.integers(0, 6 * 86400, n), unit='s')).strftime('%Y-%m-%d %H:%M:%S')
+    identifiers = [f'{i:032x}' for i in range(n)]
+    emotions = zip(
+        identifiers, (rng.random(n) * 2).round(4).tolist(), rng.integers(3, 80, n).tolist(), rng.choice(['male', 'female'], n).tolist(),
+        rng.choice(schema.CATEGORIES['basic_emotion'], n).tolist(), rng.choice(schema.CATEGORIES['pleasure_state'], n).tolist(),
+        rng.choice(schema.CATEGORIES['excitement_state'], n).tolist(), rng.choice(schema.CATEGORIES['smile_state'], n).tolist(),
+        (np.abs(rng.normal(3, 3, n)) + 1).round(2).tolist(), ts
+    )
+    use_cases = zip(identifiers, rng.choice(schema.CATEGORIES['use_case'], n).tolist(), ts)
+    with backend.lock, backend.connection:
+        backend.connection.executemany(
+            'INSERT INTO pepper_emotion_table (identifier, distance, age, gender, basic_emotion, pleasure_state, '
+            'excitement_state, smile_state, dialog_time, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', emotions
+        )
+        backend.connection.executemany('INSERT INTO pepper_use_case_table (identifier, use_case, ts) VALUES (?, ?, ?)', use_cases)
+
+def aggregate_frames(emotion_states_df: pd.DataFrame, use_case_df: pd.DataFrame) -> dict:
+    '''The panels of the report computed in pandas from the preprocessed tables (like main.ipynb).'''
+    return {
+        'use_case': use_case_df['use_case'].value_counts(),
+        'gender': emotion_states_df['gender'].value_counts(),
+        'basic_emotion': emotion_states_df['basic_emotion'].value_counts(),
+        'emotion_by_gender': emotion_states_df.pivot_table(index='gender', columns='basic_emotion', aggfunc='size', observed=True),
+        'pleasure_by_gender': emotion_states_df.pivot_table(index='gender', columns='pleasure_state', aggfunc='size', observed=True),
+        'emotion_by_weekday': emotion_states_df.pivot_table(index='weekday', columns='basic_emotion', aggfunc='size', observed=True),
+        'gender_by_weekday': emotion_states_df.pivot_table(index='weekday', columns='gender', aggfunc='size', observed=True),
+        'dialog_time_by_weekday': emotion_states_df.groupby('weekday')['dialog_time'].mean(),
+        'use_case_by_weekday': use_case_df.pivot_table(index='weekday', columns='use_case', aggfunc='size', observed=True)
+    }
+
+def select_all(client: Client) -> dict:
+    '''The old path: all rows, preprocessing and the aggregations of the panels in pandas.'''
+    emotion_states_df = preprocessing.preprocess(pd.DataFrame(client.sql_query(f'SELECT * FROM pepper_emotion_table {WHERE}')))
+    use_case_df = preprocessing.preprocess(pd.DataFrame(client.sql_query(f'SELECT * FROM pepper_use_case_table {WHERE}')))
+    return aggregate_frames(emotion_states_df, use_case_df)
+
+def group_by(client: Client) -> dict:
+    return QueryPlan(PANELS, where=WHERE).run(client)
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark aggregate push-down of the weekly report')
+    parser.add_argument('-n', type=int, nargs='+', dest='sizes', default=[10000, 100000], help='interactions in the stand-in')
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} {"path":<12} {"requests":>10} {"wire KiB":>11} {"seconds":>10}')
+    for n in args.sizes:
+        with LocalBackend(port=0) as backend:
+            fill(backend, n)
+            for name, fn in [('SELECT *', select_all), ('GROUP BY', group_by)]:
+                records = []
+                with Client('sandbox', url=backend.url, verbose=1, hooks=[records.append]) as client:
+                    start = time.perf_counter()
+                    fn(client)
+                    seconds = time.perf_counter() - start
+                wire = sum(record['response_bytes'] or 0 for record in records)
+                print(f'{n:>8} {name:<12} {len(records):>10} {wire / 2 ** 10:>11.1f} {seconds:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
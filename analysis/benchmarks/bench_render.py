@@ -0,0 +1,125 @@
+'''
+    bench_render.py
+    ===================================
+
+    Builds the weekly report from a SQLite Mirror filled with synthetic interactions of
+    the last days: the panels are aggregated with the QueryPlan of weekly-report.py and
+    the pages are rendered and written by figures.write_report, in this process (workers 0) and in
+    process pools. Every configuration runs in a fresh python process, so the peak
+    resident memory (ru_maxrss of the process and of its workers) is its own.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_render.py -n 100000 1000000 -w 0 2
+        rows workers  aggregate s  render s   total s  peak RSS MiB  workers RSS MiB
+      100000       0        0.905     0.645     1.550         192.4              0.0
+      100000       2        0.892     0.810     1.702         175.4            147.5
+     1000000       0       12.376     0.679    13.055         192.2              0.0
+     1000000       2       11.676     0.796    12.472         175.5            147.4
+
+    (measured on a machine with a single cpu, where the pool can only add overhead; that
+    is why render_report uses at most one worker per cpu by default)
+
+    Rendering and memory no longer depend on the number of interactions, the pages are
+    drawn from the aggregates. With a pool (and pypdf) the workers also write the pdf of
+    their page, the main process only appends the finished pages: ~0.03 s of the ~0.65 s
+    of serial rendering instead of ~0.2 s of savefig (and unpickling the figures) before,
+    so with enough cpus the report takes about as long as its slowest page.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import json
+import time
+import resource
+import subprocess
+import tempfile
+from argparse import ArgumentParser, SUPPRESS
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Mirror import Mirror
+from planner import QueryPlan
+import figures
+import schema
+from bench_pushdown import PANELS
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def fill(mirror: Mirror, n: int, seed: int=42) -> None:
+    '''Inserts {n} interactions (and as many use cases) of the last 6 days into {mirror}.'''
+    rng = np.random.default_rng(seed)
+    ts = (pd.Timestamp.now('UTC').tz_convert(None) - pd.to_timedelta(rng.integers(0, 6 * 86400, n), unit='s')).strftime(Mirror.TS_FORMAT)
+    identifiers = [f'{i:032x}' for i in range(n)]
+    emotions = zip(
+        range(1, n + 1), identifiers, (rng.random(n) * 2).round(4).tolist(), rng.integers(3, 80, n).tolist(),
+        rng.choice(['male', 'female'], n).tolist(), rng.choice(schema.CATEGORIES['basic_emotion'], n).tolist(),
+        rng.choice(schema.CATEGORIES['pleasure_state'], n).tolist(), rng.choice(schema.CATEGORIES['excitement_state'], n).tolist(),
+        rng.choice(schema.CATEGORIES['smile_state'], n).tolist(), (np.abs(rng.normal(3, 3, n)) + 1).round(2).tolist(), ts
+    )
+    use_cases = zip(range(1, n + 1), identifiers, rng.choice(schema.CATEGORIES['use_case'], n).tolist(), ts)
+    with mirror.connection:
+        mirror.connection.executemany(f'INSERT INTO pepper_emotion_table VALUES ({", ".join("?" * 11)})', emotions)
+        mirror.connection.executemany('INSERT INTO pepper_use_case_table VALUES (?, ?, ?, ?)', use_cases)
+
+def peak_rss() -> float:
+    '''Peak resident memory of this process in MiB. ru_maxrss survives the exec of the
+        benchmark process on linux (it would report the peak of the parent), VmHWM does not.
+    '''
+    try:
+        with open('/proc/self/status') as status:
+            return next(int(line.split()[1]) for line in status if line.startswith('VmHWM')) / 2 ** 10
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10 # KiB on linux
+
+def run(path: str, workers: int) -> dict:
+    '''Builds one report from the mirror at {path} and returns its timings and peak memory.'''
+    figures.setup()
+    with Mirror(path) as mirror:
+        start = time.perf_counter()
+        panels = QueryPlan(PANELS, where=mirror.where_lookback(7), dialect='sqlite').run(mirror)
+        aggregated = time.perf_counter()
+        figures.write_report(f'{path}.pdf', panels, { 'Title': 'Weekly report' }, workers=workers)
+        rendered = time.perf_counter()
+
+    return {
+        'aggregate': aggregated - start,
+        'render': rendered - aggregated,
+        'rss': peak_rss(),
+        'workers_rss': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 2 ** 10
+    }
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark rendering of the weekly report')
+    parser.add_argument('-n', type=int, nargs='+', dest='sizes', default=[100000, 1000000], help='interactions in the mirror')
+    parser.add_argument('-w', type=int, nargs='+', dest='workers', default=[0, 2, 4], help='render processes')
+    parser.add_argument('--run', nargs=2, default=None, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None: # one configuration, in its own process
+        print(json.dumps(run(args.run[0], int(args.run[1]))))
+        return
+
+    print(f'{"rows":>8} {"workers":>7} {"aggregate s":>12} {"render s":>9} {"total s":>9} {"peak RSS MiB":>13} {"workers RSS MiB":>16}')
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mirror.db')
+            with Mirror(path) as mirror:
+                fill(mirror, n)
+
+            for workers in args.workers:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--run', path, str(workers)],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(
+                    f'{n:>8} {workers:>7} {result["aggregate"]:>12.3f} {result["render"]:>9.3f} '
+                    f'{result["aggregate"] + result["render"]:>9.3f} {result["rss"]:>13.1f} {result["workers_rss"]:>16.1f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
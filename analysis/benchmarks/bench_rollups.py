@@ -0,0 +1,91 @@
+'''
+    bench_rollups.py
+    ===================================
+
+    Builds the panels of weekly-report.py for every week of a SQLite Mirror filled with
+    synthetic interactions of the last days twice: once with a GROUP BY QueryPlan per week
+    on the mirror (re-aggregating the raw rows of each week) and once by merging the daily
+    rollups of rollups.RollupStore. The one-time update of the store is reported on its own.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_rollups.py -n 100000 1000000 -d 365
+        rows  days  weeks  rollup rows  update s  GROUP BY s  rollups s  ms / report
+      100000   365     52        13865     0.928       3.819      2.330         44.8
+     1000000   365     52        13870     7.169      17.964      1.831         35.2
+
+    The GROUP BY of every report scans the rows of its week again, so its time grows
+    with the interactions. Merging only touches the (at most 54) rollup rows per day and
+    table, independent of the number of interactions; what remains is the fixed pandas
+    overhead of re-grouping the 9 panels.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import time
+import tempfile
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Mirror import Mirror
+from planner import QueryPlan
+from rollups import RollupStore, periods
+import schema
+from bench_pushdown import PANELS
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def fill(mirror: Mirror, n: int, days: int, seed: int=42) -> None:
+    '''Inserts {n} interactions (and as many use cases) of the last {days} days into {mirror}.'''
+    rng = np.random.default_rng(seed)
+    ts = (pd.Timestamp.now('UTC').tz_convert(None) - pd.to_timedelta(rng.integers(0, days * 86400, n), unit='s')).strftime(Mirror.TS_FORMAT)
+    identifiers = [f'{i:032x}' for i in range(n)]
+    emotions = zip(
+        range(1, n + 1), identifiers, (rng.random(n) * 2).round(4).tolist(), rng.integers(3, 80, n).tolist(),
+        rng.choice(['male', 'female'], n).tolist(), rng.choice(schema.CATEGORIES['basic_emotion'], n).tolist(),
+        rng.choice(schema.CATEGORIES['pleasure_state'], n).tolist(), rng.choice(schema.CATEGORIES['excitement_state'], n).tolist(),
+        rng.choice(schema.CATEGORIES['smile_state'], n).tolist(), (np.abs(rng.normal(3, 3, n)) + 1).round(2).tolist(), ts
+    )
+    use_cases = zip(range(1, n + 1), identifiers, rng.choice(schema.CATEGORIES['use_case'], n).tolist(), ts)
+    with mirror.connection:
+        mirror.connection.executemany(f'INSERT INTO pepper_emotion_table VALUES ({", ".join("?" * 11)})', emotions)
+        mirror.connection.executemany('INSERT INTO pepper_use_case_table VALUES (?, ?, ?, ?)', use_cases)
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark reports from daily rollups against GROUP BY queries')
+    parser.add_argument('-n', type=int, nargs='+', dest='sizes', default=[100000], help='interactions in the mirror')
+    parser.add_argument('-d', type=int, dest='days', default=365, help='days the interactions are spread over')
+    args = parser.parse_args()
+
+    today = datetime.now(timezone.utc).date()
+    print(f'{"rows":>8} {"days":>5} {"weeks":>6} {"rollup rows":>12} {"update s":>9} {"GROUP BY s":>11} {"rollups s":>10} {"ms / report":>12}')
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            with Mirror(os.path.join(directory, 'mirror.db')) as mirror, RollupStore(os.path.join(directory, 'rollups.db')) as store:
+                fill(mirror, n, args.days)
+
+                start = time.perf_counter()
+                rows = sum(store.update(mirror, dialect='sqlite', until=today).values())
+                updated = time.perf_counter()
+
+                weeks = periods('week', store.watermark('pepper_emotion_table')[0], today)
+                for first, end in weeks:
+                    QueryPlan(PANELS, where=f"WHERE ts >= '{first}' AND ts < '{end}'", dialect='sqlite').run(mirror)
+                grouped = time.perf_counter()
+
+                for first, end in weeks:
+                    store.panels(PANELS, first, end)
+                merged = time.perf_counter()
+
+            print(
+                f'{n:>8} {args.days:>5} {len(weeks):>6} {rows:>12} {updated - start:>9.3f} {grouped - updated:>11.3f} '
+                f'{merged - grouped:>10.3f} {(merged - grouped) / max(len(weeks), 1) * 1000:>12.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+'''
+    bench_service.py
+    ===================================
+
+    Startup cost of the report: builds the same report from a SQLite Mirror filled with
+    synthetic interactions {runs} times with a cold start of the weekly-report.py command
+    line (python, pandas, numpy and matplotlib are loaded and the mirror is opened for every
+    report, like a cron job does) and {runs} times through one warm service process
+    (weekly-report.py --serve, POST /report). The service is started once, its startup
+    is reported on its own.
+
+    report s is the time of the stages (sync, aggregate, render) measured inside the
+    process, overhead s is what each report costs on top of it (interpreter, imports,
+    setup and teardown of the CLI or the HTTP round trip of the service).
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_service.py -n 100000 --runs 5
+    mode            runs  startup s  first s  median s  report s  overhead s
+    cold CLI           5          -    4.024     3.863     2.549       1.289
+    warm service       5      0.960    2.577     2.577     2.574       0.002
+
+    (single cpu, pages rendered in the process, -w 0) Every cold report pays ~1.3 s for
+    the interpreter, the imports and the setup, the service pays them once at startup.
+    What remains is the GROUP BY over the 100k rows of the mirror and the rendering.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import re
+import json
+import time
+import subprocess
+import tempfile
+import statistics
+import urllib.request
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Mirror import Mirror
+from bench_render import fill
+
+ANALYSIS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ANALYSIS, 'weekly-report.py')
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def cold(arguments: list) -> tuple:
+    '''Runs the command line once and returns (wall seconds, seconds of the stages).'''
+    start = time.perf_counter()
+    stderr = subprocess.run(
+        [sys.executable, SCRIPT, *arguments, '--metrics'], cwd=ANALYSIS, check=True, capture_output=True, text=True
+    ).stderr
+    wall = time.perf_counter() - start
+    return wall, float(re.search(r'total ([\d.]+)s', stderr).group(1))
+
+def warm(arguments: list, start: str, end: str, runs: int) -> tuple:
+    '''Starts the service and returns (startup seconds, [(wall seconds, seconds of the stages), ...]).'''
+    started = time.perf_counter()
+    service = subprocess.Popen(
+        [sys.executable, SCRIPT, *arguments, '--serve', '127.0.0.1:0'], cwd=ANALYSIS, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        for line in service.stdout:
+            match = re.search(r'Serving (http://\S+)', line)
+            if match is not None:
+                break
+        else:
+            raise RuntimeError('The service did not start')
+        startup = time.perf_counter() - started
+
+        results = []
+        for _ in range(runs):
+            request = urllib.request.Request(f'{match.group(1)}/report?start={start}&end={end}', method='POST')
+            begin = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                job = json.loads(response.read())
+            results.append((time.perf_counter() - begin, job['timings']['total']))
+        return startup, results
+    finally:
+        service.terminate()
+        service.wait()
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark cold command line runs against the warm report service')
+    parser.add_argument('-n', type=int, dest='size', default=100000, help='interactions in the mirror')
+    parser.add_argument('--runs', type=int, dest='runs', default=5, help='reports per mode')
+    parser.add_argument('-w', type=int, dest='workers', default=0, help='render processes of the report')
+    args = parser.parse_args()
+
+    today = datetime.now(timezone.utc).date()
+    start, end = today - timedelta(days=7), today + timedelta(days=1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'mirror.db')
+        with Mirror(path) as mirror:
+            fill(mirror, args.size)
+        arguments = ['--mirror', path, '--offline', '-w', str(args.workers), '-o', directory]
+
+        cold_results = [cold([*arguments, '--start', str(start), '--end', str(end)]) for _ in range(args.runs)]
+        startup, warm_results = warm(arguments, start, end, args.runs)
+
+    print(f'{"mode":<14} {"runs":>5} {"startup s":>10} {"first s":>8} {"median s":>9} {"report s":>9} {"overhead s":>11}')
+    for mode, startup, results in [('cold CLI', None, cold_results), ('warm service', startup, warm_results)]:
+        walls, reports = [wall for wall, _ in results], [report for _, report in results]
+        print(
+            f'{mode:<14} {len(results):>5} {"-" if startup is None else f"{startup:.3f}":>10} {walls[0]:>8.3f} '
+            f'{statistics.median(walls):>9.3f} {statistics.median(reports):>9.3f} '
+            f'{statistics.median(wall - report for wall, report in results):>11.3f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
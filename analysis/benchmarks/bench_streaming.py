@@ -0,0 +1,128 @@
+'''
+    bench_streaming.py
+    ===================================
+
+    Peak memory of the report statistics over large exports: synthetic pepper tables with
+    {n} interactions (see bench_pipeline.py) are written as {parts} csv files per table and
+    the panels of the report are computed in a fresh process each
+
+        full       all files read into one DataFrame per table, preprocessed and
+                   aggregated in pandas (like main.ipynb)
+        stream     one StreamState per table over chunks of {chunk_rows} rows (streaming.py)
+        parallel   one StreamState per file in {workers} processes, merged afterwards
+
+    match compares the interactions and the mean dialog time per weekday with full.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_streaming.py -n 1000000 -w 2
+    mode        seconds   rows/sec   peak MiB  match
+    full          8.092    123,576      824.2  True
+    stream        9.659    103,532      283.8  True
+    parallel     10.055     99,451      177.3  True
+
+    (single cpu, peak of the main process, ~170 MiB are the imports, each worker of
+    parallel peaks like stream) Reading the csv dominates all modes; the full frames grow
+    with the rows, the states stay at their ~5,400 (emotions) and ~1,000 (use cases)
+    groups, only the chunk being read grows with {chunk_rows}.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import json
+import time
+import subprocess
+import tempfile
+from argparse import ArgumentParser, SUPPRESS
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import preprocessing
+from streaming import StreamState, aggregate_files, panels, read_chunks
+from bench_pipeline import synthesize, peak_rss
+from bench_pushdown import PANELS, aggregate_frames
+
+MODES = ['full', 'stream', 'parallel']
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def export(directory: str, n: int, parts: int) -> dict:
+    '''Writes {n} synthetic interactions as {parts} csv files per table, returns { table: [paths] }.'''
+    files = {}
+    for table, df in synthesize(n).items():
+        df['ts'] = df['ts'].str.replace(' ', 'T') + '.000Z' # like the api returns it
+        files[table] = []
+        for i, part in enumerate(np.array_split(np.arange(len(df)), parts)):
+            path = os.path.join(directory, f'{table}_{i}.csv')
+            df.iloc[part].to_csv(path, index=False)
+            files[table].append(path)
+    return files
+
+def run(mode: str, files: dict, workers: int, chunk_rows: int) -> dict:
+    '''Computes the panels in {mode} and returns seconds, peak memory and the values compared by match.'''
+    start = time.perf_counter()
+    if mode == 'full':
+        emotion_states_df, use_case_df = (
+            preprocessing.preprocess(pd.concat([pd.read_csv(path) for path in files[table]], ignore_index=True))
+            for table in ('pepper_emotion_table', 'pepper_use_case_table')
+        )
+        frames = aggregate_frames(emotion_states_df, use_case_df)
+        interactions = frames['emotion_by_weekday'].sum(axis=1)
+        dialog_time = frames['dialog_time_by_weekday']
+    else:
+        if mode == 'stream':
+            states = [
+                StreamState(table).consume(chunk for path in paths for chunk in read_chunks(path, chunk_rows))
+                for table, paths in files.items()
+            ]
+        else:
+            states = [aggregate_files(table, paths, workers, chunk_rows) for table, paths in files.items()]
+        frames = panels(states, PANELS)
+        interactions = frames['emotion_by_weekday'].groupby(level='weekday')['count'].sum()
+        dialog_time = frames['dialog_time_by_weekday']['mean_dialog_time']
+
+    return {
+        'seconds': time.perf_counter() - start, 'peak_mib': peak_rss(),
+        'interactions': interactions.sort_index().astype(int).tolist(),
+        'dialog_time': dialog_time.sort_index().round(6).tolist()
+    }
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark the peak memory of full frames against the streaming aggregation')
+    parser.add_argument('-n', type=int, dest='size', default=1000000, help='interactions')
+    parser.add_argument('-p', type=int, dest='parts', default=4, help='files per table')
+    parser.add_argument('-w', type=int, dest='workers', default=None, help='processes of the parallel mode')
+    parser.add_argument('-c', type=int, dest='chunk_rows', default=100000, help='rows per chunk')
+    parser.add_argument('--run', nargs=2, default=None, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None: # one mode, in its own process
+        mode, files = args.run
+        with open(files) as f:
+            print(json.dumps(run(mode, json.load(f), args.workers, args.chunk_rows)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = os.path.join(directory, 'files.json')
+        with open(files, 'w') as f:
+            json.dump(export(directory, args.size, args.parts), f)
+
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', mode, files, '-c', str(args.chunk_rows)]
+                + (['-w', str(args.workers)] if args.workers else []),
+                check=True, capture_output=True, text=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f'{"mode":<10} {"seconds":>8} {"rows/sec":>10} {"peak MiB":>10}  match')
+    for mode, result in results.items():
+        match = result['interactions'] == results['full']['interactions'] and np.allclose(result['dialog_time'], results['full']['dialog_time'])
+        print(f'{mode:<10} {result["seconds"]:>8.3f} {args.size / result["seconds"]:>10,.0f} {result["peak_mib"]:>10.1f}  {match}')
+
+
+if __name__ == '__main__':
+    main()
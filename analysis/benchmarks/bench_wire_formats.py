@@ -0,0 +1,128 @@
+'''
+    bench_wire_formats.py
+    ===================================
+
+    Serves the same synthetic pepper_emotion_table result from a local stand-in of the
+    sql endpoint in every wire format the Client can negotiate (json rows, columnar json,
+    ndjson and - if pyarrow is installed - Arrow IPC), with and without gzip, and reports
+    the bytes on the wire and the time of Client.query_frame (transfer + decode).
+
+    ----- E X A M P L E -----
+    analysis~$ python3 benchmarks/bench_wire_formats.py -n 100000
+    rows: 100000
+    format     encoding     wire MiB   seconds     rows/sec
+    json       identity        27.32     0.746      134,070
+    json       gzip             2.00     0.826      121,049
+    ndjson     identity        27.22     0.631      158,443
+    ndjson     gzip             2.00     0.644      155,166
+    columns    identity        13.30     0.297      336,884
+    columns    gzip             1.29     0.355      281,751
+    arrow      identity        16.86     0.304      329,222
+    arrow      gzip             2.35     0.231      432,030
+
+    The web app has to enable the compression middleware and offer the formats, until
+    then the Client keeps receiving plain json.
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import os, sys
+import io
+import gzip
+import json
+import time
+import threading
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Client import Client
+import schema
+from bench_decode import make_response
+
+# ----- S T A N D - I N ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def encode_bodies(rows: list) -> dict:
+    '''Returns the body of the result for every supported content type.'''
+    columns = list(rows[0])
+    bodies = {
+        schema.JSON: json.dumps(rows).encode(),
+        schema.COLUMNS_JSON: json.dumps({ 'columns': columns, 'data': [[row[c] for row in rows] for c in columns] }).encode(),
+        schema.NDJSON: '\n'.join(json.dumps(row) for row in rows).encode()
+    }
+    if schema.pyarrow is not None:
+        table = schema.pyarrow.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+        sink = io.BytesIO()
+        with schema.pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        bodies[schema.ARROW] = sink.getvalue()
+    return bodies
+
+def start_stand_in(bodies: dict) -> tuple:
+    gzipped = { content_type: gzip.compress(body, compresslevel=6) for content_type, body in bodies.items() }
+    sent = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            accepted = [part.split(';')[0].strip() for part in self.headers.get('Accept', '').split(',')]
+            content_type = next((c for c in accepted if c in bodies), schema.JSON)
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = (gzipped if use_gzip else bodies)[content_type]
+            sent['bytes'] = len(body)
+
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            if use_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, sent
+
+# ----- B E N C H M A R K ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark the wire formats of the sql endpoint')
+    parser.add_argument('-n', type=int, dest='n', default=100000, help='rows of the result | default: 100000')
+    parser.add_argument('-r', '--repeat', type=int, dest='repeat', default=3, help='runs per format, the best is reported | default: 3')
+    args = parser.parse_args()
+
+    bodies = encode_bodies(json.loads(make_response(args.n)))
+    server, sent = start_stand_in(bodies)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    formats = [f for f, content_type in Client.WIRE_FORMATS.items() if content_type in bodies]
+
+    print(f'rows: {args.n}')
+    print(f'{"format":<10} {"encoding":<10} {"wire MiB":>10} {"seconds":>9} {"rows/sec":>12}')
+    for wire_format in reversed(formats):
+        for encoding in ['identity', 'gzip']:
+            with Client('bench', verbose=1, url=url, wire_format=wire_format) as client:
+                client.session.headers['Accept-Encoding'] = encoding
+                seconds = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    df = client.query_frame('SELECT * FROM pepper_emotion_table')
+                    seconds.append(time.perf_counter() - start)
+                assert len(df) == args.n
+
+            best = min(seconds)
+            print(f'{wire_format:<10} {encoding:<10} {sent["bytes"] / 2 ** 20:>10.2f} {best:>9.3f} {args.n / best:>12,.0f}')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
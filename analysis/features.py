@@ -0,0 +1,245 @@
+'''
+    features.py
+    ===================================
+
+    Inputs of the models of main.ipynb: stable integer codes for the state columns of the
+    pepper_emotion_table, tf.data pipelines for training and vectorized metrics.
+
+    The codes come from vocabularies, not from the order in which values happen to show
+    up in a query: the values of schema.CATEGORIES keep their position, values that are
+    not declared are appended in sorted order when the encoder is fitted. A saved encoder
+    (json) maps the same value to the same code in every later run, so a trained model can
+    be used with new data. Values the encoder has never seen get the code -1.
+
+    ----- E X A M P L E -----
+    > encoder = FeatureEncoder(target='gender').fit(data)
+    > encoder.save('models/gender_features.json')
+    > X, y = encoder.transform(data)                   # float32 [rows, 7], int32 [rows]
+    > model.fit(dataset(X, y, batch_size=256, seed=42), epochs=20)
+    > classification_metrics(y, model.predict(dataset(X, batch_size=1024, shuffle=False)))['accuracy']
+    0.5083
+
+    > # tables that do not fit into memory are read chunk by chunk in every epoch
+    > query = 'SELECT data_id, distance, age, gender, ... FROM pepper_emotion_table'
+    > model.fit(chunked_dataset(lambda: client.iter_query(query, chunk_rows=50000), encoder), epochs=20)
+'''
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import tensorflow as tf
+except ImportError: # only needed for the tf.data pipelines
+    tf = None
+
+import preprocessing
+import schema
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+# columns of the pepper_emotion_table the models learn from, in the order of the feature matrix
+FEATURES = ['distance', 'age', 'gender', 'basic_emotion', 'pleasure_state', 'excitement_state', 'smile_state', 'dialog_time']
+
+UNKNOWN = -1
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def _require_tensorflow() -> None:
+    if tf is None:
+        raise ImportError('The tf.data pipelines require tensorflow (see requirements.txt)')
+
+def dataset(X: np.ndarray, y: np.ndarray=None, batch_size: int=256, shuffle: bool=True, seed: int=None, buffer_size: int=None):
+    '''Returns a tf.data.Dataset of the in-memory features {X} (and targets {y}) in batches
+        of {batch_size}, shuffled in every epoch and prefetched while the model trains.
+
+        ----- Keyword arguments -----
+        buffer_size: rows to shuffle among, default: all
+    '''
+    _require_tensorflow()
+    ds = tf.data.Dataset.from_tensor_slices(X if y is None else (X, y))
+    if shuffle:
+        ds = ds.shuffle(buffer_size or len(X), seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def chunked_dataset(chunks, encoder, batch_size: int=256, shuffle: bool=True, seed: int=None, buffer_size: int=10000):
+    '''Returns a tf.data.Dataset that encodes the rows of {chunks} with {encoder} (FeatureEncoder)
+        while it is read, so the table never has to fit into memory.
+
+        ----- Keyword arguments -----
+        chunks: function returning an iterable of DataFrames (e.g. lambda: client.iter_query(...)),
+            called again in every epoch
+        buffer_size: rows to shuffle among
+    '''
+    _require_tensorflow()
+    def generate():
+        for chunk in chunks():
+            X, y = encoder.transform(chunk)
+            yield X, y
+
+    ds = tf.data.Dataset.from_generator(generate, output_signature=(
+        tf.TensorSpec(shape=(None, len(encoder.features)), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(encoder.target_dtype))
+    )).unbatch()
+    if shuffle:
+        ds = ds.shuffle(buffer_size, seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def classification_metrics(y_true, scores, threshold: float=0.5) -> dict:
+    '''Returns accuracy, confusion matrix (rows: true, columns: predicted), precision and
+        recall per class of the predictions {scores} (probabilities of class 1 or one column
+        per class, as Model.predict returns them).
+    '''
+    y_true = np.asarray(y_true).astype('int64').ravel()
+    scores = np.asarray(scores)
+    if scores.ndim == 2 and scores.shape[1] > 1:
+        y_pred = scores.argmax(axis=1)
+    else:
+        y_pred = (scores.ravel() >= threshold).astype('int64')
+
+    classes = int(max(y_true.max(initial=0), y_pred.max(initial=0))) + 1
+    confusion = np.bincount(y_true * classes + y_pred, minlength=classes ** 2).reshape(classes, classes)
+    hits = np.diag(confusion)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'accuracy': float(hits.sum() / max(len(y_true), 1)),
+            'confusion': confusion,
+            'precision': hits / confusion.sum(axis=0),
+            'recall': hits / confusion.sum(axis=1)
+        }
+
+def regression_metrics(y_true, y_pred) -> dict:
+    '''Returns mean absolute error, root mean squared error and r2 of the predictions {y_pred}.'''
+    y_true, y_pred = np.asarray(y_true, dtype='float64').ravel(), np.asarray(y_pred, dtype='float64').ravel()
+    error = y_pred - y_true
+    variance = ((y_true - y_true.mean()) ** 2).sum()
+    return {
+        'mae': float(np.abs(error).mean()),
+        'rmse': float(np.sqrt((error ** 2).mean())),
+        'r2': float(1 - (error ** 2).sum() / variance) if variance else float('nan')
+    }
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class CategoricalEncoder(object):
+    '''
+        Maps the values of categorical columns to stable integer codes (see module docstring).
+
+        ------ P A R A M E T E R S ------
+        :param columns: list
+            Categorical columns to encode
+        :param vocabularies: dict | optional
+            Column -> values in the order of their codes | default: schema.CATEGORIES
+    '''
+
+    def __init__(self, columns: list, vocabularies: dict=None):
+        vocabularies = vocabularies or {}
+        self.columns = list(columns)
+        self.vocabularies = {
+            column: list(vocabularies.get(column, schema.CATEGORIES.get(column, []))) for column in self.columns
+        }
+
+    def fit(self, df: pd.DataFrame) -> 'CategoricalEncoder':
+        '''Appends the values of {df} that are not in the vocabularies yet, existing codes never change.'''
+        for column in self.columns:
+            if column not in df.columns:
+                continue
+            values = pd.unique(df[column].dropna().astype(str))
+            known = set(self.vocabularies[column])
+            self.vocabularies[column].extend(sorted(value for value in values if value not in known))
+        return self
+
+    def codes(self, values: pd.Series, column: str) -> np.ndarray:
+        '''Returns the codes (int32, -1 for unknown values and nulls) of the {values} of {column}.'''
+        if isinstance(values.dtype, pd.CategoricalDtype): # only the categories are looked up
+            lookup = pd.Categorical(values.cat.categories.astype(str), categories=self.vocabularies[column]).codes
+            codes = values.cat.codes.to_numpy()
+            return np.where(codes >= 0, lookup.take(codes), UNKNOWN).astype('int32')
+        return pd.Categorical(values.astype('string'), categories=self.vocabularies[column]).codes.astype('int32')
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        '''Returns a copy of {df} whose categorical columns are replaced by their codes.'''
+        df = df.copy()
+        for column in self.columns:
+            if column in df.columns:
+                df[column] = self.codes(df[column], column)
+        return df
+
+    def inverse_transform(self, codes, column: str) -> np.ndarray:
+        '''Returns the values of the {codes} of {column}, None for unknown codes.'''
+        vocabulary = np.asarray(self.vocabularies[column] + [None], dtype=object)
+        codes = np.asarray(codes, dtype='int64')
+        return vocabulary[np.where((codes >= 0) & (codes < len(vocabulary) - 1), codes, -1)]
+
+    def to_dict(self) -> dict:
+        return { 'columns': self.columns, 'vocabularies': self.vocabularies }
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'CategoricalEncoder':
+        return cls(config['columns'], config['vocabularies'])
+
+
+class FeatureEncoder(object):
+    '''
+        Turns rows of the pepper_emotion_table into the float32 feature matrix and the target
+        vector (int32 codes of a categorical target, float32 values of a numeric one) of a
+        model: categorical columns become their stable codes, numeric columns are converted
+        like preprocessing.to_numeric does.
+
+        ------ P A R A M E T E R S ------
+        :param target: str | optional
+            Column to predict, categorical targets are encoded too | default: 'gender'
+        :param features: list | optional
+            Columns of the feature matrix | default: FEATURES without {target}
+        :param vocabularies: dict | optional
+            See CategoricalEncoder
+    '''
+
+    def __init__(self, target: str='gender', features: list=None, vocabularies: dict=None):
+        self.target = target
+        self.features = list(features if features is not None else [column for column in FEATURES if column != target])
+        self.categorical = CategoricalEncoder(
+            [column for column in self.features + [target] if column in preprocessing.CATEGORICAL_COLUMNS], vocabularies
+        )
+
+    @property
+    def target_dtype(self) -> str:
+        return 'int32' if self.target in self.categorical.columns else 'float32'
+
+    def fit(self, df: pd.DataFrame) -> 'FeatureEncoder':
+        self.categorical.fit(df)
+        return self
+
+    def transform(self, df: pd.DataFrame) -> tuple:
+        '''Returns (X, y) of the rows of {df}, y is None if {df} has no target column.'''
+        missing = [column for column in self.features if column not in df.columns]
+        if missing:
+            raise ValueError(f'The rows have no column(s) {missing}')
+
+        X = np.empty((len(df), len(self.features)), dtype='float32')
+        for i, column in enumerate(self.features):
+            X[:, i] = self._column(df[column], column)
+        y = self._column(df[self.target], self.target).astype(self.target_dtype) if self.target in df.columns else None
+        return X, y
+
+    def _column(self, values: pd.Series, column: str) -> np.ndarray:
+        if column in self.categorical.columns:
+            return self.categorical.codes(values, column)
+        return pd.to_numeric(values).to_numpy(dtype='float32', na_value=np.nan)
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump({ 'target': self.target, 'features': self.features, **self.categorical.to_dict() }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'FeatureEncoder':
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config['target'], config['features'], config['vocabularies'])
@@ -0,0 +1,233 @@
+'''
+    figures.py
+    ===================================
+
+    Pages of the weekly report as independent render tasks. Every page function only gets
+    the (aggregated) panel frames it needs and draws into its own figure, so the pages can
+    be rendered in a process pool with the Agg backend.
+
+    write_report lets every worker draw its page and save it as a finished one page pdf,
+    the main process only appends these pages in the order of PAGES (pypdf) and writes
+    the file, so drawing and pdf encoding both run in parallel. Without pypdf (or without
+    a pool) render_report is used: the workers only lay out the figures and measure their
+    tight bounding box, the main process writes them into the PdfPages one by one. Pages
+    whose panels did not change since the last report can be taken from a ReportCache
+    (see report_cache.py) instead.
+
+    ----- E X A M P L E -----
+    > setup()
+    > write_report('report.pdf', panels, { 'Title': 'Weekly report' }, workers=4)
+
+    > with PdfPages('report.pdf') as pdf:   # figures only
+    >     render_report(pdf, panels, workers=4)
+'''
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+try:
+    import pypdf
+except ImportError: # pages are written by the main process then, see render_report
+    pypdf = None
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+_red, _orange, _gray, _green, _blue = '#fc4f30', '#e5ae38', '#8b8b8b', '#6d904f', '#30a2da'
+_weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+EMOTION_COLORS = { 'bad': _red, 'bored': _gray, 'excited': _orange, 'good': _green }
+PLEASURE_COLORS = { 'bad': _red, 'medium': _gray, 'good': _orange, 'perfect': _green }
+
+# ----- S E T U P ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def setup() -> None:
+    '''Selects the Agg backend and the style of the report (in the main process and in every worker).'''
+    matplotlib.use('Agg')
+    plt.rcParams['figure.figsize'] = [10, 6]
+    plt.rcParams['savefig.bbox'] = 'tight'
+    plt.style.use('fivethirtyeight')
+
+# ----- P A G E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def _counts(frame):
+    '''Counts of a one dimensional panel, largest first (like value_counts).'''
+    return frame['count'].sort_values(ascending=False)
+
+def _crosstab(frame):
+    '''Counts of a two dimensional panel, first dimension as index, second as columns.'''
+    return frame['count'].unstack(level=1, fill_value=0)
+
+def _weekday_labels(ax) -> None:
+    ax.set_xticks(range(len(ax.get_xticklabels())))
+    ax.set_xticklabels([_weekdays[int(label.get_text())] for label in ax.get_xticklabels()], rotation=35)
+    ax.set_xlabel('weekday')
+
+def use_case_pie(ax, use_case) -> None:
+    _counts(use_case).plot(kind='pie', autopct='%1.1f%%', ax=ax)
+    ax.set_title('Use-Case usage'); ax.axis('off')
+
+def gender_pie(ax, gender) -> None:
+    _counts(gender).plot(kind='pie', autopct='%1.1f%%', colors=[ _red, _blue ], ax=ax)
+    ax.set_title('Gender distribution'); ax.axis('off')
+
+def basic_emotion_pie(ax, basic_emotion) -> None:
+    _counts(basic_emotion).plot(kind='pie', autopct='%1.1f%%', colors=[ _gray, _red, _orange, _green ], ax=ax)
+    ax.set_title('Distribution of basic emotion occurrence'); ax.axis('off')
+
+def emotion_by_gender(ax, emotion_by_gender) -> None:
+    _crosstab(emotion_by_gender).plot(kind='barh', color=EMOTION_COLORS, ax=ax)
+    ax.set_title('Distributions of basic emotions grouped by gender'); ax.set_xlabel('count')
+
+def pleasure_by_gender(ax, pleasure_by_gender) -> None:
+    _crosstab(pleasure_by_gender).plot(kind='barh', color=PLEASURE_COLORS, ax=ax)
+    ax.set_title('Distribution of pleasure states grouped by gender')
+
+def emotion_by_weekday(ax, emotion_by_weekday) -> None:
+    _crosstab(emotion_by_weekday).plot(kind='bar', color=EMOTION_COLORS, ax=ax)
+    ax.set_title('Distribution of basic emotions grouped by weekday')
+    _weekday_labels(ax); ax.set_ylabel('count')
+
+def gender_by_weekday(ax, gender_by_weekday) -> None:
+    _crosstab(gender_by_weekday).plot(kind='bar', ax=ax)
+    ax.set_title('Usage by gender and weekday')
+    _weekday_labels(ax); ax.set_ylabel('count')
+
+def dialog_time_by_weekday(ax, dialog_time_by_weekday) -> None:
+    dialog_time_by_weekday[['mean_dialog_time']].rename(columns={ 'mean_dialog_time': 'dialog_time' }).plot(kind='bar', ax=ax)
+    ax.set_title('Mean dialog time by weekday')
+    _weekday_labels(ax); ax.set_ylabel('dialog time in minutes')
+
+def use_case_by_weekday(ax, use_case_by_weekday) -> None:
+    _crosstab(use_case_by_weekday).plot(kind='bar', ax=ax)
+    ax.set_title('Use case by weekday')
+    _weekday_labels(ax); ax.set_ylabel('count')
+
+# pages of the report in order, the panel names are the parameters of each page function
+PAGES = [
+    (use_case_pie, ['use_case']),
+    (gender_pie, ['gender']),
+    (basic_emotion_pie, ['basic_emotion']),
+    (emotion_by_gender, ['emotion_by_gender']),
+    (pleasure_by_gender, ['pleasure_by_gender']),
+    (emotion_by_weekday, ['emotion_by_weekday']),
+    (gender_by_weekday, ['gender_by_weekday']),
+    (dialog_time_by_weekday, ['dialog_time_by_weekday']),
+    (use_case_by_weekday, ['use_case_by_weekday'])
+]
+
+# ----- R E N D E R I N G ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def render_page(page, frames: list) -> tuple:
+    '''Draws one page and returns (figure, tight bounding box in inches).'''
+    fig, ax = plt.subplots()
+    try:
+        if all(frame.empty for frame in frames): # e.g. a table without rows in the range
+            ax.text(0.5, 0.5, 'No data', ha='center', va='center', transform=ax.transAxes)
+            ax.set_title(page.__name__.replace('_', ' ').capitalize()); ax.axis('off')
+        else:
+            page(ax, *frames)
+        fig.draw_without_rendering() # lays out the page, so the bounding box is final
+        bbox = fig.get_tightbbox().padded(plt.rcParams['savefig.pad_inches'])
+        return fig, bbox
+    finally:
+        plt.close(fig) # only detaches it from pyplot, it is still saved afterwards
+
+def render_pdf_page(page, frames: list) -> bytes:
+    '''Draws one page and returns it as one page pdf.'''
+    fig, bbox = render_page(page, frames)
+    with io.BytesIO() as buffer:
+        fig.savefig(buffer, format='pdf', bbox_inches=bbox)
+        return buffer.getvalue()
+
+def pool(workers: int=None):
+    '''Returns a process pool for render_report or None if the pages are rendered in this process.
+
+        ----- Keyword arguments -----
+        workers: int | Processes rendering pages | default: one per page and cpu, 0 or 1 render in this process
+    '''
+    if workers is None:
+        workers = min(len(PAGES), os.cpu_count() or 1)
+    return ProcessPoolExecutor(max_workers=workers, initializer=setup) if workers > 1 else None
+
+def render_report(pdf, panels: dict, workers: int=None, executor=None, cache=None) -> None:
+    '''Renders all PAGES from {panels} (name -> frame of the QueryPlan) and writes them
+        into {pdf} in order.
+
+        ----- Keyword arguments -----
+        pdf: PdfPages | Multi page pdf the pages are saved to
+        panels: dict | Aggregated frames of the report panels
+        workers: int | See pool, ignored if {executor} is given
+        executor: ProcessPoolExecutor | Pool of several reports (see pool) | default: a pool for this report
+        cache: ReportCache | Pages whose panels did not change are taken from it (see report_cache.py) | default: None
+    '''
+    tasks = [(page, [panels[name] for name in names]) for page, names in PAGES]
+    cached = [cache.page(page, frames) if cache is not None else None for page, frames in tasks]
+    missing = [task for task, result in zip(tasks, cached) if result is None]
+    own = executor is None
+    if own and missing:
+        executor = pool(workers)
+
+    if not missing:
+        results = iter(())
+    elif executor is not None:
+        results = executor.map(render_page, *zip(*missing)) # yields in order of PAGES, as soon as each is done
+    else:
+        results = (render_page(page, frames) for page, frames in missing)
+
+    try:
+        for (page, frames), result in zip(tasks, cached):
+            if result is None:
+                result = next(results)
+                if cache is not None:
+                    cache.put_page(page, frames, result)
+            fig, bbox = result
+            pdf.savefig(fig, bbox_inches=bbox)
+            plt.close(fig)
+    finally:
+        if own and executor is not None:
+            executor.shutdown()
+
+def write_report(path: str, panels: dict, metadata: dict=None, workers: int=None, executor=None, cache=None) -> None:
+    '''Renders all PAGES from {panels} and writes them in order into the pdf file {path}
+        with the document info {metadata} (Title, Author, ...).
+
+        ----- Keyword arguments -----
+        workers, executor, cache: See render_report
+    '''
+    own = executor is None
+    if own:
+        executor = pool(workers)
+    try:
+        if pypdf is None or executor is None: # figures are written here
+            with PdfPages(path) as pdf:
+                render_report(pdf, panels, workers=0, executor=executor, cache=cache)
+                pdf.infodict().update(metadata or {}, CreationDate=datetime.now())
+            return
+
+        tasks = [(page, [panels[name] for name in names]) for page, names in PAGES]
+        cached = [cache.page(page, frames, format='pdf') if cache is not None else None for page, frames in tasks]
+        missing = [task for task, result in zip(tasks, cached) if result is None]
+        results = executor.map(render_pdf_page, *zip(*missing)) if missing else iter(()) # in order of PAGES
+
+        writer = pypdf.PdfWriter()
+        for (page, frames), result in zip(tasks, cached):
+            if result is None:
+                result = next(results)
+                if cache is not None:
+                    cache.put_page(page, frames, result, format='pdf')
+            writer.append(pypdf.PdfReader(io.BytesIO(result)))
+        writer.add_metadata({
+            **{ f'/{key}': str(value) for key, value in (metadata or {}).items() },
+            '/CreationDate': datetime.now().strftime("D:%Y%m%d%H%M%S")
+        })
+        with open(path, 'wb') as f:
+            writer.write(f)
+    finally:
+        if own and executor is not None:
+            executor.shutdown()
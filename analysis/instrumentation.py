@@ -0,0 +1,162 @@
+'''
+    instrumentation.py
+    ===================================
+
+    Per-request timings of the Client. A TimedHTTPAdapter records how long the setup of
+    new connections takes (name resolution, TCP connect and TLS handshake), the Client adds time to first byte, download, decode, bytes and row count and passes
+    one record per request to its registered hooks.
+
+    Metrics is such a hook: it keeps the values of the last {window} requests and
+    reports p50/p95/p99 per field, e.g. at the exit of a script. timed measures the
+    stages of a job (sync, aggregate, render, ...) the same way.
+
+    ----- E X A M P L E -----
+    > metrics = Metrics()
+    > client = Client(API_KEY='n6C?q*QuDA', sandbox=True, hooks=[metrics])
+    > atexit.register(metrics.dump)
+    > client.sql_query('SELECT * FROM pepper_emotion_table')
+    ...
+    field                count       mean        p50        p95        p99
+    connect_ms               1       0.63       0.63       0.63       0.63
+    ttfb_ms                  2      14.80      14.80      26.47      27.51
+    ...
+'''
+
+import sys
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_local = threading.local()
+
+# ----- C O N N E C T I O N - T I M I N G S ----- ----- ----- ----- ----- ----- ----- -----
+
+def start_request() -> dict:
+    '''Resets and returns the connection timings of the current thread.'''
+    _local.timings = { 'connect': 0.0, 'new_connections': 0 }
+    return _local.timings
+
+def _timings() -> dict:
+    timings = getattr(_local, 'timings', None)
+    return timings if timings is not None else start_request()
+
+
+class _TimedConnectionMixin(object):
+    '''Times the setup of new connections (name resolution, TCP connect and TLS handshake).
+
+        Only the public connect() of http.client is wrapped, everything inside it (address
+        fallback, proxies, TLS) stays urllib3's own and the connection is not modified.
+    '''
+
+    def connect(self):
+        timings = _timings()
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            timings['connect'] += time.perf_counter() - start
+        timings['new_connections'] += 1
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    '''HTTPAdapter whose connections record their setup timings (see start_request).'''
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+# ----- M E T R I C S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class Metrics(object):
+    '''
+        Hook for the Client that keeps a rolling window of the last {window} request
+        records and reports count, mean and p50/p95/p99 per field.
+
+        ------ P A R A M E T E R S ------
+        :param window: int | optional
+            Number of requests the percentiles are computed over
+    '''
+
+    TIME_FIELDS = ['connect', 'ttfb', 'download', 'decode', 'total']
+    SIZE_FIELDS = ['request_bytes', 'response_bytes', 'rows', 'retries']
+
+    def __init__(self, window: int=1000):
+        self.window = window
+        self.requests, self.errors = 0, 0
+        self._values = { field: deque(maxlen=window) for field in self.TIME_FIELDS + self.SIZE_FIELDS }
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> None:
+        with self._lock:
+            self.requests += 1
+            if record.get('error') is not None:
+                self.errors += 1
+            for field, values in self._values.items():
+                if record.get(field) is not None:
+                    values.append(record[field])
+
+    def summary(self) -> dict:
+        '''Returns { field: { count, mean, p50, p95, p99 } }, times in milliseconds.'''
+        summary = {}
+        with self._lock:
+            for field, values in self._values.items():
+                if not values:
+                    continue
+                array = np.asarray(values, dtype='float64')
+                name = field
+                if field in self.TIME_FIELDS:
+                    array, name = array * 1000, f'{field}_ms'
+                p50, p95, p99 = np.percentile(array, [50, 95, 99])
+                summary[name] = { 'count': len(array), 'mean': array.mean(), 'p50': p50, 'p95': p95, 'p99': p99 }
+        return summary
+
+    def dump(self, file=None) -> None:
+        '''Prints the summary as table, e.g. registered with atexit.register(metrics.dump).'''
+        file = file or sys.stderr
+        print(f'requests: {self.requests} | errors: {self.errors}', file=file)
+        print(f'{"field":<16} {"count":>8} {"mean":>10} {"p50":>10} {"p95":>10} {"p99":>10}', file=file)
+        for field, stats in self.summary().items():
+            print(
+                f'{field:<16} {stats["count"]:>8} {stats["mean"]:>10.2f} {stats["p50"]:>10.2f} '
+                f'{stats["p95"]:>10.2f} {stats["p99"]:>10.2f}', file=file
+            )
+
+# ----- S T A G E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    '''Adds the seconds the with block takes to {timings}[{stage}], also if it raises.
+
+        > timings = {}
+        > with timed(timings, 'render'):
+        >     ...
+        > timings
+        {'render': 1.21}
+    '''
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
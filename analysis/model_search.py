@@ -0,0 +1,192 @@
+'''
+    model_search.py
+    ===================================
+
+    Parallel search over the architecture and training parameters of the fully-connected
+    network of main.ipynb (get_basic_model: 18-12-8-1, adam, 20 epochs, batch size 5).
+    Every configuration of a grid or a random sample of SPACE is trained in a pool of
+    worker processes:
+
+        - one tensorflow runtime per worker, its session is cleared between two
+          configurations, the thread pools of tensorflow and numpy are limited to
+          {threads} threads per worker, so {workers} * {threads} fits the cpus
+        - the training data is written once to a .npz file the workers load at startup,
+          not pickled with every configuration
+        - every run stops early when the validation loss did not improve for {patience}
+          epochs and keeps the weights of its best epoch
+        - configurations not started before {timeout} seconds are skipped
+
+    The results table holds the configuration, the epochs trained, the best epoch, the
+    validation loss and accuracy and the seconds of every run, best first.
+
+    ----- E X A M P L E -----
+    > configs = sample(SPACE, n=12, seed=42)    # or grid(SPACE)
+    > results = search(X_train, y_train, X_val, y_val, configs, workers=4, timeout=600)
+    > results[['layers', 'learning_rate', 'batch_size', 'epochs_run', 'best_epoch', 'val_accuracy', 'seconds']].head(3)
+'''
+
+import os
+import time
+import random
+import itertools
+import tempfile
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+try:
+    import tensorflow as tf
+except ImportError: # the search needs tensorflow, the grids do not
+    tf = None
+
+import features
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+SPACE = {
+    'layers': [(18, 12, 8), (16,), (32, 16), (64, 32, 16)],
+    'learning_rate': [0.001, 0.003, 0.01],
+    'batch_size': [32, 128, 512],
+    'epochs': [20, 50]
+}
+
+THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS']
+
+_data = None # (X_train, y_train, X_val, y_val) of a worker process, see _init_worker
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def grid(space: dict=SPACE) -> list:
+    '''Returns all combinations of the values of {space} as list of configurations.'''
+    return [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+def sample(space: dict=SPACE, n: int=10, seed: int=None) -> list:
+    '''Returns {n} different random configurations of {space} (all of them if there are fewer).'''
+    configs = grid(space)
+    return random.Random(seed).sample(configs, min(n, len(configs)))
+
+def build_model(X_train: np.ndarray, layers: tuple=(18, 12, 8), learning_rate: float=0.001, classes: int=2):
+    '''Returns the compiled network of get_basic_model with the hidden {layers}, the normalizer
+        adapted to {X_train}, a sigmoid output for two classes and a softmax output for more.
+    '''
+    normalizer = tf.keras.layers.Normalization(axis=-1)
+    normalizer.adapt(X_train)
+    binary = classes <= 2
+    model = tf.keras.Sequential(
+        [tf.keras.Input(shape=(X_train.shape[1],)), normalizer]
+        + [tf.keras.layers.Dense(units, activation='relu') for units in layers]
+        + [tf.keras.layers.Dense(1, activation='sigmoid') if binary else tf.keras.layers.Dense(classes, activation='softmax')]
+    )
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss=tf.keras.losses.BinaryCrossentropy() if binary else tf.keras.losses.SparseCategoricalCrossentropy(),
+        metrics=['accuracy']
+    )
+    return model
+
+@contextmanager
+def _threads(threads: int):
+    '''Sets the thread limits of numpy and tensorflow for the processes started within.'''
+    before = { variable: os.environ.get(variable) for variable in THREAD_VARIABLES }
+    os.environ.update({ variable: str(1 if variable == 'TF_NUM_INTEROP_THREADS' else threads) for variable in THREAD_VARIABLES })
+    try:
+        yield
+    finally:
+        for variable, value in before.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+def _init_worker(path: str, threads: int) -> None:
+    global _data
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    with np.load(path) as data:
+        _data = (data['X_train'], data['y_train'], data['X_val'], data['y_val'])
+
+def _train(config: dict, patience: int, seed: int, path: str=None) -> dict:
+    '''Trains one configuration in a worker and returns its row of the results table.'''
+    X_train, y_train, X_val, y_val = _data
+    tf.keras.backend.clear_session() # a fresh graph for every configuration
+    tf.keras.utils.set_random_seed(seed)
+
+    start = time.perf_counter()
+    model = build_model(X_train, config['layers'], config['learning_rate'], classes=int(max(y_train.max(), y_val.max())) + 1)
+    validation = features.dataset(X_val, y_val, batch_size=1024, shuffle=False)
+    history = model.fit(
+        features.dataset(X_train, y_train, batch_size=config['batch_size'], seed=seed),
+        validation_data=validation, epochs=config['epochs'], verbose=0,
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)]
+    )
+    val_loss, val_accuracy = model.evaluate(validation, verbose=0)
+    if path is not None:
+        model.save(path)
+    return {
+        **config, 'epochs_run': len(history.history['val_loss']),
+        'best_epoch': int(np.argmin(history.history['val_loss'])) + 1,
+        'val_loss': float(val_loss), 'val_accuracy': float(val_accuracy),
+        'seconds': time.perf_counter() - start, 'path': path
+    }
+
+def search(
+    X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray, configs: list,
+    workers: int=None, threads: int=1, patience: int=3, timeout: float=None, seed: int=42, directory: str=None
+) -> pd.DataFrame:
+    '''Trains every configuration of {configs} (see grid and sample) in parallel and returns the results table, best first.
+
+        ----- Keyword arguments -----
+        X_train, y_train, X_val, y_val: np.ndarray | Encoded features and targets (see features.FeatureEncoder)
+        workers: int | Processes training in parallel | default: cpus / {threads}
+        threads: int | Threads of tensorflow (and numpy) per worker
+        patience: int | Epochs without improvement of the validation loss before a run stops
+        timeout: float | Seconds after which configurations that did not start are skipped | default: None
+        seed: int | Seed of the weights and the shuffling, the same for every configuration
+        directory: str | Directory the trained models are saved to (<index>.keras) | default: None
+    '''
+    if tf is None:
+        raise ImportError('The search requires tensorflow (see requirements.txt)')
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.npz')
+        np.savez(path, X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+        # spawned workers start their own tensorflow runtime with the limits of _threads
+        with _threads(threads), ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(path, threads)
+        ) as executor:
+            futures = [
+                executor.submit(_train, config, patience, seed, None if directory is None else os.path.join(directory, f'{i}.keras'))
+                for i, config in enumerate(configs)
+            ]
+            _, not_done = wait(futures, timeout=timeout)
+            for future in not_done:
+                future.cancel() # runs that already started finish
+            wait([future for future in not_done if not future.cancelled()])
+
+    rows = []
+    for config, future in zip(configs, futures):
+        if future.cancelled():
+            continue
+        try:
+            rows.append(future.result())
+        except Exception as error: # e.g. out of memory, the other runs are still compared
+            rows.append({ **config, 'error': f'{type(error).__name__}: {error}' })
+
+    results = pd.DataFrame(rows)
+    if 'val_accuracy' not in results:
+        return results
+    return results.sort_values(['val_accuracy', 'val_loss'], ascending=[False, True], ignore_index=True)
@@ -0,0 +1,178 @@
+'''
+    planner.py
+    ===================================
+
+    Aggregate and projection push-down for the report panels. Every panel of the weekly
+    report is a count or a mean over a few columns, so instead of SELECT * each panel is
+    declared as Aggregate (table, dimensions to group by, columns to average) and the
+    QueryPlan turns them into GROUP BY queries that only return one row per combination
+    of categories. The size of the responses then depends on the number of categories,
+    not on the number of interactions.
+
+    Only mergeable measures are queried (COUNT and SUM, means are computed afterwards),
+    so a panel whose dimensions are a subset of another panel on the same table is
+    answered by re-aggregating the result of that query instead of sending its own one.
+
+    ----- E X A M P L E -----
+    > plan = QueryPlan({
+    >     'gender': Aggregate('pepper_emotion_table', ['gender']),
+    >     'emotion_by_gender': Aggregate('pepper_emotion_table', ['gender', 'basic_emotion']),
+    >     'dialog_time_by_weekday': Aggregate('pepper_emotion_table', ['weekday'], mean=['dialog_time'])
+    > }, where='WHERE ts > NOW() - INTERVAL 7 day')
+    > plan.queries
+    {'q0': 'SELECT gender, basic_emotion, COUNT(*) AS n FROM pepper_emotion_table WHERE ... GROUP BY gender, basic_emotion',
+     'q1': 'SELECT WEEKDAY(ts) AS weekday, COUNT(*) AS n, SUM(dialog_time) AS sum_dialog_time, ... GROUP BY WEEKDAY(ts)'}
+    > frames = plan.run(client)
+    > frames['gender']
+            count
+    gender
+    male       42
+    female     31
+'''
+
+import pandas as pd
+
+import preprocessing
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+# dimensions derived from ts, weekday is 0 = Monday like pandas .dt.weekday
+
+DERIVED_DIMENSIONS = {
+    'weekday': {
+        'mysql': 'WEEKDAY(ts)',
+        'sqlite': "(CAST(strftime('%w', ts) AS INTEGER) + 6) % 7"
+    },
+    'hour': {
+        'mysql': 'HOUR(ts)',
+        'sqlite': "CAST(strftime('%H', ts) AS INTEGER)"
+    },
+    'day': { # as 'YYYY-MM-DD' string, the node driver would send DATE values as js Date in local time
+        'mysql': "DATE_FORMAT(ts, '%Y-%m-%d')",
+        'sqlite': "strftime('%Y-%m-%d', ts)"
+    }
+}
+
+DIALECTS = ['mysql', 'sqlite'] # web app (and local stand-in) | Mirror
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class Aggregate(object):
+    '''
+        One report panel: the number of rows (and the mean of {mean}) of {table} per
+        combination of the values of {group_by}.
+
+        ------ P A R A M E T E R S ------
+        :param table: str
+            pepper_* table the panel is computed from
+        :param group_by: list
+            Columns or derived dimensions (see DERIVED_DIMENSIONS) to group by
+        :param mean: list | optional
+            Numeric columns to average per group
+    '''
+
+    def __init__(self, table: str, group_by: list, mean: list=None):
+        self.table = table
+        self.group_by = tuple(group_by)
+        self.mean = tuple(mean or ())
+
+    def __repr__(self) -> str:
+        return f'Aggregate({self.table!r}, {list(self.group_by)!r}, mean={list(self.mean)!r})'
+
+    def covers(self, other) -> bool:
+        '''True if the result of {other} can be computed by re-aggregating the result of self.'''
+        return (
+            self.table == other.table and set(other.group_by) <= set(self.group_by)
+            and set(other.mean) <= set(self.mean)
+        )
+
+    def measures(self) -> list:
+        '''Names of the (mergeable) measure columns of the query result.'''
+        return ['n'] + [name for column in self.mean for name in (f'sum_{column}', f'n_{column}')]
+
+    def sql(self, where: str='', dialect: str='mysql') -> str:
+        '''Returns the GROUP BY query of this aggregate.'''
+        if dialect not in DIALECTS:
+            raise ValueError(f'Unknown dialect {dialect}, expected one of {DIALECTS}')
+        expressions = [
+            DERIVED_DIMENSIONS[dimension][dialect] if dimension in DERIVED_DIMENSIONS else dimension
+            for dimension in self.group_by
+        ]
+        select = [
+            f'{expression} AS {dimension}' if expression != dimension else dimension
+            for expression, dimension in zip(expressions, self.group_by)
+        ] + ['COUNT(*) AS n'] + [
+            f'SUM({column}) AS sum_{column}, COUNT({column}) AS n_{column}' for column in self.mean
+        ]
+        query = f'SELECT {", ".join(select)} FROM {self.table}'
+        if where:
+            query += f' {where}'
+        if expressions:
+            query += f' GROUP BY {", ".join(expressions)}'
+        return query
+
+    def frame(self, rows) -> pd.DataFrame:
+        '''Returns the query result {rows} as DataFrame with the (re-)aggregated 'count' and
+            'mean_<column>' columns, indexed by the dimensions of this aggregate.
+        '''
+        df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        if df.empty:
+            df = pd.DataFrame(columns=list(self.group_by) + self.measures())
+        for column in self.measures(): # sums of decimal columns arrive as strings
+            df[column] = pd.to_numeric(df[column])
+        preprocessing.to_categorical(df, [column for column in self.group_by if column in preprocessing.CATEGORICAL_COLUMNS])
+
+        if self.group_by:
+            df = df.groupby(list(self.group_by), observed=True)[self.measures()].sum()
+        else:
+            df = df[self.measures()].sum().to_frame().T
+
+        result = pd.DataFrame({ 'count': df['n'].astype('int64') }, index=df.index)
+        for column in self.mean:
+            result[f'mean_{column}'] = df[f'sum_{column}'] / df[f'n_{column}'].where(df[f'n_{column}'] > 0)
+        return result
+
+
+class QueryPlan(object):
+    '''
+        Turns named aggregates into as few GROUP BY queries as possible: aggregates that
+        are covered by another one (same table, subset of its dimensions and means) reuse
+        its query, identical aggregates share one.
+
+        ------ P A R A M E T E R S ------
+        :param aggregates: dict
+            Name of the panel -> Aggregate
+        :param where: str | optional
+            WHERE clause applied to every query, e.g. 'WHERE ts > NOW() - INTERVAL 7 day'
+        :param dialect: str | optional
+            'mysql' for the web app (Client), 'sqlite' for the Mirror
+    '''
+
+    def __init__(self, aggregates: dict, where: str='', dialect: str='mysql'):
+        self.aggregates = aggregates
+        self.where = where
+        self.dialect = dialect
+        self.queries, self._sources = {}, {} # key -> sql | name -> (key, aggregate)
+
+        planned = [] # (key, aggregate), widest aggregates first so the narrow ones can reuse them
+        for name, aggregate in sorted(aggregates.items(), key=lambda item: -len(item[1].group_by) - len(item[1].mean)):
+            key = next((key for key, candidate in planned if candidate.covers(aggregate)), None)
+            if key is None:
+                key = f'q{len(planned)}'
+                planned.append((key, aggregate))
+                self.queries[key] = aggregate.sql(where, dialect)
+            self._sources[name] = (key, aggregate)
+
+    def __repr__(self) -> str:
+        return f'QueryPlan({len(self.aggregates)} aggregates, {len(self.queries)} queries)'
+
+    def frames(self, results: dict) -> dict:
+        '''Returns { name: DataFrame } from the rows of each query ({ key: rows }).'''
+        # the result of a wider query still holds the mergeable measures per group,
+        # so narrower aggregates only group it again by their own dimensions
+        return { name: aggregate.frame(results[key]) for name, (key, aggregate) in self._sources.items() }
+
+    def run(self, source) -> dict:
+        '''Runs all queries on {source} (AsyncClient, Client or Mirror) and returns { name: DataFrame }.'''
+        if hasattr(source, 'fetch_all'): # AsyncClient, all queries concurrently
+            return self.frames(source.fetch_all(self.queries))
+        return self.frames({ key: source.sql_query(query) for key, query in self.queries.items() })
@@ -0,0 +1,73 @@
+'''
+    preprocessing.py
+    ===================================
+
+    Vectorized preprocessing of the pepper_* tables shared by weekly-report.py and
+    main.ipynb: ts is parsed to datetime64 in one go, weekday and hour are derived with
+    the .dt accessors and the state columns become categoricals with a stable category
+    order (see schema.CATEGORIES), so no row is touched by a python loop.
+
+    ----- E X A M P L E -----
+    > emotion_states_df = preprocessing.preprocess(pd.DataFrame(client.sql_query('SELECT * FROM pepper_emotion_table')))
+    > emotion_states_df[['weekday', 'dialog_time']].groupby('weekday').mean()
+'''
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+NUMERIC_COLUMNS = {
+    'distance': 'float32',
+    'age': 'int64',
+    'dialog_time': 'float32'
+}
+
+CATEGORICAL_COLUMNS = ['gender', 'basic_emotion', 'pleasure_state', 'excitement_state', 'smile_state', 'use_case']
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def parse_ts(ts: pd.Series) -> pd.Series:
+    '''Returns the timestamps of the api ('2022-01-11T12:34:50.000Z') as datetime64 (UTC, without tz).'''
+    if pd.api.types.is_datetime64_any_dtype(ts) and getattr(ts.dt, 'tz', None) is None:
+        return ts
+    try: # the ISO parser of numpy is several times faster than pd.to_datetime
+        if ts.str.endswith('Z').all():
+            return pd.Series(np.asarray(ts.str.slice(0, -1), dtype='datetime64[ns]'), index=ts.index, name=ts.name)
+    except (AttributeError, TypeError, ValueError): # no strings or nulls
+        pass
+    return pd.to_datetime(ts, utc=True).dt.tz_convert(None)
+
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    '''Adds weekday (0 = Monday) and hour of ts to {df} in place and returns it.'''
+    df['ts'] = parse_ts(df['ts'])
+    dtype = 'Int8' if df['ts'].isna().any() else 'int8'
+    df['weekday'] = df['ts'].dt.weekday.astype(dtype)
+    df['hour'] = df['ts'].dt.hour.astype(dtype)
+    return df
+
+def to_categorical(df: pd.DataFrame, columns: list=None) -> pd.DataFrame:
+    '''Converts the state columns of {df} in place to categoricals with the declared categories first.'''
+    for column in columns or CATEGORICAL_COLUMNS:
+        if column not in df.columns or isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        codes, uniques = pd.factorize(df[column]) # hashes every value once, nulls get the code -1
+        df[column] = schema.categorical_from_codes(codes, { value: code for code, value in enumerate(uniques) }, column)
+    return df
+
+def to_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    '''Converts distance, age and dialog_time of {df} in place (decimal columns arrive as strings).'''
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column in df.columns and df[column].dtype != dtype:
+            values = pd.to_numeric(df[column])
+            df[column] = values.astype(dtype) if not values.isna().any() or dtype != 'int64' else values.astype('Int64')
+    return df
+
+def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+    '''Returns a preprocessed copy of a pepper_* table: typed numbers, categoricals, datetime64 ts, weekday and hour.'''
+    df = df.copy()
+    to_numeric(df)
+    to_categorical(df)
+    if 'ts' in df.columns:
+        add_time_features(df)
+    return df
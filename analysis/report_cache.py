@@ -0,0 +1,214 @@
+'''
+    report_cache.py
+    ===================================
+
+    Content-addressed cache of the reports and of their rendered pages. A report is
+    completely determined by its aggregated panels, its metadata (title, ...) and the
+    code that draws it, so the sha256 over these is its fingerprint:
+
+        report   panels + metadata + renderer  ->  reports/<fingerprint>.pdf
+        page     page function + its panels + renderer  ->  pages/<fingerprint>.pdf (one page pdf
+                 of figures.write_report) or .pickle (figure of figures.render_report)
+
+    renderer is the source of figures.py and the versions of matplotlib and pandas, so
+    changing a chart invalidates everything it drew. A report whose fingerprint is known
+    is hard-linked (or copied, across file systems) from the cache into place without
+    rendering anything; otherwise only the pages whose panels changed are drawn again,
+    the others are read from the cache.
+
+    The panels are hashed after the aggregation, which takes milliseconds (GROUP BY,
+    rollups) and is exact, unlike watermarks and row counts that can not see updated rows.
+
+    ----- E X A M P L E -----
+    > cache = ReportCache('out/.cache')
+    > key = cache.fingerprint(panels, Title='Weekly report 2022-01-03 - 2022-01-09')
+    > if not cache.link(key, 'out/weekly_report_2022-01-03_-_2022-01-09.pdf'):
+    >     with cache.writing(key, 'out/weekly_report_2022-01-03_-_2022-01-09.pdf') as path:
+    >         figures.write_report(path, panels, { 'Title': 'Weekly report 2022-01-03 - 2022-01-09' }, cache=cache)
+    > cache.stats()
+    {'report_hits': 0, 'report_misses': 1, 'page_hits': 7, 'page_misses': 2, 'evictions': 0, 'disk_bytes': 1262431}
+'''
+
+import os
+import pickle
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import matplotlib
+import pandas as pd
+
+import figures
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def _renderer() -> bytes:
+    '''Digest of everything besides the panels that changes how the pages look.'''
+    with open(figures.__file__, 'rb') as source:
+        code = source.read()
+    return hashlib.sha256(code + f'|{matplotlib.__version__}|{pd.__version__}'.encode()).digest()
+
+def _update(digest, frame: pd.DataFrame) -> None:
+    '''Adds the index, columns, dtypes and values of {frame} to {digest}.'''
+    digest.update(repr((list(frame.index.names), list(frame.columns), [str(dtype) for dtype in frame.dtypes])).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ReportCache(object):
+    '''
+        On-disk cache of pdf reports and rendered pages, keyed by the fingerprint of their
+        inputs (see module docstring). The least recently used files are evicted once
+        the cache grows beyond {max_disk_bytes}.
+
+        ------ P A R A M E T E R S ------
+        :param directory: str
+            Directory of the cache, e.g. .cache in the output directory of the reports
+        :param max_disk_bytes: int | optional
+            Size limit of the cache
+    '''
+
+    def __init__(self, directory: str, max_disk_bytes: int=512 * 1024 ** 2):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.report_hits, self.report_misses, self.page_hits, self.page_misses, self.evictions = 0, 0, 0, 0, 0
+        self.renderer = _renderer()
+        self._lock = threading.Lock()
+        for kind in ('reports', 'pages'):
+            os.makedirs(os.path.join(directory, kind), exist_ok=True)
+
+    # ----- R E P O R T S -----
+
+    def fingerprint(self, panels: dict, **metadata) -> str:
+        '''Returns the fingerprint of the report drawn from {panels} with {metadata} (Title, Author, ...).'''
+        digest = hashlib.sha256(self.renderer)
+        digest.update(repr(sorted(metadata.items())).encode())
+        for name in sorted(panels):
+            digest.update(name.encode())
+            _update(digest, panels[name])
+        return digest.hexdigest()
+
+    def link(self, fingerprint: str, path: str) -> bool:
+        '''Puts the cached report {fingerprint} at {path}, returns False if it is not cached.'''
+        cached = self._path('reports', fingerprint, 'pdf')
+        try:
+            self._place(cached, path)
+        except FileNotFoundError:
+            with self._lock:
+                self.report_misses += 1
+            return False
+
+        os.utime(cached) # mark as recently used
+        with self._lock:
+            self.report_hits += 1
+        return True
+
+    @contextmanager
+    def writing(self, fingerprint: str, path: str):
+        '''Yields a temporary path to write the report {fingerprint} to. When the with block
+            succeeds, it is added to the cache and put at {path} like link does.
+        '''
+        cached = self._path('reports', fingerprint, 'pdf')
+        tmp_path = f'{cached}.{threading.get_ident()}.tmp'
+        try:
+            yield tmp_path
+            os.replace(tmp_path, cached)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._place(cached, path)
+        self._evict()
+
+    @staticmethod
+    def _place(cached: str, path: str) -> None:
+        '''Hard links (or copies, across file systems) {cached} to {path}.'''
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            try:
+                os.link(cached, tmp_path)
+            except FileNotFoundError:
+                raise
+            except OSError: # other file system or no hard links
+                shutil.copyfile(cached, tmp_path)
+            os.replace(tmp_path, path) # never writes into an existing file, it may be linked to the cache
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # ----- P A G E S -----
+
+    def page_key(self, page, frames: list) -> str:
+        digest = hashlib.sha256(self.renderer)
+        digest.update(page.__name__.encode())
+        for frame in frames:
+            _update(digest, frame)
+        return digest.hexdigest()
+
+    def page(self, page, frames: list, format: str='pickle'):
+        '''Returns the cached (figure, bounding box) of figures.render_page(page, frames), with
+            {format} 'pdf' the bytes of figures.render_pdf_page(page, frames), or None.
+        '''
+        path = self._path('pages', self.page_key(page, frames), format)
+        try:
+            with open(path, 'rb') as f:
+                result = f.read() if format == 'pdf' else pickle.load(f) # written by put_page of this cache only
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            with self._lock:
+                self.page_misses += 1
+            return None
+
+        os.utime(path)
+        with self._lock:
+            self.page_hits += 1
+        return result
+
+    def put_page(self, page, frames: list, result, format: str='pickle') -> None:
+        path = self._path('pages', self.page_key(page, frames), format)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            if format == 'pdf':
+                f.write(result)
+            else:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    # ----- S T O R E -----
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'report_hits': self.report_hits, 'report_misses': self.report_misses,
+                'page_hits': self.page_hits, 'page_misses': self.page_misses,
+                'evictions': self.evictions, 'disk_bytes': sum(os.path.getsize(path) for path in self._files())
+            }
+
+    def clear(self) -> None:
+        for path in self._files():
+            os.remove(path)
+
+    def _path(self, kind: str, fingerprint: str, extension: str) -> str:
+        return os.path.join(self.directory, kind, f'{fingerprint}.{extension}')
+
+    def _files(self) -> list:
+        return [
+            os.path.join(self.directory, kind, f)
+            for kind in ('reports', 'pages') for f in os.listdir(os.path.join(self.directory, kind)) if not f.endswith('.tmp')
+        ]
+
+    def _evict(self) -> None:
+        files = sorted(self._files(), key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in files)
+        while total > self.max_disk_bytes and files:
+            path = files.pop(0)
+            total -= os.path.getsize(path)
+            os.remove(path) # reports linked into the output directory stay there
+            with self._lock:
+                self.evictions += 1
@@ -0,0 +1,234 @@
+'''
+    report_service.py
+    ===================================
+
+    Long-running mode of weekly-report.py. Instead of a cron job that imports pandas,
+    numpy and matplotlib and connects to the web app for every report, one process keeps
+    a warm ReportBuilder (see reports.py) and
+
+        - builds the reports of the scheduled periods as soon as a period is complete
+          (checked every {interval} seconds, not before {at} UTC)
+        - builds reports on demand over a local HTTP endpoint:
+
+            POST /report     period=rolling|day|week|month, start=YYYY-MM-DD&end=YYYY-MM-DD, backfill=1
+            GET  /status     uptime, schedule and the last jobs with their stage timings
+
+    A failing job (e.g. the web app is not reachable) is logged and answered with 500,
+    the service keeps running and the scheduler tries again at the next check.
+
+    ----- E X A M P L E -----
+    analysis~$ python3 weekly-report.py --mirror pepper_mirror.db --rollups pepper_rollups.db --serve --schedule day week
+    2022-01-10 06:00:02 report_service,line: 201     INFO | Serving http://127.0.0.1:8050 (schedule: day, week at 06:00 UTC)
+
+    analysis~$ curl -X POST 'http://127.0.0.1:8050/report?start=2022-01-01&end=2022-01-08'
+    {"trigger": "request", "status": "ok", "reports": [...], "timings": {"sync": 0.41, "aggregate": 0.05, "render": 1.12, "total": 1.58}, ...}
+'''
+
+import os, sys
+import json
+import time
+import logging
+import threading
+import traceback
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from reports import ReportBuilder, REPORT_NAMES
+from rollups import PERIODS, period_start
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- Logger -----
+formatter = logging.Formatter(
+    fmt='%(asctime)s %(module)s,line: %(lineno)d %(levelname)8s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+log = logging.getLogger('report_service')
+log.setLevel(logging.INFO)
+screen_handler = logging.StreamHandler(stream=sys.stdout)
+screen_handler.setFormatter(formatter)
+log.addHandler(screen_handler)
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ReportService(object):
+    '''
+        Runs a ReportBuilder as long-running service with a scheduler thread and a local
+        HTTP endpoint. Jobs of both are run one after another by the builder.
+
+        ------ P A R A M E T E R S ------
+        :param builder: ReportBuilder
+        :param host: str | optional
+        :param port: int | optional
+            0 picks a free port
+        :param schedule: list | optional
+            Periods ('day', 'week', 'month') whose reports are built when they are complete
+        :param at: str | optional
+            Time of day (HH:MM, UTC) from which the scheduled reports of the day are built
+        :param interval: float | optional
+            Seconds between two checks of the scheduler
+
+        ------ E X A M P L E ------
+        > with ReportService(ReportBuilder('out', mirror='pepper_mirror.db'), port=0, schedule=['week']) as service:
+        >     requests.post(f'{service.url}/report', params={ 'period': 'day' }).json()['timings']
+        {'sync': 0.0, 'aggregate': 0.021, 'render': 1.07, 'total': 1.091}
+    '''
+
+    def __init__(
+        self, builder: ReportBuilder, host: str='127.0.0.1', port: int=8050, schedule: list=None,
+        at: str='06:00', interval: float=60
+    ):
+        for period in schedule or []:
+            if period not in PERIODS: # only calendar periods are ever complete
+                raise ValueError(f'Unknown period {period}, expected one of {list(PERIODS)}')
+        self.builder = builder
+        self.schedule = list(schedule or [])
+        self.at = datetime.strptime(at, '%H:%M').time()
+        self.interval = interval
+        self.started = time.time()
+        self.jobs = deque(maxlen=100) # the last jobs, newest last
+        self._done = set() # (period, first day) of the scheduled reports built by this process
+        self._stopped = threading.Event()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        '''Starts the scheduler and the HTTP server in background threads.'''
+        self._threads = [
+            threading.Thread(target=self._schedule_loop, daemon=True),
+            threading.Thread(target=self.server.serve_forever, daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        '''Runs the scheduler in the background and the HTTP server in this thread until stop().'''
+        scheduler = threading.Thread(target=self._schedule_loop, daemon=True)
+        scheduler.start()
+        self._threads = [scheduler]
+        self.server.serve_forever()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self.builder.close()
+
+    # ----- J O B S -----
+
+    def run_job(self, trigger: str, **kwargs) -> dict:
+        '''Builds the reports of ReportBuilder.build(**{kwargs}) and returns the job record.'''
+        job = {
+            'trigger': trigger, 'params': { key: str(value) for key, value in kwargs.items() if value is not None },
+            'started_at': datetime.now().isoformat(timespec='seconds'), 'status': 'ok'
+        }
+        try:
+            job.update(self.builder.build(**kwargs))
+        except ValueError as error: # invalid parameters, e.g. an unknown period
+            job.update(status='invalid', error=str(error))
+            log.warning(f'{trigger} job {job["params"]} is invalid: {error}')
+        except Exception as error:
+            job.update(status='error', error=f'{type(error).__name__}: {error}')
+            log.error(f'{trigger} job {job["params"]} failed!\n{traceback.format_exc()}')
+        else:
+            timings = ', '.join(f'{stage} {seconds:.3f}s' for stage, seconds in job['timings'].items())
+            log.info(f'{trigger} job {job["params"]}: {len(job["reports"])} report(s) | {timings}')
+        self.jobs.append(job)
+        return job
+
+    def due(self, now: datetime=None) -> list:
+        '''Returns the scheduled periods whose last complete report is not built yet.'''
+        now = now or datetime.now(timezone.utc)
+        if now.time() < self.at:
+            return []
+        today, periods = now.date(), []
+        for period in self.schedule:
+            start = period_start(period_start(today, period) - timedelta(days=1), period)
+            path = self.builder.path(f'{REPORT_NAMES[period]}_report', start, period_start(today, period))
+            if (period, start) not in self._done and not os.path.exists(path): # also built before a restart
+                periods.append((period, start))
+        return periods
+
+    def _schedule_loop(self) -> None:
+        while not self._stopped.is_set():
+            for period, start in self.due():
+                if self.run_job('schedule', period=period)['status'] != 'error':
+                    self._done.add((period, start)) # failed jobs are tried again at the next check
+            self._stopped.wait(self.interval)
+
+    def status(self) -> dict:
+        return {
+            'uptime': time.time() - self.started,
+            'schedule': self.schedule, 'at': self.at.strftime('%H:%M'),
+            'due': [period for period, _ in self.due()],
+            'cache': self.builder.cache.stats() if self.builder.cache is not None else None,
+            'jobs': list(self.jobs)[-10:]
+        }
+
+    # ----- H T T P -----
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive
+
+            def do_GET(self):
+                if urlsplit(self.path).path.rstrip('/') == '/status':
+                    return self._send(200, service.status())
+                return self._send(404, { 'error': 'Not found!' })
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                if url.path.rstrip('/') != '/report':
+                    return self._send(404, { 'error': 'Not found!' })
+
+                params = { key: values[-1] for key, values in parse_qs(f'{url.query}&{body}').items() }
+                try:
+                    kwargs = {
+                        'period': params.get('period', 'rolling'),
+                        'start': date.fromisoformat(params['start']) if 'start' in params else None,
+                        'end': date.fromisoformat(params['end']) if 'end' in params else None,
+                        'backfill': params.get('backfill', '0').lower() in ('1', 'true', 'yes')
+                    }
+                except ValueError as error:
+                    return self._send(400, { 'status': 'invalid', 'error': str(error) })
+
+                job = service.run_job('request', **kwargs)
+                self._send({ 'ok': 200, 'invalid': 400 }.get(job['status'], 500), job)
+
+            def _send(self, status: int, body: dict) -> None:
+                body = json.dumps(body, default=str).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
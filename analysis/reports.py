@@ -0,0 +1,254 @@
+'''
+    reports.py
+    ===================================
+
+    Building the pepper reports as a library, used by the weekly-report.py command line
+    and by its long-running service mode (see report_service.py). A ReportBuilder keeps
+    everything that is expensive to set up between reports: the pooled connections of
+    the (Async)Client, the SQLite Mirror and RollupStore and the process pool rendering
+    the pages. Reports and pages whose panels did not change are reused from a ReportCache
+    (see report_cache.py). Every build returns the reports it wrote and how long each stage took:
+
+        sync        downloading new rows into the mirror, rolling up new days
+        aggregate   GROUP BY queries of the QueryPlan or merging the daily rollups
+        render      drawing the pages (or linking cached reports) and writing the pdf files
+
+    ----- E X A M P L E -----
+    > with ReportBuilder('out', mirror='pepper_mirror.db', rollups='pepper_rollups.db') as builder:
+    >     builder.build(period='week')   # last calendar week, the default 'rolling' reports the last 7 days
+    {'reports': [{'start': '2022-01-03', 'end': '2022-01-10', 'path': 'out/weekly_report_2022-01-03_-_2022-01-09.pdf', 'cached': False}],
+     'timings': {'sync': 0.412, 'aggregate': 0.051, 'render': 1.118, 'total': 1.581}}
+'''
+
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+from Client import AsyncClient
+from Mirror import Mirror
+from instrumentation import timed
+from planner import Aggregate, QueryPlan
+from report_cache import ReportCache
+from rollups import RollupStore, period_start, periods
+import figures
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+# every panel is a count (or mean) per combination of a few columns, so only these
+# aggregates are queried from the backend instead of all rows (see planner.py)
+PANELS = {
+    'use_case': Aggregate('pepper_use_case_table', ['use_case']),
+    'gender': Aggregate('pepper_emotion_table', ['gender']),
+    'basic_emotion': Aggregate('pepper_emotion_table', ['basic_emotion']),
+    'emotion_by_gender': Aggregate('pepper_emotion_table', ['gender', 'basic_emotion']),
+    'pleasure_by_gender': Aggregate('pepper_emotion_table', ['gender', 'pleasure_state']),
+    'emotion_by_weekday': Aggregate('pepper_emotion_table', ['weekday', 'basic_emotion']),
+    'gender_by_weekday': Aggregate('pepper_emotion_table', ['weekday', 'gender']),
+    'dialog_time_by_weekday': Aggregate('pepper_emotion_table', ['weekday'], mean=['dialog_time']),
+    'use_case_by_weekday': Aggregate('pepper_use_case_table', ['weekday', 'use_case'])
+}
+
+# days of a 'rolling' report: the last 7 complete days before today, today is left out like the rollups
+# do, so a report from the web app, the mirror or the rollups holds the same rows
+LOOKBACK = 7
+
+REPORT_NAMES = { 'rolling': 'weekly', 'day': 'daily', 'week': 'weekly', 'month': 'monthly' }
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def report_ranges(period: str, today: date, start: date=None, end: date=None, first: date=None, backfill: bool=False) -> list:
+    '''Returns [(first day, first day after), ...] of the reports to build: the range from
+        {start} to {end}, all complete {period}s since {first} ({backfill}), the last complete
+        {period} or, for 'rolling', the LOOKBACK days before {today}.
+    '''
+    if start is not None:
+        return [(start, end)]
+    if period == 'rolling':
+        return [(today - timedelta(days=LOOKBACK), today)]
+    if backfill:
+        return periods(period, first, today) if first is not None else []
+    end = period_start(today, period)
+    return [(period_start(end - timedelta(days=1), period), end)]
+
+def where(start: date, end: date) -> str:
+    return f"WHERE ts >= '{start}' AND ts < '{end}'"
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ReportBuilder(object):
+    '''
+        Builds the pdf reports from the web app, a Mirror or a RollupStore and keeps the
+        connections and the render pool open until close().
+
+        ------ P A R A M E T E R S ------
+        :param out_dir: str
+            Directory the pdf files are written to
+        :param API_KEY: str | optional
+            Key of the web app, None builds the reports offline from {mirror} or {rollups}
+        :param mirror: str | optional
+            SQLite Mirror that is synced and queried instead of the web app
+        :param rollups: str | optional
+            RollupStore the reports are merged from (rolled up from {mirror} if given)
+        :param workers: int | optional
+            Processes rendering the pages (see figures.pool)
+        :param hooks: list | optional
+            Request hooks of the Client, e.g. instrumentation.Metrics
+        :param url: str | optional
+            Base url of the web app, e.g. of the local stand-in
+        :param cache: bool | optional
+            Reuse reports and pages of unchanged panels from a ReportCache in {out_dir}/.cache
+    '''
+
+    def __init__(
+        self, out_dir: str, API_KEY: str=None, mirror: str=None, rollups: str=None,
+        workers: int=None, hooks: list=None, url: str=None, cache: bool=True
+    ):
+        if API_KEY is None and mirror is None and rollups is None:
+            raise ValueError('Reports without API_KEY need a mirror or rollups')
+        self.out_dir = out_dir
+        self.API_KEY, self.url, self.hooks = API_KEY, url, hooks
+        self.workers = workers
+        self.mirror = Mirror(mirror) if mirror is not None else None
+        self.rollups = RollupStore(rollups) if rollups is not None else None
+        self.cache = ReportCache(os.path.join(out_dir, '.cache')) if cache else None
+        self.lock = threading.Lock() # one build at a time, they share the connections and the pool
+        self._client = None # AsyncClient, opened with the first request to the web app
+        self._executor = None
+        figures.setup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._client is not None:
+            self._client.close()
+        if self.mirror is not None:
+            self.mirror.close()
+        if self.rollups is not None:
+            self.rollups.close()
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None:
+            # runs the queries of a report concurrently, so this takes as long as the slowest query
+            self._client = AsyncClient(self.API_KEY, max_concurrency=3, sandbox=False, url=self.url, verbose=1, hooks=self.hooks)
+        return self._client
+
+    @property
+    def executor(self):
+        '''Process pool rendering the pages, started with the first report (None renders in this process).'''
+        if self._executor is None and self.workers != 0:
+            self._executor = figures.pool(self.workers)
+            if self._executor is None:
+                self.workers = 0 # do not try again
+        return self._executor
+
+    def warm_up(self) -> None:
+        '''Starts the render processes and opens the connection to the web app before the first report.'''
+        if self.executor is not None:
+            # workers are started on submit, render_report never keeps more than one per page busy
+            for future in [self.executor.submit(figures.setup) for _ in figures.PAGES]:
+                future.result()
+        if self.API_KEY is not None:
+            self.client.client.test_connection()
+
+    def path(self, name: str, start: date, end: date) -> str:
+        '''Location of the report {name} from {start} to {end} (exclusive).'''
+        return os.path.join(self.out_dir, f'{name}_{start}_-_{end - timedelta(days=1)}.pdf')
+
+    def build(self, period: str='rolling', start: date=None, end: date=None, backfill: bool=False, today: date=None) -> dict:
+        '''Writes the reports of the last complete {period} (or the last LOOKBACK days), of the range from {start} to {end}
+            (exclusive) or, with {backfill}, of all complete {period}s in the rollups and returns
+            { 'reports': [{ start, end, path, cached }, ...], 'timings': { stage: seconds } }. The path
+            is None if there were no interactions, cached is True if the pdf was reused from the cache.
+
+            ----- Keyword arguments -----
+            period: str | 'rolling' (the LOOKBACK days before today), 'day', 'week' or 'month' | default: 'rolling'
+            start, end: date | Arbitrary range instead of a period | default: None
+            backfill: bool | All past periods, requires rollups | default: False
+            today: date | First day not to report | default: today (UTC), the current day is not complete
+        '''
+        if period not in REPORT_NAMES:
+            raise ValueError(f'Unknown period {period}, expected one of {list(REPORT_NAMES)}')
+        if (start is None) != (end is None):
+            raise ValueError('start and end are required together')
+        if start is not None and start >= end:
+            raise ValueError(f'start {start} has to be before end {end}')
+        if backfill and self.rollups is None:
+            raise ValueError('backfill requires rollups')
+        if backfill and period == 'rolling':
+            raise ValueError('backfill requires a calendar period (day, week or month)')
+        today = today or datetime.now(timezone.utc).date() # days are in UTC like the ts of the backend
+        name = 'report' if start is not None else f'{REPORT_NAMES[period]}_report'
+
+        timings = {}
+        with self.lock:
+            with timed(timings, 'sync'):
+                self._sync(today)
+            with timed(timings, 'aggregate'):
+                first = self.rollups.watermark('pepper_emotion_table')[0] if backfill else None
+                panels = [
+                    (first_day, end_day, self._panels(first_day, end_day))
+                    for first_day, end_day in report_ranges(period, today, start, end, first, backfill)
+                ]
+            with timed(timings, 'render'):
+                reports = [
+                    { 'start': str(first_day), 'end': str(end_day), **self._write(name, first_day, end_day, frames) }
+                    for first_day, end_day, frames in panels
+                ]
+        timings['total'] = sum(timings.values())
+        return { 'reports': reports, 'timings': timings }
+
+    def _sync(self, today: date) -> None:
+        if self.mirror is not None and self.API_KEY is not None: # only rows past the watermarks are downloaded
+            self.mirror.sync(self.client.client)
+        if self.rollups is not None: # every complete day is aggregated once, from the mirror if there is one
+            if self.mirror is not None:
+                self.rollups.update(self.mirror, dialect='sqlite', until=today)
+            elif self.API_KEY is not None:
+                self.rollups.update(self.client.client, until=today)
+
+    def _panels(self, start: date, end: date) -> dict:
+        if self.rollups is not None:
+            return self.rollups.panels(PANELS, start, end)
+        if self.mirror is not None:
+            return QueryPlan(PANELS, where=where(start, end), dialect='sqlite').run(self.mirror)
+        return QueryPlan(PANELS, where=where(start, end)).run(self.client)
+
+    def _write(self, name: str, start: date, end: date, panels: dict) -> dict:
+        if all(panel.empty for panel in panels.values()): # e.g. days without visitors in a backfill
+            return { 'path': None, 'cached': False }
+
+        path, last = self.path(name, start, end), end - timedelta(days=1)
+        metadata = {
+            'Title': f'{name.replace("_", " ").capitalize()} {start} - {last}',
+            'Author': 'Team Pepper',
+            # 'Subject': '....',
+            'Keywords': 'pepper robot matplotlib plots report'
+        }
+        if self.cache is None:
+            self._render(f'{path}.tmp', panels, metadata)
+            os.replace(f'{path}.tmp', path) # never writes into an existing report, it may be linked to the cache
+            return { 'path': path, 'cached': False }
+
+        key = self.cache.fingerprint(panels, **metadata)
+        if self.cache.link(key, path): # same panels as an earlier report, e.g. a quiet period rebuilt
+            return { 'path': path, 'cached': True }
+        with self.cache.writing(key, path) as tmp_path:
+            self._render(tmp_path, panels, metadata)
+        return { 'path': path, 'cached': False }
+
+    def _render(self, path: str, panels: dict, metadata: dict) -> None:
+        # pages are rendered (and written) in parallel, those of unchanged panels are taken from the cache
+        figures.write_report(path, panels, metadata, workers=0, executor=self.executor, cache=self.cache)
@@ -0,0 +1,87 @@
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+import traceback
+import warnings
+from argparse import ArgumentParser
+
+from dotenv import dotenv_values
+from Client import Client
+from Mirror import Mirror
+from training import IncrementalTrainer
+
+# ----- M E T A D A T A ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+__version__ = 'v1.0.0'
+__description__ = 'Script to update models exported from main.ipynb with the new Pepper interactions only'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__ = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+__github__ = 'https://github.com/ProjectPepperHSB/Backend-Services.git'
+
+# ----- S E T T I N G S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parser = ArgumentParser(description=__description__)
+parser.add_argument(
+    'models', nargs='+', help='directories of the models exported by scoring.export_model, e.g. models/gender'
+)
+parser.add_argument(
+    '-m', '--mirror', dest='mirror', default=None,
+    help='sync new rows into this local SQLite mirror and train on them from it | default: None'
+)
+parser.add_argument(
+    '--offline', dest='offline', default=False, action='store_true',
+    help='train on the rows of the mirror without syncing it first | default: False'
+)
+parser.add_argument(
+    '-e', '--epochs', dest='epochs', default=2, type=int,
+    help='epochs a Keras model is trained on the new rows | default: 2'
+)
+parser.add_argument(
+    '-c', '--chunk-rows', dest='chunk_rows', default=50000, type=int,
+    help='rows per request and per partial_fit | default: 50000'
+)
+args = parser.parse_args()
+if args.offline and args.mirror is None:
+    parser.error('--offline requires --mirror')
+
+warnings.filterwarnings('ignore')
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def get_api_key() -> str:
+    try:
+        config = dotenv_values('.env')
+        return config['API_KEY']
+    except KeyError:
+        print('No .env file with API_KEY found!')
+        exit()
+
+def main() -> None:
+    client = None if args.offline else Client(get_api_key(), sandbox=False, verbose=1)
+    mirror = Mirror(args.mirror) if args.mirror is not None else None
+    results = []
+    try:
+        if mirror is not None and client is not None:
+            mirror.sync(client, tables=['pepper_emotion_table'], chunk_rows=args.chunk_rows)
+        for directory in args.models:
+            trainer = IncrementalTrainer(directory, epochs=args.epochs, chunk_rows=args.chunk_rows)
+            results.append(trainer.update(mirror or client))
+    except:
+        print(f'Could not update the models!\n{traceback.format_exc()}')
+        print('Check your internet connection and check if the backend service is running!')
+        exit()
+    finally:
+        for connection in (client, mirror):
+            if connection is not None:
+                connection.close()
+
+    for result in results:
+        print(
+            f'Updated {result["model"]} with {result["rows"]} new rows ({result["skipped"]} skipped) in {result["seconds"]:.3f}s '
+            f'(fetch {result["fetch"]:.3f}s, train {result["train"]:.3f}s, save {result["save"]:.3f}s), '
+            f'trained up to data_id {result["watermark"]}'
+        )
+
+
+if __name__ == '__main__':
+    main()
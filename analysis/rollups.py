@@ -0,0 +1,218 @@
+'''
+    rollups.py
+    ===================================
+
+    Incremental store of daily pre-aggregated counts and sums of the pepper_* tables.
+    Every complete day is aggregated (one GROUP BY query over all days past the watermark
+    of each table) and appended to a local SQLite database. Reports of any range - a day,
+    a week, a month, all past weeks - are then computed by merging the rollups of their
+    days, without fetching or aggregating the interactions again.
+
+    Rows can arrive after their day was rolled up (delayed collector posts, a mirror that
+    is synced after the rollup), so every update aggregates the last {refresh_days} rolled
+    up days again and replaces their rollups. Rows that arrive later than that are only
+    in the rollups after a rebuild (a new store).
+
+    Days are UTC days: the ts strings of the mirror, the day boundaries in the WHERE
+    clauses and {until} are UTC. On the web app DATE_FORMAT(ts) of the day is evaluated in
+    the time zone of the MySQL session, so its time_zone has to be UTC (+00:00), like the
+    ts the web app returns, or interactions near midnight are counted for the wrong day.
+
+    The daily rollups (CUBES) hold the mergeable measures (COUNT, SUM) per day and
+    combination of the dimensions of the report panels, the weekday is derived from the
+    day. Any Aggregate of planner.py whose dimensions are part of a cube can be answered.
+
+    ----- E X A M P L E -----
+    > with RollupStore('pepper_rollups.db') as store:
+    >     store.update(client) # or store.update(mirror, dialect='sqlite')
+    {'pepper_emotion_table': 212, 'pepper_use_case_table': 96}
+    >     panels = store.panels(PANELS, '2022-01-03', '2022-01-10') # [start, end)
+    >     panels['emotion_by_weekday']
+                           count
+    weekday basic_emotion
+    0       bad               12
+    ...
+'''
+
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+from planner import Aggregate
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+# at most 3 * 4 * 4 = 48 rows per day for the emotion table and 6 for the use cases
+
+CUBES = {
+    'pepper_emotion_table': Aggregate(
+        'pepper_emotion_table', ['day', 'gender', 'basic_emotion', 'pleasure_state'], mean=['dialog_time']
+    ),
+    'pepper_use_case_table': Aggregate('pepper_use_case_table', ['day', 'use_case'])
+}
+
+PERIODS = ['day', 'week', 'month']
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def period_start(day: date, period: str) -> date:
+    '''Returns the first day of the {period} (calendar day, week starting on Monday, month) {day} is in.'''
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown period {period}, expected one of {PERIODS}')
+
+def period_end(start: date, period: str) -> date:
+    '''Returns the first day after the {period} starting at {start}.'''
+    if period == 'day':
+        return start + timedelta(days=1)
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f'Unknown period {period}, expected one of {PERIODS}')
+
+def periods(period: str, first: date, until: date) -> list:
+    '''Returns [(start, end), ...] of all complete {period}s from the one {first} is in up to {until} (exclusive).'''
+    ranges, start = [], period_start(first, period)
+    while period_end(start, period) <= until:
+        ranges.append((start, period_end(start, period)))
+        start = period_end(start, period)
+    return ranges
+
+def _day(value) -> date:
+    '''Returns the day of a ts as the backend ('2022-01-11T12:34:50.000Z') or the stand-in returns it.'''
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class RollupStore(object):
+    '''
+        Local SQLite store of the daily rollups (see CUBES) of the pepper_* tables.
+
+        ------ P A R A M E T E R S ------
+        :param path: str | optional
+            Location of the SQLite database file (can be the one of the Mirror)
+        :param refresh_days: int | optional
+            Rolled up days that are aggregated again with every update, for rows that arrived late | default: 3
+    '''
+
+    def __init__(self, path: str='pepper_rollups.db', refresh_days: int=3):
+        self.path = path
+        self.refresh_days = refresh_days
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._frames = {} # table -> DataFrame of all rollups, until the next update
+        self._create_tables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _create_tables(self) -> None:
+        with self.connection:
+            for table, cube in CUBES.items():
+                definition = ', '.join(
+                    [f'{dimension} TEXT' for dimension in cube.group_by] +
+                    [f'{measure} {"REAL" if measure.startswith("sum_") else "INTEGER"}' for measure in cube.measures()]
+                )
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS rollup_{table} ({definition})')
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS rollup_{table}_day ON rollup_{table} (day)')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    table_name TEXT PRIMARY KEY, first_day TEXT, last_day TEXT, updated_at REAL
+                )
+            ''')
+
+    def watermark(self, table: str) -> tuple:
+        '''Returns (first day, last rolled up day) of {table} or (None, None).'''
+        row = self.connection.execute(
+            'SELECT first_day, last_day FROM rollup_state WHERE table_name = ?', (table,)
+        ).fetchone()
+        return (_day(row[0]), _day(row[1])) if row is not None else (None, None)
+
+    def update(self, source, dialect: str='mysql', until: date=None) -> dict:
+        '''Rolls up all complete days past the watermark of every table (and the last
+            {refresh_days} rolled up days again) and returns the number of written rollup rows per table.
+
+            ----- Keyword arguments -----
+            source: Client | Client or Mirror (anything with sql_query) the days are aggregated from
+            dialect: str | 'mysql' for the web app, 'sqlite' for the Mirror
+            until: date | First day not to roll up | default: today (UTC), the current day is not complete
+        '''
+        until = until or datetime.now(timezone.utc).date()
+        new_rows = {}
+        for table, cube in CUBES.items():
+            first, last = self.watermark(table)
+            if first is None:
+                oldest = source.sql_query(f'SELECT MIN(ts) AS ts FROM {table}')
+                if not oldest or oldest[0]['ts'] is None: # no data yet
+                    new_rows[table] = 0
+                    continue
+                first = _day(oldest[0]['ts'])
+                start = first
+            else: # the last days again, rows may have arrived after they were rolled up
+                start = max(first, last + timedelta(days=1) - timedelta(days=self.refresh_days))
+
+            new_rows[table] = 0
+            if start >= until:
+                continue
+
+            rows = source.sql_query(cube.sql(f"WHERE ts >= '{start}' AND ts < '{until}'", dialect))
+            columns = cube.group_by + tuple(cube.measures())
+            with self.connection: # the rollups are committed together with their watermark
+                self.connection.execute(f'DELETE FROM rollup_{table} WHERE day >= ?', (str(start),))
+                self.connection.executemany(
+                    f'INSERT INTO rollup_{table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+                    [tuple(str(row['day'])[:10] if column == 'day' else row.get(column) for column in columns) for row in rows]
+                )
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO rollup_state VALUES (?, ?, ?, ?)',
+                    (table, str(first), str(until - timedelta(days=1)), time.time())
+                )
+            self._frames.pop(table, None)
+            new_rows[table] = len(rows)
+        return new_rows
+
+    def frame(self, table: str) -> pd.DataFrame:
+        '''Returns all rollups of {table} with the weekday (0 = Monday) of each day.'''
+        if table not in self._frames:
+            cursor = self.connection.execute(f'SELECT * FROM rollup_{table}')
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+            df['weekday'] = pd.to_datetime(df['day']).dt.weekday.astype('int64')
+            self._frames[table] = df
+        return self._frames[table]
+
+    def panels(self, aggregates: dict, start, end) -> dict:
+        '''Returns { name: DataFrame } of the {aggregates} (see planner.Aggregate) for the days from {start} to {end} (exclusive).
+
+            The days are limited to the last rolled up (complete) day of every table, a table
+            without rolled up days (no rows yet, or only rows of today) gives empty frames.
+        '''
+        start, end = str(start), str(end)
+        frames, rows = {}, {}
+        for name, aggregate in aggregates.items():
+            cube = CUBES.get(aggregate.table)
+            if cube is None or not set(aggregate.group_by) <= set(cube.group_by) | { 'weekday' } or not set(aggregate.mean) <= set(cube.mean):
+                raise ValueError(f'{name} ({aggregate}) can not be computed from the daily rollups')
+            if aggregate.table not in rows:
+                _, last = self.watermark(aggregate.table)
+                df = self.frame(aggregate.table)
+                until = end if last is None else min(end, str(last + timedelta(days=1)))
+                rows[aggregate.table] = df.iloc[:0] if last is None else df[(df['day'] >= start) & (df['day'] < until)]
+            frames[name] = aggregate.frame(rows[aggregate.table])
+        return frames
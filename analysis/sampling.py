@@ -0,0 +1,207 @@
+'''
+    sampling.py
+    ===================================
+
+    Representative samples of the pepper_* tables with a small, fixed transfer budget,
+    instead of SELECT * ... LIMIT 500, which returns the oldest rows in storage order.
+    Used through Client.sample and Mirror.sample.
+
+    First one GROUP BY query returns the number of rows and the smallest and largest
+    data_id of every stratum (of the whole table for a uniform sample). The sample size
+    is split over the strata (proportional to their size or equal for all) and each
+    stratum is sampled by
+
+        keys        key-range sampling: random data_ids between the smallest and the
+                    largest one of the stratum are requested with WHERE data_id IN (...);
+                    every row has the same chance to be drawn, the number of requested
+                    keys follows the share of the stratum in its key range, so only about
+                    the sampled rows are transferred
+        reservoir   a reservoir over the paginated rows (Client.iter_query): every row
+                    gets a random priority, the rows with the smallest priorities are kept;
+                    transfers the whole stratum but works for any source and query
+
+    Strata that are not larger than their share are fetched completely, strata that are
+    too sparse in their key range for key-range sampling (less than {min_density}) use
+    the reservoir.
+
+    Strata can be any column (gender, use_case, ...) or a dimension derived from ts
+    (weekday, hour, day, see planner.DERIVED_DIMENSIONS) - by='day' gives a time-bucketed
+    sample with rows of every day.
+
+    ----- E X A M P L E -----
+    > sample = client.sample('pepper_emotion_table', 500, by='gender', allocation='equal', seed=1)
+    > sample['gender'].value_counts()
+    male      250
+    female    250
+    > sample.attrs['sampling'] # of 300,000 rows
+    {'method': 'keys', 'rows': 500, 'requested_keys': 1117, 'requests': 3, 'strata': 2}
+'''
+
+import math
+
+import numpy as np
+import pandas as pd
+
+import schema
+from planner import DERIVED_DIMENSIONS
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+METHODS = ['keys', 'reservoir']
+ALLOCATIONS = ['proportional', 'equal']
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def _condition(where: str) -> str:
+    '''Returns the condition of a WHERE clause ('WHERE ts > ...' or 'ts > ...'), '' for none.'''
+    where = where.strip()
+    return where[5:].strip() if where[:5].upper() == 'WHERE' else where
+
+def _where(*conditions) -> str:
+    conditions = [condition for condition in conditions if condition]
+    return f'WHERE {" AND ".join(f"({condition})" for condition in conditions)}' if conditions else ''
+
+def _literal(value) -> str:
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def allocate(sizes: dict, n: int, allocation: str='proportional') -> dict:
+    '''Splits the sample size {n} over the strata with {sizes} ({ stratum: rows }).
+
+        proportional: by their share of the rows (largest remainders), equal: the same
+        number for every stratum; no stratum gets more than its rows.
+    '''
+    if allocation not in ALLOCATIONS:
+        raise ValueError(f'Unknown allocation {allocation}, expected one of {ALLOCATIONS}')
+    total = sum(sizes.values())
+    if total <= n:
+        return dict(sizes)
+    if allocation == 'equal':
+        share = math.ceil(n / len(sizes))
+        return { stratum: min(size, share) for stratum, size in sizes.items() }
+
+    exact = { stratum: n * size / total for stratum, size in sizes.items() }
+    shares = { stratum: int(value) for stratum, value in exact.items() }
+    for stratum in sorted(exact, key=lambda stratum: exact[stratum] - shares[stratum], reverse=True)[:n - sum(shares.values())]:
+        shares[stratum] += 1
+    return shares
+
+def sample(
+    source, table: str, n: int, by: str=None, allocation: str='proportional', where: str='', method: str='keys',
+    seed: int=None, dialect: str='mysql', columns: str='*', chunk_rows: int=10000, max_keys: int=2000, min_density: float=0.01
+) -> pd.DataFrame:
+    '''Returns a random sample of about {n} rows of {table} as typed DataFrame, ordered by data_id (see module docstring).
+
+        ----- Keyword arguments -----
+        source: Client | Client or Mirror the rows are queried from
+        by: str | Column or derived dimension (weekday, hour, day) to stratify by | default: None (uniform)
+        allocation: str | 'proportional' or 'equal' share of {n} per stratum
+        where: str | Condition the sampled rows have to fulfill, e.g. "WHERE ts > '2022-01-01'"
+        method: str | 'keys' (key-range sampling) or 'reservoir' (over all rows)
+        dialect: str | 'mysql' for the web app, 'sqlite' for the Mirror
+        columns: str | Columns to return, must include data_id
+        max_keys: int | Largest number of data_ids in one request
+        min_density: float | Smallest share of a stratum in its key range sampled by keys
+    '''
+    if method not in METHODS:
+        raise ValueError(f'Unknown method {method}, expected one of {METHODS}')
+    rng = np.random.default_rng(seed)
+    condition = _condition(where)
+    expression = DERIVED_DIMENSIONS[by][dialect] if by in DERIVED_DIMENSIONS else by
+    if expression != by:
+        columns = f'{columns}, {expression} AS {by}'
+    stats = { 'method': method, 'rows': 0, 'requested_keys': 0, 'requests': 1, 'strata': 0 }
+
+    # rows and key range of every stratum
+    group = f'{expression} AS {by}, ' if by is not None else ''
+    strata = source.sql_query(
+        f'SELECT {group}COUNT(*) AS n, MIN(data_id) AS lo, MAX(data_id) AS hi FROM {table} {_where(condition)}'
+        + (f' GROUP BY {expression}' if by is not None else '')
+    )
+    strata = [stratum for stratum in strata if int(stratum['n'] or 0) > 0]
+    stats['strata'] = len(strata)
+    shares = allocate({ i: int(stratum['n']) for i, stratum in enumerate(strata) }, n, allocation)
+
+    frames = []
+    for i, stratum in enumerate(strata):
+        if shares[i] == 0:
+            continue
+        value = stratum.get(by) if by is not None else None
+        conditions = [condition, None if by is None else (f'{expression} IS NULL' if value is None else f'{expression} = {_literal(value)}')]
+        query = f'SELECT {columns} FROM {table} {_where(*conditions)}'
+        size, lo, hi = int(stratum['n']), int(stratum['lo']), int(stratum['hi'])
+
+        if size <= shares[i]: # the whole stratum
+            frame = _fetch(source, query, table, stats, chunk_rows)
+        elif method == 'reservoir' or size / (hi - lo + 1) < min_density:
+            frame = _reservoir(source, query, table, shares[i], rng, stats, chunk_rows)
+        else:
+            frame = _keys(source, table, columns, conditions, lo, hi, size, shares[i], rng, stats, max_keys)
+        frames.append(frame)
+
+    if not frames:
+        result = schema.frame_from_rows([], table)
+    else:
+        result = pd.concat(frames, ignore_index=True).sort_values('data_id', ignore_index=True)
+    stats['rows'] = len(result)
+    result.attrs['sampling'] = stats
+    return result
+
+def _frame(source, query: str, table: str) -> pd.DataFrame:
+    if hasattr(source, 'query_frame'):
+        return source.query_frame(query, table=table)
+    return schema.frame_from_rows(source.sql_query(query), table)
+
+def _fetch(source, query: str, table: str, stats: dict, chunk_rows: int) -> pd.DataFrame:
+    '''All rows of {query}, page by page.'''
+    chunks = []
+    for chunk in source.iter_query(query, chunk_rows=chunk_rows):
+        stats['requests'] += 1
+        chunks.append(chunk)
+    return pd.concat(chunks, ignore_index=True) if chunks else schema.frame_from_rows([], table)
+
+def _reservoir(source, query: str, table: str, k: int, rng, stats: dict, chunk_rows: int) -> pd.DataFrame:
+    '''{k} rows of {query} with the smallest random priorities, read page by page.'''
+    reservoir, priorities = None, np.empty(0)
+    for chunk in source.iter_query(query, chunk_rows=chunk_rows):
+        stats['requests'] += 1
+        candidates = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+        priorities = np.concatenate([priorities, rng.random(len(chunk))])
+        keep = np.argsort(priorities, kind='stable')[:k]
+        reservoir, priorities = candidates.iloc[keep].reset_index(drop=True), priorities[keep]
+    return reservoir if reservoir is not None else schema.frame_from_rows([], table)
+
+def _keys(source, table: str, columns: str, conditions: list, lo: int, hi: int, size: int, k: int, rng, stats: dict, max_keys: int) -> pd.DataFrame:
+    '''{k} rows of the stratum ({conditions}) by requesting random data_ids between {lo} and {hi}.'''
+    density = size / (hi - lo + 1) # share of the keys in the range that are rows of the stratum
+    tried = np.empty(0, dtype='int64')
+    frames, found = [], 0
+    while found < k and len(tried) < hi - lo + 1:
+        wanted = min(max_keys, math.ceil((k - found) / density * 1.1) + 8)
+        untried = hi - lo + 1 - len(tried)
+        if untried <= wanted * 4: # small rest of the range, draw from the untried keys
+            keys = np.setdiff1d(np.arange(lo, hi + 1), tried)
+            keys = rng.choice(keys, min(wanted, len(keys)), replace=False)
+        else:
+            keys = np.setdiff1d(np.unique(rng.integers(lo, hi + 1, wanted + wanted // 4)), tried)
+            keys = rng.permutation(keys)[:wanted]
+        tried = np.concatenate([tried, keys])
+
+        key_list = ', '.join(map(str, keys.tolist()))
+        frame = _frame(source, f'SELECT {columns} FROM {table} {_where(*conditions, f"data_id IN ({key_list})")}', table)
+        stats['requests'] += 1
+        stats['requested_keys'] += len(keys)
+        frames.append(frame)
+        found += len(frame)
+
+    result = pd.concat(frames, ignore_index=True)
+    if len(result) > k: # every found row is a uniform draw, so any k of them are too
+        result = result.iloc[np.sort(rng.choice(len(result), k, replace=False))]
+    return result.reset_index(drop=True)
@@ -0,0 +1,226 @@
+'''
+    schema.py
+    ===================================
+
+    Declared column types of the pepper_* tables and decoders that turn the response of
+    the sql endpoint straight into typed columns, without building one dict per row.
+
+    Supported response formats (content types):
+        application/json                       list of row objects (default of the web app)
+        application/vnd.pepper.columns+json    { "columns": [names], "data": [[values of column 0], ...] }
+        application/x-ndjson                   one row object per line
+        application/vnd.apache.arrow.stream    Arrow IPC stream (requires pyarrow)
+
+    ----- E X A M P L E -----
+    > decode(b'[{"data_id": 1, "gender": "male", "dialog_time": "3.04", "ts": "2022-01-11T12:34:50.000Z"}]', 'pepper_emotion_table')
+       data_id gender  dialog_time                  ts
+    0        1   male         3.04 2022-01-11 12:34:50
+'''
+
+import re
+import json
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError: # optional, only needed for arrow responses
+    pyarrow = None
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+# values the robot collects, further values that show up in the data are appended
+
+CATEGORIES = {
+    'gender': ['male', 'female', 'other'],
+    'basic_emotion': ['bad', 'good', 'excited', 'bored'],
+    'pleasure_state': ['bad', 'medium', 'good', 'perfect'],
+    'excitement_state': ['excited', 'not excited'],
+    'smile_state': ['false', 'medium', 'true'],
+    'use_case': ['RouteFinder', 'TimeTable', 'Mensa', 'SmallTalk', 'About HS', 'About HBV']
+}
+
+SCHEMAS = {
+    'pepper_emotion_table': {
+        'data_id': 'int64',
+        'identifier': 'str',
+        'distance': 'float32',
+        'age': 'int64',
+        'gender': 'category',
+        'basic_emotion': 'category',
+        'pleasure_state': 'category',
+        'excitement_state': 'category',
+        'smile_state': 'category',
+        'dialog_time': 'float32',
+        'ts': 'datetime64[ns]'
+    },
+    'pepper_use_case_table': {
+        'data_id': 'int64',
+        'identifier': 'str',
+        'use_case': 'category',
+        'ts': 'datetime64[ns]'
+    },
+    'pepper_did_not_understand_table': {
+        'data_id': 'int64',
+        'identifier': 'str',
+        'phrase': 'str',
+        'ts': 'datetime64[ns]'
+    },
+    'pepper_conversation_table': {
+        'data_id': 'int64',
+        'identifier': 'str',
+        'data': 'str',
+        'ts': 'datetime64[ns]'
+    }
+}
+
+JSON = 'application/json'
+COLUMNS_JSON = 'application/vnd.pepper.columns+json'
+NDJSON = 'application/x-ndjson'
+ARROW = 'application/vnd.apache.arrow.stream'
+
+_TABLE_PATTERN = re.compile(r'\bfrom\s+`?(pepper_\w+)`?', re.IGNORECASE)
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def table_of(query: str) -> Optional[str]:
+    '''Returns the first pepper table {query} selects from, if it has a declared schema.'''
+    match = _TABLE_PATTERN.search(query)
+    if match is not None and match.group(1) in SCHEMAS:
+        return match.group(1)
+    return None
+
+
+class ColumnarDecoder(object):
+    '''
+        object_pairs_hook for json.loads that appends every value directly to the list of
+        its column instead of creating a dict per row. Values of categorical columns are
+        stored as integer codes, so each distinct string is kept only once.
+
+        Only suitable for flat rows (the pepper_* tables), since nested objects would be
+        treated as rows as well.
+
+        ------ E X A M P L E ------
+        > decoder = ColumnarDecoder(SCHEMAS['pepper_use_case_table'])
+        > json.loads(content, object_pairs_hook=decoder)
+        > decoder.frame()
+    '''
+
+    def __init__(self, schema: dict=None):
+        self.schema = schema or {}
+        self.columns = {}
+        self.lookups = { column: {} for column, dtype in self.schema.items() if dtype == 'category' }
+
+    def __call__(self, pairs: list) -> None:
+        columns, lookups = self.columns, self.lookups
+        for column, value in pairs:
+            lookup = lookups.get(column)
+            if lookup is not None:
+                code = lookup.get(value)
+                if code is None:
+                    code = -1 if value is None else lookup.setdefault(value, len(lookup))
+                value = code
+            try:
+                columns[column].append(value)
+            except KeyError:
+                columns[column] = [value]
+
+    def frame(self) -> pd.DataFrame:
+        '''Returns the decoded columns as typed DataFrame and releases the column lists.'''
+        if not self.columns:
+            return pd.DataFrame(columns=list(self.schema))
+
+        data = {}
+        for column in list(self.columns):
+            values = self.columns.pop(column)
+            if column in self.lookups:
+                data[column] = categorical_from_codes(values, self.lookups.pop(column), column)
+            else:
+                data[column] = _convert(values, self.schema.get(column), column)
+        return pd.DataFrame(data, copy=False)
+
+
+def decode(content, table: str=None, content_type: str=JSON) -> pd.DataFrame:
+    '''Decodes the response of a sql query into a DataFrame typed by the schema of {table}.'''
+    content_type = (content_type or JSON).split(';')[0].strip()
+    if content_type == COLUMNS_JSON:
+        response = json.loads(content)
+        return frame_from_columns(dict(zip(response['columns'], response['data'])), table)
+    if content_type == NDJSON:
+        return decode_ndjson(content.splitlines(), table)
+    if content_type == ARROW:
+        return decode_arrow(content, table)
+
+    if table not in SCHEMAS:
+        return frame_from_rows(json.loads(content), table)
+
+    decoder = ColumnarDecoder(SCHEMAS[table])
+    json.loads(content, object_pairs_hook=decoder)
+    return decoder.frame()
+
+def decode_ndjson(lines: Iterable, table: str=None) -> pd.DataFrame:
+    '''Decodes row objects line by line (e.g. from response.iter_lines()) into typed columns.'''
+    decoder = ColumnarDecoder(SCHEMAS.get(table))
+    batch = []
+    for line in lines:
+        if line:
+            batch.append(line.encode() if isinstance(line, str) else line)
+        if len(batch) == 4096: # parsing lines as one array is much faster than line by line
+            json.loads(b'[' + b','.join(batch) + b']', object_pairs_hook=decoder)
+            batch = []
+    if batch:
+        json.loads(b'[' + b','.join(batch) + b']', object_pairs_hook=decoder)
+    return decoder.frame()
+
+def decode_arrow(content: bytes, table: str=None) -> pd.DataFrame:
+    if pyarrow is None:
+        raise ImportError('pyarrow is required to decode arrow responses')
+    df = pyarrow.ipc.open_stream(content).read_pandas()
+    return frame_from_columns({ column: df[column].values for column in df.columns }, table)
+
+def frame_from_columns(columns: dict, table: str=None) -> pd.DataFrame:
+    '''Returns a dict of column name -> values as DataFrame typed by the schema of {table}.'''
+    schema = SCHEMAS.get(table, {})
+    if not columns:
+        return pd.DataFrame(columns=list(schema))
+    return pd.DataFrame({
+        column: _convert(values, schema.get(column, 'datetime64[ns]' if column == 'ts' else None), column)
+        for column, values in columns.items()
+    }, copy=False)
+
+def frame_from_rows(rows: list, table: str=None) -> pd.DataFrame:
+    '''Returns already decoded rows (list of dicts) as DataFrame typed by the schema of {table}.'''
+    if not rows:
+        return frame_from_columns({}, table)
+    return frame_from_columns({ column: [row.get(column) for row in rows] for column in rows[0] }, table)
+
+def categorical_from_codes(codes: list, lookup: dict, column: str) -> pd.Categorical:
+    '''Returns the integer {codes} of {column} (-1 for null, e.g. of pd.factorize) with the
+        { value: code } {lookup} as categorical with the declared categories first, further
+        values in sorted order.
+    '''
+    declared = CATEGORIES.get(column, [])
+    categories = declared + sorted(value for value in lookup if value not in declared)
+    remap = np.full(len(lookup) + 1, -1, dtype='int32') # last entry maps -1 (null) to -1
+    for value, code in lookup.items():
+        remap[code] = categories.index(value)
+    return pd.Categorical.from_codes(remap[np.asarray(codes, dtype='int32')], categories=categories)
+
+def _convert(values, dtype: str=None, column: str=None):
+    if dtype is None:
+        return np.asarray(values) if len(values) else np.array([], dtype=object)
+    if isinstance(values, np.ndarray) and values.dtype != object and dtype != 'category':
+        return values if dtype.startswith('datetime64') else values.astype(dtype, copy=False)
+    if dtype == 'category':
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object)) # nulls get the code -1
+        return categorical_from_codes(codes, { value: code for code, value in enumerate(uniques) }, column)
+    if dtype == 'str':
+        return np.array(values, dtype=object)
+    if dtype.startswith('datetime64'):
+        return pd.to_datetime(pd.Series(values, dtype=object), utc=True).dt.tz_convert(None).values
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError): # nulls or numbers as strings
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        return numbers.astype('float32' if dtype == 'float32' else 'Int64').values
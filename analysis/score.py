@@ -0,0 +1,87 @@
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+import traceback
+import warnings
+from argparse import ArgumentParser
+
+from dotenv import dotenv_values
+from Client import Client
+from Mirror import Mirror
+from scoring import PredictionStore, score
+
+# ----- M E T A D A T A ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+__version__ = 'v1.0.0'
+__description__ = 'Script to score new Pepper interactions with a model exported from main.ipynb'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__ = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+__github__ = 'https://github.com/ProjectPepperHSB/Backend-Services.git'
+
+# ----- S E T T I N G S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parser = ArgumentParser(description=__description__)
+parser.add_argument(
+    'model', help='directory of the model exported by scoring.export_model, e.g. models/gender'
+)
+parser.add_argument(
+    '-s', '--store', dest='store', default='pepper_predictions.db',
+    help='SQLite store the predictions are written to | default: pepper_predictions.db'
+)
+parser.add_argument(
+    '-m', '--mirror', dest='mirror', default=None,
+    help='sync new rows into this local SQLite mirror and score them from it | default: None'
+)
+parser.add_argument(
+    '--offline', dest='offline', default=False, action='store_true',
+    help='score the rows of the mirror without syncing it first | default: False'
+)
+parser.add_argument(
+    '-c', '--chunk-rows', dest='chunk_rows', default=50000, type=int,
+    help='rows per request and per prediction | default: 50000'
+)
+parser.add_argument(
+    '-w', '--workers', dest='workers', default=0, type=int,
+    help='processes predicting the chunks, 0 predicts in this process | default: 0'
+)
+args = parser.parse_args()
+if args.offline and args.mirror is None:
+    parser.error('--offline requires --mirror')
+
+warnings.filterwarnings('ignore')
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def get_api_key() -> str:
+    try:
+        config = dotenv_values('.env')
+        return config['API_KEY']
+    except KeyError:
+        print('No .env file with API_KEY found!')
+        exit()
+
+def main() -> None:
+    client = None if args.offline else Client(get_api_key(), sandbox=False, verbose=1)
+    mirror = Mirror(args.mirror) if args.mirror is not None else None
+    try:
+        if mirror is not None and client is not None:
+            mirror.sync(client, tables=['pepper_emotion_table'], chunk_rows=args.chunk_rows)
+        with PredictionStore(args.store) as store:
+            result = score(mirror or client, args.model, store, chunk_rows=args.chunk_rows, workers=args.workers)
+    except:
+        print(f'Could not score the interactions!\n{traceback.format_exc()}')
+        print('Check your internet connection and check if the backend service is running!')
+        exit()
+    finally:
+        for connection in (client, mirror):
+            if connection is not None:
+                connection.close()
+
+    print(
+        f'Scored {result["rows"]} rows with {result["model"]} in {result["seconds"]:.3f}s '
+        f'({result["rows_per_sec"]:,.0f} rows/sec), predictions up to data_id {result["data_id"]} in {args.store}'
+    )
+
+
+if __name__ == '__main__':
+    main()
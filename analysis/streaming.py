@@ -0,0 +1,266 @@
+'''
+    streaming.py
+    ===================================
+
+    One-pass statistics of the pepper_* tables with bounded memory, for report windows
+    (a quarter, a year) whose rows do not fit into one DataFrame. A StreamState consumes
+    row chunks - from Client.iter_query, a local csv/ndjson export or any list of rows -
+    and keeps only one row per combination of its dimensions (the categories, weekday
+    and hour of ts) with mergeable measures:
+
+        n               rows
+        n_<column>      non null values of a numeric column (dialog_time, age)
+        sum_<column>    their sum
+        m2_<column>     their sum of squared deviations from the mean
+
+    The size of the state only depends on the number of categories (at most
+    3 * 4 * 4 * 7 * 24 = 8064 rows for the emotion table). Two states, e.g. of parallel
+    workers reading different files, are merged by adding the counts and sums and
+    combining the squared deviations (Chan et al.), so mean and variance stay exact.
+
+    The measures are those of planner.Aggregate, so the panels of the weekly report
+    (counts, mean dialog time, by weekday ...) and with them all its charts are computed
+    from the states alone.
+
+    ----- E X A M P L E -----
+    > emotions = StreamState('pepper_emotion_table')
+    > for chunk in client.iter_query('SELECT * FROM pepper_emotion_table WHERE ts >= "2022-01-01"', chunk_rows=50000):
+    >     emotions.update(chunk)
+    > emotions.stats('dialog_time', by=['weekday'])
+               n      mean       var       std
+    weekday
+    0       1734  4.129821  5.212342  2.283066
+    ...
+    > use_cases = StreamState('pepper_use_case_table').consume(read_chunks('use_cases.csv'))
+    > frames = panels([emotions, use_cases], PANELS) # the panels of weekly-report.py
+    > figures.render_report(pdf, frames)
+'''
+
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import preprocessing
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+# dimensions and numeric columns of the states, weekday and hour are derived from ts
+
+CUBES = {
+    'pepper_emotion_table': {
+        'dimensions': ['gender', 'basic_emotion', 'pleasure_state', 'weekday', 'hour'],
+        'measures': ['dialog_time', 'age']
+    },
+    'pepper_use_case_table': {
+        'dimensions': ['use_case', 'weekday', 'hour'],
+        'measures': []
+    }
+}
+
+TIME_DIMENSIONS = ['weekday', 'hour']
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def read_chunks(path: str, chunk_rows: int=100000):
+    '''Yields the rows of a local export of a pepper_* table (.csv or .ndjson/.jsonl) as DataFrames of {chunk_rows} rows.'''
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        reader = pd.read_csv(path, chunksize=chunk_rows)
+    elif extension in ('.ndjson', '.jsonl'):
+        reader = pd.read_json(path, lines=True, chunksize=chunk_rows, dtype=False)
+    else:
+        raise ValueError(f'Unknown file type {extension}, expected .csv, .ndjson or .jsonl')
+    with reader:
+        yield from reader
+
+def panels(states: list, aggregates: dict) -> dict:
+    '''Returns { name: DataFrame } of the {aggregates} (see planner.Aggregate) from the states of their tables.'''
+    by_table = { state.table: state for state in states }
+    frames = {}
+    for name, aggregate in aggregates.items():
+        if aggregate.table not in by_table:
+            raise ValueError(f'{name} needs a state of {aggregate.table}')
+        frames[name] = by_table[aggregate.table].frame(aggregate)
+    return frames
+
+def _aggregate_file(table: str, path: str, chunk_rows: int):
+    return StreamState(table).consume(read_chunks(path, chunk_rows))
+
+def aggregate_files(table: str, paths: list, workers: int=None, chunk_rows: int=100000):
+    '''Builds the StreamState of {table} from the exports at {paths}, one file per worker process, and merges them.'''
+    workers = min(len(paths), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        states = [_aggregate_file(table, path, chunk_rows) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            states = list(executor.map(_aggregate_file, [table] * len(paths), paths, [chunk_rows] * len(paths)))
+    return StreamState(table).merge(*states)
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class StreamState(object):
+    '''
+        Mergeable one-pass statistics of a pepper_* table (see module docstring).
+
+        ------ P A R A M E T E R S ------
+        :param table: str
+            pepper_* table the chunks are rows of
+        :param dimensions: list | optional
+            Columns (and weekday, hour) to count per combination | default: CUBES[table]
+        :param measures: list | optional
+            Numeric columns whose mean and variance are kept | default: CUBES[table]
+    '''
+
+    def __init__(self, table: str, dimensions: list=None, measures: list=None):
+        cube = CUBES.get(table, { 'dimensions': [], 'measures': [] })
+        self.table = table
+        self.dimensions = list(dimensions if dimensions is not None else cube['dimensions'])
+        self.measures = list(measures if measures is not None else cube['measures'])
+        self.rows = 0
+        self.state = pd.DataFrame({ column: pd.Series(dtype='object') for column in self.dimensions })
+        for column in self.columns():
+            self.state[column] = pd.Series(dtype='float64')
+
+    def __repr__(self) -> str:
+        return f'StreamState({self.table!r}, {self.rows} rows, {len(self.state)} groups)'
+
+    def columns(self) -> list:
+        '''Names of the measure columns of the state.'''
+        return ['n'] + [f'{kind}_{column}' for column in self.measures for kind in ('n', 'sum', 'm2')]
+
+    # ----- U P D A T E -----
+
+    def update(self, chunk) -> 'StreamState':
+        '''Adds the rows of {chunk} (DataFrame or list of row dicts as the api returns them) to the state.'''
+        df = chunk if isinstance(chunk, pd.DataFrame) else pd.DataFrame(chunk)
+        if df.empty:
+            return self
+
+        columns = [column for column in self.dimensions if column not in TIME_DIMENSIONS] + self.measures
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            raise ValueError(f'The chunk has no column(s) {missing}')
+        time_dimensions = [column for column in TIME_DIMENSIONS if column in self.dimensions]
+        df = df[columns + (['ts'] if time_dimensions else [])].copy() # only the columns of the state
+        preprocessing.to_numeric(df)
+        if time_dimensions:
+            preprocessing.add_time_features(df)
+
+        keys = [df[column] for column in self.dimensions]
+        grouped = df.groupby(keys, observed=True, dropna=False, sort=False)
+        partial = grouped.size().rename('n').to_frame().astype('float64')
+        for column in self.measures:
+            values = df[column].astype('float64')
+            by_group = values.groupby(keys, observed=True, dropna=False, sort=False)
+            partial[f'n_{column}'] = by_group.count()
+            partial[f'sum_{column}'] = by_group.sum()
+            partial[f'm2_{column}'] = ((values - by_group.transform('mean')) ** 2).groupby(
+                keys, observed=True, dropna=False, sort=False
+            ).sum()
+        partial = partial.reset_index()
+        for column in self.dimensions: # plain values, so states of different chunks and workers concatenate
+            partial[column] = partial[column].astype('object')
+
+        self.state = self._combine([self.state, partial], self.dimensions)
+        self.rows += len(df)
+        return self
+
+    def consume(self, chunks) -> 'StreamState':
+        '''Adds all chunks of an iterable (Client.iter_query, read_chunks, ...) and returns self.'''
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def merge(self, *others) -> 'StreamState':
+        '''Merges the states of {others} (same table, dimensions and measures) into this one and returns self.'''
+        for other in others:
+            if (other.table, other.dimensions, other.measures) != (self.table, self.dimensions, self.measures):
+                raise ValueError(f'Can not merge {other} into {self}, they count different things')
+        self.state = self._combine([self.state] + [other.state for other in others], self.dimensions)
+        self.rows += sum(other.rows for other in others)
+        return self
+
+    def _combine(self, frames: list, by: list) -> pd.DataFrame:
+        '''Merges the rows of {frames} with equal values of {by}: counts and sums are added,
+            the squared deviations of every row from the mean of its merged group are added
+            to the m2 columns (Chan et al.).
+        '''
+        df = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+        if by:
+            grouped = df.groupby(by, dropna=False, sort=False)
+            total = lambda column: grouped[column].transform('sum')
+        else:
+            total = lambda column: pd.Series(df[column].sum(), index=df.index)
+
+        df = df.copy()
+        for column in self.measures:
+            n, group_n = df[f'n_{column}'], total(f'n_{column}')
+            mean = df[f'sum_{column}'] / n.where(n > 0)
+            group_mean = total(f'sum_{column}') / group_n.where(group_n > 0)
+            df[f'm2_{column}'] = df[f'm2_{column}'] + (n * (mean - group_mean) ** 2).fillna(0)
+
+        if not by:
+            return df[self.columns()].sum().to_frame().T
+        return df.groupby(by, dropna=False, sort=False)[self.columns()].sum().reset_index()
+
+    # ----- R E S U L T S -----
+
+    def frame(self, aggregate) -> pd.DataFrame:
+        '''Returns the panel of a planner.Aggregate (count and means per group) like QueryPlan does.'''
+        if aggregate.table != self.table or not set(aggregate.group_by) <= set(self.dimensions) or not set(aggregate.mean) <= set(self.measures):
+            raise ValueError(f'{aggregate} can not be computed from {self}')
+        return aggregate.frame(self.state)
+
+    def stats(self, column: str, by: list=()) -> pd.DataFrame:
+        '''Returns n, mean, (sample) variance and standard deviation of {column} overall or per group of {by}.'''
+        if column not in self.measures or not set(by) <= set(self.dimensions):
+            raise ValueError(f'{column} by {list(by)} is not part of {self}')
+        df = self._combine([self.state], list(by))
+        n = df[f'n_{column}']
+        result = pd.DataFrame({
+            'n': n.astype('int64'),
+            'mean': df[f'sum_{column}'] / n.where(n > 0),
+            'var': df[f'm2_{column}'] / (n - 1).where(n > 1)
+        })
+        result['std'] = np.sqrt(result['var'])
+        if by:
+            result.index = pd.MultiIndex.from_frame(df[list(by)]) if len(by) > 1 else pd.Index(df[by[0]], name=by[0])
+            result = result.sort_index()
+        return result
+
+    def histogram(self, by: list=('weekday', 'hour')) -> pd.Series:
+        '''Returns the number of rows per value (combination) of {by}, e.g. per weekday and hour.'''
+        df = self._combine([self.state], list(by))
+        return df.set_index(list(by))['n'].astype('int64').sort_index()
+
+    # ----- P E R S I S T E N C E -----
+
+    def save(self, path: str) -> None:
+        '''Writes the state as json, e.g. to merge it with the states of later runs.'''
+        with open(path, 'w') as f:
+            json.dump({
+                'table': self.table, 'dimensions': self.dimensions, 'measures': self.measures, 'rows': self.rows,
+                'state': self.state.astype('object').where(self.state.notna(), None).values.tolist()
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'StreamState':
+        with open(path) as f:
+            saved = json.load(f)
+        state = cls(saved['table'], saved['dimensions'], saved['measures'])
+        state.rows = saved['rows']
+        df = pd.DataFrame(saved['state'], columns=state.dimensions + state.columns())
+        for column in state.columns():
+            df[column] = df[column].astype('float64')
+        for column in state.dimensions:
+            df[column] = df[column].astype('object')
+        state.state = df
+        return state
@@ -0,0 +1,68 @@
+'''
+    Fixtures of the analysis tests: a few seeded weeks of interactions (fixed timestamps
+    in UTC, so every range and weekday is reproducible) in a SQLite mirror and in the
+    local stand-in of the web app (local-backend/local_backend.py).
+'''
+
+import os, sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ANALYSIS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ANALYSIS, os.path.join(os.path.dirname(ANALYSIS), 'local-backend')]
+from Mirror import Mirror
+from local_backend import LocalBackend
+import schema
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+FIRST_DAY = pd.Timestamp('2022-01-01') # a Saturday
+DAYS = 45
+INTERACTIONS = 3000
+
+# ----- F I X T U R E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.fixture(scope='session')
+def tables() -> dict:
+    '''{ table: DataFrame } of seeded interactions between FIRST_DAY and FIRST_DAY + DAYS, ordered by data_id.'''
+    rng = np.random.default_rng(42)
+    seconds = np.sort(rng.integers(0, DAYS * 86400, INTERACTIONS))
+    ts = (FIRST_DAY + pd.to_timedelta(seconds, unit='s')).strftime(Mirror.TS_FORMAT)
+    identifiers = [f'{i:032x}' for i in range(INTERACTIONS)]
+    emotions = pd.DataFrame({
+        'data_id': np.arange(1, INTERACTIONS + 1), 'identifier': identifiers,
+        'distance': rng.random(INTERACTIONS).round(4), 'age': rng.integers(3, 80, INTERACTIONS),
+        **{ column: rng.choice(schema.CATEGORIES[column], INTERACTIONS) for column in (
+            'gender', 'basic_emotion', 'pleasure_state', 'excitement_state', 'smile_state'
+        ) },
+        'dialog_time': (np.abs(rng.normal(3, 3, INTERACTIONS)) + 1).round(2), 'ts': ts
+    })
+    use_cases = pd.DataFrame({
+        'data_id': np.arange(1, INTERACTIONS + 1), 'identifier': identifiers,
+        'use_case': rng.choice(schema.CATEGORIES['use_case'], INTERACTIONS), 'ts': ts
+    })
+    return { 'pepper_emotion_table': emotions, 'pepper_use_case_table': use_cases }
+
+@pytest.fixture(scope='session')
+def mirror_path(tables, tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp('mirror') / 'mirror.db')
+    with Mirror(path) as mirror:
+        for table, df in tables.items():
+            df.to_sql(table, mirror.connection, if_exists='append', index=False)
+    return path
+
+@pytest.fixture
+def mirror(mirror_path):
+    with Mirror(mirror_path) as mirror:
+        yield mirror
+
+@pytest.fixture(scope='session')
+def backend(tables):
+    '''The local stand-in of the web app serving the seeded tables, for Client(API_KEY='sandbox', url=backend.url).'''
+    with LocalBackend(port=0) as backend:
+        with backend.lock, backend.connection:
+            for table, df in tables.items():
+                df.to_sql(table, backend.connection, if_exists='append', index=False)
+        yield backend
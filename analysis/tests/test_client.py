@@ -0,0 +1,121 @@
+'''
+    Tests of the Client against real HTTP servers: a scripted one for the retry policy
+    and the local stand-in of the web app (local-backend/local_backend.py) for queries.
+'''
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+import requests
+
+from Client import Client
+
+# ----- F I X T U R E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class ScriptedServer(ThreadingHTTPServer):
+    '''Answers the n-th POST with {script}[n]: a status code, or a number of seconds to wait before answering 200.'''
+
+    def __init__(self, script: list):
+        self.script, self.posts = list(script), 0
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive
+
+            def do_POST(handler):
+                handler.rfile.read(int(handler.headers.get('Content-Length', 0)))
+                step = self.script[min(self.posts, len(self.script) - 1)]
+                self.posts += 1
+                if isinstance(step, float):
+                    time.sleep(step)
+                status = step if isinstance(step, int) else 200
+                body = b'[]' if status == 200 else b'unavailable'
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_port}'
+
+@pytest.fixture
+def scripted():
+    servers = []
+    def start(*script):
+        servers.append(ScriptedServer(script))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def test_sql_query_that_timed_out_is_not_sent_again(scripted):
+    server = scripted(0.5)
+    with Client('key', url=server.url, verbose=1, backoff_factor=0) as client:
+        client.timeout = 0.1
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            client.sql_query('SELECT * FROM pepper_emotion_table')
+    assert server.posts == 1
+
+def test_read_retries_are_opt_in(scripted):
+    server = scripted(0.5, 0.0)
+    with Client('key', url=server.url, verbose=1, backoff_factor=0, retry_reads=True) as client:
+        client.timeout = 0.1
+        assert client.sql_query('SELECT * FROM pepper_emotion_table') == []
+    assert server.posts == 2
+
+def test_unavailable_backend_is_retried(scripted):
+    server = scripted(503, 503, 200)
+    with Client('key', url=server.url, verbose=1, backoff_factor=0) as client:
+        assert client.sql_query('SELECT * FROM pepper_emotion_table') == []
+    assert server.posts == 3
+
+def test_hooks_time_only_new_connections(scripted):
+    server, records = scripted(200), []
+    with Client('key', url=server.url.replace('127.0.0.1', 'localhost'), verbose=1, hooks=[records.append]) as client:
+        client.sql_query('SELECT * FROM pepper_emotion_table')
+        client.sql_query('SELECT * FROM pepper_use_case_table') # keep-alive
+    assert [record['new_connections'] for record in records] == [1, 0]
+    assert records[0]['connect'] > 0 and records[1]['connect'] == 0
+    assert [record['status'] for record in records] == [200, 200]
+
+# ----- P A G I N A T I O N ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.fixture
+def client(backend):
+    with Client('sandbox', url=backend.url, verbose=1) as client:
+        yield client
+
+@pytest.mark.parametrize('chunk_rows', [1000, 700, 5000]) # a multiple of the rows, a remainder, one page
+def test_iter_query_pages_through_all_rows_in_key_order(client, tables, chunk_rows):
+    chunks = list(client.iter_query('SELECT * FROM pepper_emotion_table', chunk_rows=chunk_rows))
+    expected = tables['pepper_emotion_table']
+    assert [len(chunk) for chunk in chunks] == [
+        min(chunk_rows, len(expected) - start) for start in range(0, len(expected), chunk_rows)
+    ]
+    data_ids = pd.concat(chunks)['data_id'].tolist()
+    assert data_ids == expected['data_id'].tolist()
+
+def test_iter_query_pages_filtered_queries_and_skips_to_after(client, tables):
+    query = "SELECT data_id, gender, ts FROM pepper_emotion_table WHERE gender = 'male'"
+    df = pd.concat(client.iter_query(query, chunk_rows=128, after=1500))
+    expected = tables['pepper_emotion_table'].query("gender == 'male' and data_id > 1500")
+    assert df['data_id'].tolist() == expected['data_id'].tolist()
+    assert isinstance(df['gender'].dtype, pd.CategoricalDtype) and df['ts'].dtype.kind == 'M' # typed by schema.py
+
+def test_iter_rows_returns_the_api_rows_of_every_page(client, tables):
+    pages = list(client.iter_rows('SELECT * FROM pepper_use_case_table', chunk_rows=1000, after=2500))
+    assert [len(rows) for rows in pages] == [500]
+    assert pages[0][0]['use_case'] == tables['pepper_use_case_table']['use_case'].iloc[2500]
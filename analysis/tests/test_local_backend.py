@@ -0,0 +1,80 @@
+'''
+    Tests of the MySQL emulation of the local stand-in of the web app (local-backend/local_backend.py):
+    the rewritten NOW()/CURDATE() intervals, the statements it accepts and the MySQL
+    date functions, which have to count like pandas on the seeded tables.
+'''
+
+from datetime import datetime, timedelta, timezone
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from local_backend import is_allowed, translate_query
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+TABLE = 'pepper_emotion_table'
+
+def query(backend, sql: str) -> pd.DataFrame:
+    '''The result of {sql} at the sql endpoint of {backend} as DataFrame.'''
+    status, columns, rows = backend.sql({ 'auth_key': backend.api_key, 'subject': 'sql_query', 'query_str': sql })
+    assert status == 200, rows
+    return pd.DataFrame(rows, columns=columns)
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.mark.parametrize('mysql, sqlite', [
+    ('SELECT * FROM t WHERE ts > NOW() - INTERVAL 7 day;', "SELECT * FROM t WHERE ts > datetime('now', '-7 day')"),
+    ('SELECT * FROM t WHERE ts >= CURDATE() - interval 2 WEEK', "SELECT * FROM t WHERE ts >= datetime('now', 'start of day', '-14 day')"),
+    ('SELECT * FROM t WHERE ts < NOW() + INTERVAL 3 HOURS', "SELECT * FROM t WHERE ts < datetime('now', '+3 hour')"),
+    ('SELECT NOW(), `gender` FROM `t`', 'SELECT datetime(\'now\'), "gender" FROM "t"')
+])
+def test_translate_query(mysql, sqlite):
+    assert translate_query(mysql) == sqlite
+
+def test_translated_intervals_are_evaluated_in_utc():
+    connection = sqlite3.connect(':memory:')
+    value = connection.execute(translate_query('SELECT NOW() - INTERVAL 2 day')).fetchone()[0]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert abs(datetime.fromisoformat(value) - (now - timedelta(days=2))) < timedelta(seconds=5)
+    day = connection.execute(translate_query('SELECT CURDATE() - INTERVAL 1 day')).fetchone()[0]
+    assert day == f'{(now - timedelta(days=1)).date()} 00:00:00'
+
+@pytest.mark.parametrize('sql, allowed', [
+    ('SELECT * FROM pepper_emotion_table', True),
+    ('  select COUNT(*) FROM `pepper_use_case_table`;', True),
+    ('SELECT * FROM (SELECT * FROM pepper_emotion_table) AS e JOIN pepper_use_case_table USING (identifier)', True),
+    ('SELECT * FROM sqlite_master', False),
+    ('SELECT * FROM pepper_emotion_table JOIN users', False),
+    ('DELETE FROM pepper_emotion_table', False),
+    ('SELECT 1 FROM pepper_emotion_table; DROP TABLE pepper_emotion_table', False),
+])
+def test_is_allowed(sql, allowed):
+    assert is_allowed(sql) is allowed
+
+def test_rejected_and_invalid_queries_are_bad_requests(backend):
+    request = lambda sql: backend.sql({ 'auth_key': backend.api_key, 'subject': 'sql_query', 'query_str': sql })
+    assert request('DROP TABLE pepper_emotion_table')[::2] == (400, 'Invalid SQL command!')
+    assert request('SELECT nothing FROM pepper_emotion_table')[0] == 400
+    assert backend.count(TABLE) > 0
+    assert backend.sql({ 'auth_key': 'wrong', 'subject': 'sql_query', 'query_str': f'SELECT * FROM {TABLE}' })[0] == 401
+
+def test_date_functions_count_like_pandas(backend, tables):
+    ts = pd.to_datetime(tables[TABLE]['ts'])
+    result = query(backend, (
+        'SELECT WEEKDAY(ts) AS weekday, DAYOFWEEK(ts) AS dayofweek, HOUR(ts) AS hour, '
+        f"DATE_FORMAT(ts, '%Y-%m-%d') AS day, MONTH(ts) AS month, YEAR(ts) AS year, COUNT(*) AS n FROM {TABLE} "
+        'GROUP BY WEEKDAY(ts), DAYOFWEEK(ts), HOUR(ts), DATE_FORMAT(ts, \'%Y-%m-%d\'), MONTH(ts), YEAR(ts)'
+    ))
+    expected = pd.DataFrame({
+        'weekday': ts.dt.weekday, 'dayofweek': (ts.dt.weekday + 1) % 7 + 1, 'hour': ts.dt.hour, # MySQL: Sunday = 1
+        'day': ts.dt.strftime('%Y-%m-%d'), 'month': ts.dt.month, 'year': ts.dt.year
+    }).groupby(['weekday', 'dayofweek', 'hour', 'day', 'month', 'year']).size().rename('n').reset_index()
+    result = result.sort_values(list(expected.columns[:-1]), ignore_index=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_ts_is_returned_like_mysql(backend, tables):
+    result = query(backend, f'SELECT data_id, ts FROM {TABLE} WHERE data_id <= 3 ORDER BY data_id')
+    expected = pd.to_datetime(tables[TABLE]['ts'].head(3)).dt.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    assert result['ts'].tolist() == expected.tolist()
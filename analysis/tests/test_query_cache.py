@@ -0,0 +1,62 @@
+'''
+    Tests of the QueryCache of Client.py: keys, expiry, LRU eviction and the on-disk
+    tier, which has to return exactly the rows that were put.
+'''
+
+import pytest
+
+from Client import Client, QueryCache
+from local_backend import LocalBackend
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+ROWS = [
+    { 'data_id': 1, 'gender': 'male', 'dialog_time': 3.04, 'age': None, 'data': { 'name': 'Pepper' }, 'mixed': 1 },
+    { 'data_id': 2, 'gender': None, 'dialog_time': 0.5, 'age': 31, 'data': None, 'mixed': '1' },
+    { 'data_id': 3, 'gender': 'female', 'dialog_time': None, 'age': 7, 'data': [1, 2], 'mixed': 2.5 }
+]
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def test_keys_ignore_whitespace_and_case_outside_of_literals():
+    cache = QueryCache()
+    assert cache.key('SELECT *  FROM pepper_emotion_table;') == cache.key('select * from pepper_emotion_table')
+    assert cache.key("SELECT * FROM t WHERE gender = 'Male'") != cache.key("SELECT * FROM t WHERE gender = 'male'")
+    assert cache.key('SELECT 1', namespace='http://a') != cache.key('SELECT 1', namespace='http://b')
+
+def test_disk_tier_returns_the_rows_that_were_put(tmp_path):
+    QueryCache(directory=str(tmp_path)).put('k', ROWS)
+    cache = QueryCache(directory=str(tmp_path)) # e.g. after a restart
+    rows = cache.get('k')
+    assert rows == ROWS
+    assert [type(row['mixed']) for row in rows] == [int, str, float] # mixed columns are not converted
+    assert cache.stats()['disk_hits'] == 1
+
+def test_expired_entries_are_misses_in_both_tiers(tmp_path):
+    cache = QueryCache(directory=str(tmp_path))
+    cache.put('k', ROWS, ttl=0)
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 1 and cache.stats()['disk_bytes'] == 0 # the expired file is removed
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QueryCache(max_entries=2)
+    cache.put('a', ROWS[:1]); cache.put('b', ROWS[1:2])
+    cache.get('a') # b is now the least recently used
+    cache.put('c', ROWS[2:])
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (ROWS[:1], None, ROWS[2:])
+    assert cache.stats()['evictions'] == 1
+
+def test_client_serves_repeated_queries_but_never_pages_from_the_cache():
+    records = []
+    with LocalBackend(port=0) as backend, Client(
+        'sandbox', url=backend.url, verbose=1, cache=QueryCache(), hooks=[records.append]
+    ) as client:
+        insert = lambda identifier: backend.save('saveUseCaseData', { 'identifier': identifier, 'use_case': 'Mensa' })
+        insert('a')
+        assert len(client.sql_query('SELECT * FROM pepper_use_case_table')) == 1
+        assert len(client.sql_query('select * from pepper_use_case_table')) == 1
+        assert len(records) == 1
+
+        assert len(list(client.iter_query('SELECT * FROM pepper_use_case_table', after=1))) == 0
+        insert('b')
+        assert [len(chunk) for chunk in client.iter_query('SELECT * FROM pepper_use_case_table', after=1)] == [1]
@@ -0,0 +1,58 @@
+'''
+    Tests of the report ranges and of the GROUP BY panels of reports.py and planner.py.
+'''
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from planner import QueryPlan
+from reports import LOOKBACK, PANELS, report_ranges, where
+
+def _by_key(series: pd.Series) -> dict:
+    '''{ (dimension values as str, ...): value } of a panel column, independent of index dtypes and order.'''
+    return { tuple(map(str, key if isinstance(key, tuple) else (key,))): value for key, value in series.items() }
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def test_rolling_range_is_the_complete_days_before_today():
+    assert report_ranges('rolling', date(2022, 1, 12)) == [(date(2022, 1, 5), date(2022, 1, 12))]
+    (start, end), = report_ranges('rolling', date(2022, 3, 1))
+    assert (end - start).days == LOOKBACK and end == date(2022, 3, 1) # today is not complete
+
+@pytest.mark.parametrize('period, today, expected', [
+    ('day', date(2022, 1, 12), (date(2022, 1, 11), date(2022, 1, 12))),
+    ('week', date(2022, 1, 12), (date(2022, 1, 3), date(2022, 1, 10))),   # Wednesday -> last Monday - Sunday
+    ('week', date(2022, 1, 10), (date(2022, 1, 3), date(2022, 1, 10))),   # Monday, the week before is complete
+    ('month', date(2022, 3, 1), (date(2022, 2, 1), date(2022, 3, 1))),
+    ('month', date(2022, 3, 31), (date(2022, 2, 1), date(2022, 3, 1)))
+])
+def test_calendar_range_is_the_last_complete_period(period, today, expected):
+    assert report_ranges(period, today) == [expected]
+
+def test_explicit_range_and_backfill():
+    assert report_ranges('week', date(2022, 3, 1), date(2022, 1, 1), date(2022, 1, 5)) == [(date(2022, 1, 1), date(2022, 1, 5))]
+    weeks = report_ranges('week', date(2022, 1, 26), first=date(2022, 1, 1), backfill=True)
+    assert weeks == [
+        (date(2021, 12, 27), date(2022, 1, 3)), (date(2022, 1, 3), date(2022, 1, 10)),
+        (date(2022, 1, 10), date(2022, 1, 17)), (date(2022, 1, 17), date(2022, 1, 24))
+    ]
+    assert report_ranges('week', date(2022, 1, 26), backfill=True) == [] # no rows yet
+
+def test_query_plan_matches_pandas_over_all_rows(mirror, tables):
+    start, end = date(2022, 1, 10), date(2022, 1, 17)
+    panels = QueryPlan(PANELS, where=where(start, end), dialect='sqlite').run(mirror)
+
+    for name, aggregate in PANELS.items():
+        df = tables[aggregate.table]
+        df = df[(df['ts'] >= str(start)) & (df['ts'] < str(end))].assign(weekday=lambda df: pd.to_datetime(df['ts']).dt.weekday)
+        expected = df.groupby(list(aggregate.group_by)).agg(count=('data_id', 'size'), **{
+            f'mean_{column}': (column, 'mean') for column in aggregate.mean
+        })
+        actual = panels[name]
+        assert _by_key(actual['count']) == _by_key(expected['count']), name
+        for column in aggregate.mean:
+            means = _by_key(actual[f'mean_{column}'])
+            np.testing.assert_allclose([means[key] for key in _by_key(expected[f'mean_{column}'])], expected[f'mean_{column}'], rtol=1e-6)
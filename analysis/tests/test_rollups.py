@@ -0,0 +1,76 @@
+'''
+    Tests of the daily rollups: reports merged from them have to equal the GROUP BY
+    queries over the mirror for the same range, also after rows arrived late.
+'''
+
+import shutil
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from Mirror import Mirror
+from planner import QueryPlan
+from reports import PANELS, where
+from rollups import RollupStore, periods
+
+# ----- F I X T U R E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.fixture
+def writable_mirror(mirror_path, tmp_path):
+    '''A copy of the seeded mirror that a test can add late rows to.'''
+    path = str(tmp_path / 'mirror.db')
+    shutil.copyfile(mirror_path, path)
+    with Mirror(path) as mirror:
+        yield mirror
+
+def assert_same_panels(actual: dict, expected: dict) -> None:
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        pd.testing.assert_frame_equal(
+            actual[name].sort_index(), expected[name].sort_index(), check_dtype=False, check_index_type=False,
+            check_categorical=False, rtol=1e-6, obj=name
+        )
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.mark.parametrize('start, end', [
+    (date(2022, 1, 3), date(2022, 1, 10)),      # a calendar week
+    (date(2022, 1, 1), date(2022, 2, 1)),       # a month, starting with the first day of the data
+    (date(2022, 1, 5), date(2022, 1, 6))        # a single day
+])
+def test_rollup_panels_equal_group_by_over_the_mirror(mirror, tmp_path, start, end):
+    with RollupStore(str(tmp_path / 'rollups.db')) as store:
+        store.update(mirror, dialect='sqlite', until=date(2022, 2, 10))
+        panels = store.panels(PANELS, start, end)
+    assert_same_panels(panels, QueryPlan(PANELS, where=where(start, end), dialect='sqlite').run(mirror))
+
+def test_rollup_panels_stop_at_the_last_rolled_up_day(mirror, tmp_path):
+    with RollupStore(str(tmp_path / 'rollups.db')) as store:
+        store.update(mirror, dialect='sqlite', until=date(2022, 1, 8))
+        assert store.watermark('pepper_emotion_table') == (date(2022, 1, 1), date(2022, 1, 7))
+        panels = store.panels(PANELS, date(2022, 1, 3), date(2022, 1, 10))
+    assert_same_panels(panels, QueryPlan(PANELS, where=where(date(2022, 1, 3), date(2022, 1, 8)), dialect='sqlite').run(mirror))
+
+@pytest.mark.parametrize('refresh_days, counted', [(3, True), (0, False)])
+def test_late_rows_are_rolled_up_within_the_refresh_window(writable_mirror, tables, tmp_path, refresh_days, counted):
+    start, end = date(2022, 1, 10), date(2022, 1, 17)
+    with RollupStore(str(tmp_path / 'rollups.db'), refresh_days=refresh_days) as store:
+        store.update(writable_mirror, dialect='sqlite', until=date(2022, 1, 16))
+
+        late = tables['pepper_emotion_table'].tail(1).assign(data_id=10 ** 6, ts='2022-01-14T23:59:59.000Z') # 2 days ago
+        late.to_sql('pepper_emotion_table', writable_mirror.connection, if_exists='append', index=False)
+        writable_mirror.connection.commit()
+        store.update(writable_mirror, dialect='sqlite', until=date(2022, 1, 17))
+        panels = store.panels(PANELS, start, end)
+
+    expected = QueryPlan(PANELS, where=where(start, end), dialect='sqlite').run(writable_mirror)
+    assert bool(panels['gender']['count'].sum() == expected['gender']['count'].sum()) == counted
+    if counted:
+        assert_same_panels(panels, expected)
+
+def test_periods_are_complete_calendar_periods():
+    assert periods('month', date(2022, 1, 15), date(2022, 3, 31)) == [
+        (date(2022, 1, 1), date(2022, 2, 1)), (date(2022, 2, 1), date(2022, 3, 1))
+    ]
+    assert periods('day', date(2022, 1, 1), date(2022, 1, 1)) == []
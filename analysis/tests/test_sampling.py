@@ -0,0 +1,79 @@
+'''
+    Tests of sampling.py: the split of the sample size over the strata and the samples of
+    Mirror.sample (SQLite) and Client.sample (MySQL dialect, against the local stand-in),
+    which have to consist of rows of the table in the allocated numbers.
+'''
+
+import pandas as pd
+import pytest
+
+from Client import Client
+import sampling
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+TABLE = 'pepper_emotion_table'
+
+def assert_rows_of(sample: pd.DataFrame, table: pd.DataFrame, columns=('identifier', 'gender', 'age')):
+    '''Every sampled row is the row of {table} with its data_id, no row is sampled twice.'''
+    assert sample['data_id'].is_unique and sample['data_id'].is_monotonic_increasing
+    expected = table.set_index('data_id').loc[sample['data_id'], list(columns)]
+    for column in columns:
+        assert sample[column].astype(str).tolist() == expected[column].astype(str).tolist()
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def test_allocate_splits_by_share_with_largest_remainders():
+    assert sampling.allocate({ 'a': 50, 'b': 30, 'c': 20 }, 10) == { 'a': 5, 'b': 3, 'c': 2 }
+    assert sampling.allocate({ 'a': 2, 'b': 1 }, 2) == { 'a': 1, 'b': 1 }
+    assert sampling.allocate({ 'a': 500, 'b': 5 }, 100, 'equal') == { 'a': 50, 'b': 5 } # no stratum gets more than its rows
+    assert sampling.allocate({ 'a': 5, 'b': 3 }, 100) == { 'a': 5, 'b': 3 }
+    with pytest.raises(ValueError):
+        sampling.allocate({ 'a': 1 }, 1, 'random')
+
+@pytest.mark.parametrize('method', sampling.METHODS)
+def test_uniform_sample_of_the_mirror(mirror, tables, method):
+    sample = mirror.sample(TABLE, 200, method=method, seed=1)
+    assert len(sample) == 200
+    assert_rows_of(sample, tables[TABLE])
+    stats = sample.attrs['sampling']
+    assert stats['rows'] == 200 and stats['strata'] == 1
+    if method == 'keys': # the data_ids are dense, only about the sampled rows are requested
+        assert stats['requested_keys'] < 300
+    else:
+        assert stats['requested_keys'] == 0
+
+def test_samples_are_reproducible_by_seed(mirror):
+    first, second = (mirror.sample(TABLE, 100, seed=7) for _ in range(2))
+    assert first['data_id'].tolist() == second['data_id'].tolist()
+    assert mirror.sample(TABLE, 100, seed=8)['data_id'].tolist() != first['data_id'].tolist()
+
+def test_proportional_strata_follow_the_table(mirror, tables):
+    df = tables[TABLE]
+    sample = mirror.sample(TABLE, 300, by='gender', seed=3)
+    expected = sampling.allocate(df['gender'].value_counts().to_dict(), 300)
+    assert sample['gender'].astype(str).value_counts().to_dict() == expected
+    assert_rows_of(sample, df)
+
+def test_equal_strata_by_weekday_through_the_client(backend, tables):
+    df = tables[TABLE]
+    with Client('sandbox', url=backend.url, verbose=1) as client:
+        sample = client.sample(TABLE, 140, by='weekday', allocation='equal', seed=5)
+    assert sample.attrs['sampling']['strata'] == 7
+    assert sample['weekday'].astype(int).value_counts().to_dict() == { weekday: 20 for weekday in range(7) }
+    # the derived column is WEEKDAY(ts) of the sampled row (Monday = 0)
+    assert sample['weekday'].astype(int).tolist() == pd.to_datetime(sample['ts']).dt.weekday.tolist()
+    assert_rows_of(sample, df)
+
+def test_where_limits_the_sampled_rows(mirror, tables):
+    df = tables[TABLE]
+    start = df['ts'].iloc[len(df) // 2]
+    sample = mirror.sample(TABLE, 100, by='gender', where=f"WHERE ts >= '{start}'", seed=2)
+    assert len(sample) == 100
+    assert (sample['data_id'] >= df.loc[df['ts'] >= start, 'data_id'].min()).all()
+
+def test_strata_smaller_than_their_share_are_fetched_completely(mirror, tables):
+    df = tables[TABLE]
+    start = df['ts'].iloc[-30]
+    sample = mirror.sample(TABLE, 100, where=f"WHERE ts >= '{start}'", seed=2)
+    assert sample['data_id'].tolist() == df.loc[df['ts'] >= start, 'data_id'].tolist()
@@ -0,0 +1,87 @@
+'''
+    Tests of the StreamState of streaming.py: states of chunks, merged in any order,
+    have to give the counts, means and variances of one pass over all rows (and of
+    pandas), also with missing values and after a save/load round trip.
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocessing
+from streaming import StreamState
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+TABLE = 'pepper_emotion_table'
+
+@pytest.fixture(scope='module')
+def emotions(tables) -> pd.DataFrame:
+    '''The seeded emotions with some missing dialog times and ages.'''
+    df = tables[TABLE].copy()
+    df.loc[df.index % 7 == 0, 'dialog_time'] = np.nan
+    df.loc[df.index % 11 == 0, 'age'] = np.nan
+    return df
+
+def chunks(df: pd.DataFrame, sizes: list) -> list:
+    bounds = np.cumsum([0] + sizes)
+    return [df.iloc[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+def expected_stats(df: pd.DataFrame, column: str, by: list=()) -> pd.DataFrame:
+    '''n, mean, var and std of {column} by pandas, of the typed values (dialog_time is float32).'''
+    df = preprocessing.to_numeric(df.copy()).assign(weekday=pd.to_datetime(df['ts']).dt.weekday, hour=pd.to_datetime(df['ts']).dt.hour)
+    values = df[column].astype('float64')
+    values = values if not by else values.groupby([df[dimension] for dimension in by])
+    result = pd.DataFrame({ 'n': values.count(), 'mean': values.mean(), 'var': values.var(), 'std': values.std() }, index=None if by else [0])
+    return result.sort_index() if by else result
+
+def assert_same_stats(result: pd.DataFrame, expected: pd.DataFrame):
+    assert result['n'].tolist() == expected['n'].tolist()
+    for column in ('mean', 'var', 'std'):
+        np.testing.assert_allclose(result[column].to_numpy(float), expected[column].to_numpy(float), rtol=1e-9)
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.mark.parametrize('column', ['dialog_time', 'age'])
+@pytest.mark.parametrize('by', [(), ('weekday',), ('gender', 'hour')])
+def test_one_pass_equals_pandas(emotions, column, by):
+    state = StreamState(TABLE).update(emotions)
+    assert state.rows == len(emotions)
+    assert_same_stats(state.stats(column, by=list(by)), expected_stats(emotions, column, by))
+
+def test_merged_chunks_equal_one_pass(emotions):
+    one_pass = StreamState(TABLE).update(emotions)
+    consumed = StreamState(TABLE).consume(chunks(emotions, [1, 999, 1000, 1000])) # a chunk of a single row, too
+    parts = [StreamState(TABLE).update(chunk) for chunk in chunks(emotions, [1500, 700, 800])]
+    merged = StreamState(TABLE).merge(*reversed(parts))
+
+    for state in (consumed, merged):
+        assert state.rows == one_pass.rows
+        assert state.histogram().equals(one_pass.histogram())
+        for column in ('dialog_time', 'age'):
+            for by in ([], ['weekday'], ['basic_emotion', 'pleasure_state']):
+                assert_same_stats(state.stats(column, by=by), one_pass.stats(column, by=by))
+
+def test_rows_as_the_api_returns_them(emotions):
+    rows = emotions.head(500).astype(object).where(emotions.head(500).notna(), None).to_dict('records')
+    state = StreamState(TABLE).update(rows[:250]).update(rows[250:])
+    assert_same_stats(state.stats('age', by=['gender']), expected_stats(emotions.head(500), 'age', ['gender']))
+
+def test_histogram_counts_rows_per_weekday_and_hour(emotions):
+    ts = pd.to_datetime(emotions['ts'])
+    expected = emotions.groupby([ts.dt.weekday.rename('weekday'), ts.dt.hour.rename('hour')]).size()
+    histogram = StreamState(TABLE).consume(chunks(emotions, [1200, 1800])).histogram()
+    assert histogram.to_dict() == expected.to_dict()
+
+def test_saved_states_merge_like_the_originals(emotions, tmp_path):
+    first, second = (StreamState(TABLE).update(chunk) for chunk in chunks(emotions, [1000, 2000]))
+    first.save(str(tmp_path / 'first.json'))
+    loaded = StreamState.load(str(tmp_path / 'first.json'))
+    assert loaded.rows == first.rows
+    assert_same_stats(loaded.merge(second).stats('dialog_time', by=['weekday']), expected_stats(emotions, 'dialog_time', ['weekday']))
+
+def test_states_of_different_things_do_not_merge(emotions):
+    with pytest.raises(ValueError):
+        StreamState(TABLE).merge(StreamState(TABLE, measures=['age']))
+    with pytest.raises(ValueError):
+        StreamState(TABLE).update(emotions.drop(columns=['age']))
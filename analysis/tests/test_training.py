@@ -0,0 +1,66 @@
+'''
+    Tests of the incremental updates of training.py, the Keras ones only run with tensorflow.
+'''
+
+import numpy as np
+import pytest
+
+from features import FeatureEncoder
+from scoring import export_model
+from training import IncrementalTrainer, OnlineLinearRegression
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+TRAINED = 2000 # data_id of the first training, the rows after it are the update
+
+# ----- F I X T U R E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+@pytest.fixture
+def first_training(mirror) -> tuple:
+    '''(encoder, X, y) of the rows up to TRAINED without gender 'other', like main.ipynb trains the gender model.'''
+    frame = next(mirror.iter_query(f'SELECT * FROM pepper_emotion_table WHERE data_id <= {TRAINED}', chunk_rows=TRAINED))
+    frame = frame[frame['gender'] != 'other']
+    encoder = FeatureEncoder(target='gender').fit(frame)
+    X, y = encoder.transform(frame)
+    return encoder, X, y
+
+@pytest.fixture
+def updated(tables) -> tuple:
+    '''(rows, rows with gender 'other') past the watermark of the first training.'''
+    rows = tables['pepper_emotion_table'].query(f'data_id > {TRAINED}')
+    return len(rows), int((rows['gender'] == 'other').sum())
+
+# ----- T E S T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def test_online_linear_regression_matches_the_exact_solution():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 3))
+    y = X @ np.array([1.5, -2.0, 0.5]) + 3.0 + rng.normal(scale=0.01, size=500)
+    model = OnlineLinearRegression()
+    for start in range(0, 500, 100):
+        model.partial_fit(X[start:start + 100], y[start:start + 100])
+    solution = np.linalg.lstsq(np.hstack([np.ones((500, 1)), X]), y, rcond=None)[0]
+    np.testing.assert_allclose([model.intercept_, *model.coef_], solution, atol=1e-8)
+
+def test_partial_fit_update_skips_classes_of_later_rows(mirror, first_training, updated, tmp_path):
+    from sklearn.linear_model import SGDClassifier
+    encoder, X, y = first_training
+    export_model(SGDClassifier(random_state=0).fit(X, y), encoder, str(tmp_path / 'gender'), watermark=TRAINED)
+
+    result = IncrementalTrainer(str(tmp_path / 'gender'), chunk_rows=300).update(mirror)
+    assert (result['rows'], result['skipped']) == updated
+    assert result['watermark'] == TRAINED + updated[0]
+
+def test_keras_update_skips_classes_the_output_can_not_predict(mirror, first_training, updated, tmp_path):
+    pytest.importorskip('tensorflow')
+    from model_search import build_model # the binary gender model of main.ipynb
+    encoder, X, y = first_training
+    model = build_model(X, layers=(4,), classes=2)
+    model.fit(X, y, epochs=1, verbose=0)
+    export_model(model, encoder, str(tmp_path / 'gender'), watermark=TRAINED)
+
+    trainer = IncrementalTrainer(str(tmp_path / 'gender'), epochs=1)
+    result = trainer.update(mirror)
+    assert (result['rows'], result['skipped']) == updated
+    _, y = trainer._trainable(np.zeros((3, len(encoder.features)), dtype='float32'), np.array([0, 2, 1], dtype='int32'))
+    assert y.tolist() == [0, 1] # one sigmoid unit learns 0 and 1 only
@@ -0,0 +1,221 @@
+'''
+    training.py
+    ===================================
+
+    Incremental training of the models exported with scoring.export_model: instead of
+    training again on a full SELECT of the pepper_emotion_table, an update reads only the
+    rows past the watermark of the model (the last data_id it was trained on, stored in
+    meta.json), so its cost grows with the new rows and not with the table.
+
+        Keras models            warm start: the saved model (weights and optimizer state)
+                                is trained for a few {epochs} on the new rows only
+        partial_fit models      one partial_fit per chunk (OnlineLinearRegression below,
+                                SGDRegressor, SGDClassifier, ...)
+
+    The encoder is fitted on the new rows too, new values are appended to its vocabularies
+    (the codes the model learned stay the same, see features.py). Rows whose target the
+    model can not learn are skipped, e.g. gender 'other' for the binary gender model of
+    main.ipynb or a class that appeared after the first partial_fit. The model, the encoder,
+    the new watermark and the timings of the update are written back into the directory,
+    the last updates are kept in meta.json.
+
+    ----- E X A M P L E -----
+    > export_model(model, encoder, 'models/gender', watermark=watermark)   # in main.ipynb
+    > trainer = IncrementalTrainer('models/gender', epochs=2)
+    > trainer.update(mirror)
+    {'model': 'gender', 'rows': 1200, 'skipped': 14, 'watermark': 301200, 'fetch': 0.012, 'train': 0.951, 'save': 0.087, 'seconds': 1.05}
+    > trainer.update(mirror)  # nothing new
+    {'model': 'gender', 'rows': 0, 'skipped': 0, 'watermark': 301200, 'fetch': 0.001, 'train': 0.0, 'save': 0.0, 'seconds': 0.001}
+'''
+
+import time
+from datetime import datetime
+
+import numpy as np
+
+import features
+from scoring import TABLE, export_model, load_model
+
+__version__ = 'v1.0.0'
+__author__ = 'Benjamin Thomas Schwertfeger'
+__copyright__   = 'Benjamin Thomas Schwertfeger'
+__email__ = 'development@b-schwertfeger.de'
+__status__ = 'Production'
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+UPDATES_KEPT = 100 # updates listed in meta.json
+
+# ----- F U N C T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def _complete(X: np.ndarray, y: np.ndarray) -> tuple:
+    '''Returns the rows of {X} and {y} without missing values and unknown codes (-1) of a categorical target.'''
+    keep = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    if y.dtype.kind == 'i':
+        keep &= y != features.UNKNOWN
+    return X[keep], y[keep]
+
+def _output_classes(model) -> np.ndarray:
+    '''Returns the target codes the Keras {model} can learn: 0 and 1 for a single (sigmoid)
+        output unit, one code per unit of a softmax output.
+    '''
+    units = int(model.outputs[0].shape[-1])
+    return np.arange(max(units, 2))
+
+# ----- C L A S S E S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class OnlineLinearRegression(object):
+    '''
+        Ordinary least squares like sklearn.linear_model.LinearRegression, but the sums
+        X^T X and X^T y are kept, so partial_fit adds new rows to the exact solution
+        without the old ones. Rows with missing values are skipped.
+    '''
+
+    def __init__(self):
+        self.xtx, self.xty, self.n = None, None, 0
+        self.coef_, self.intercept_ = None, None
+
+    def fit(self, X, y) -> 'OnlineLinearRegression':
+        self.xtx, self.xty, self.n = None, None, 0
+        return self.partial_fit(X, y)
+
+    def partial_fit(self, X, y) -> 'OnlineLinearRegression':
+        X = np.asarray(X, dtype='float64').reshape(len(X), -1)
+        y = np.asarray(y, dtype='float64').reshape(len(X), -1)
+        keep = np.isfinite(X).all(axis=1) & np.isfinite(y).all(axis=1)
+        X = np.hstack([np.ones((int(keep.sum()), 1)), X[keep]]) # intercept column
+        y = y[keep]
+        if self.xtx is None:
+            self.xtx, self.xty = np.zeros((X.shape[1], X.shape[1])), np.zeros((X.shape[1], y.shape[1]))
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.n += len(X)
+
+        solution = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        self.intercept_, self.coef_ = solution[0], solution[1:].T
+        if y.shape[1] == 1: # one target like LinearRegression().fit(X, y.ravel())
+            self.intercept_, self.coef_ = float(self.intercept_[0]), self.coef_[0]
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype='float64').reshape(len(X), -1)
+        return X @ self.coef_.T + self.intercept_
+
+
+class IncrementalTrainer(object):
+    '''
+        Updates an exported model with the rows of the emotion table past its watermark
+        (see module docstring). The model stays in memory between two updates.
+
+        ------ P A R A M E T E R S ------
+        :param directory: str
+            Directory of the model exported by scoring.export_model
+        :param epochs: int | optional
+            Epochs a Keras model is trained on the new rows | default: 2
+        :param batch_size: int | optional
+            Rows per training step of a Keras model | default: 256
+        :param chunk_rows: int | optional
+            Rows per request (and per partial_fit) | default: 50000
+    '''
+
+    def __init__(self, directory: str, epochs: int=2, batch_size: int=256, chunk_rows: int=50000):
+        self.directory = directory
+        self.epochs, self.batch_size, self.chunk_rows = epochs, batch_size, chunk_rows
+        self.model, self.encoder, self.meta = load_model(directory)
+        if self.meta['kind'] != 'keras' and not hasattr(self.model, 'partial_fit'):
+            raise TypeError(
+                f'{type(self.model).__name__} can not be updated incrementally, '
+                'use a model with partial_fit (e.g. OnlineLinearRegression or SGDClassifier)'
+            )
+
+    @property
+    def watermark(self):
+        '''Returns the last data_id the model was trained on, None for all rows.'''
+        return self.meta.get('watermark')
+
+    def update(self, source) -> dict:
+        '''Trains the model on the rows of {source} (Client or Mirror) past the watermark,
+            saves it and returns the number of rows, of rows skipped (missing values or a target
+            the model can not learn) and the seconds of fetching, training and saving.
+        '''
+        start = time.perf_counter()
+        fetch, train, rows, skipped, watermark = 0.0, 0.0, 0, 0, self.watermark
+        columns = ', '.join(['data_id'] + self.encoder.features + [self.encoder.target])
+        chunks = iter(source.iter_query(f'SELECT {columns} FROM {TABLE}', chunk_rows=self.chunk_rows, after=watermark))
+
+        collected = [] # Keras trains several epochs over all new rows
+        while True:
+            t = time.perf_counter()
+            chunk = next(chunks, None)
+            fetch += time.perf_counter() - t
+            if chunk is None:
+                break
+
+            t = time.perf_counter()
+            X, y = self.encoder.fit(chunk).transform(chunk)
+            X, y = self._trainable(*_complete(X, y))
+            skipped += len(chunk) - len(X)
+            if self.meta['kind'] == 'keras':
+                collected.append((X, y))
+            elif len(X):
+                self._partial_fit(X, y)
+            train += time.perf_counter() - t
+            rows, watermark = rows + len(chunk), int(chunk['data_id'].max())
+
+        if collected:
+            t = time.perf_counter()
+            X, y = np.concatenate([X for X, _ in collected]), np.concatenate([y for _, y in collected])
+            if len(X):
+                self.model.fit(features.dataset(X, y, batch_size=self.batch_size), epochs=self.epochs, verbose=0)
+            train += time.perf_counter() - t
+
+        result = {
+            'model': self.meta['name'], 'rows': rows, 'skipped': skipped, 'watermark': watermark,
+            'fetch': fetch, 'train': train, 'save': 0.0
+        }
+        if rows:
+            t = time.perf_counter()
+            self._save(result, watermark)
+            result['save'] = time.perf_counter() - t
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    def _classifier(self) -> bool:
+        return self.meta['kind'] == 'keras' or hasattr(self.model, 'predict_proba') or hasattr(self.model, 'classes_')
+
+    def _classes(self) -> np.ndarray:
+        '''Target codes the model can learn, fixed by its output layer or its first training.'''
+        if self.meta['kind'] == 'keras':
+            return _output_classes(self.model)
+        classes = getattr(self.model, 'classes_', None)
+        if classes is None: # the first partial_fit needs all classes
+            classes = np.arange(len(self.encoder.categorical.vocabularies[self.encoder.target]))
+        return classes
+
+    def _trainable(self, X: np.ndarray, y: np.ndarray) -> tuple:
+        '''Returns the rows whose target the model can learn, values that appeared after the
+            first training (e.g. gender 'other' for a binary model) are skipped.
+        '''
+        if y.dtype.kind != 'i' or not self._classifier():
+            return X, y
+        keep = np.isin(y, self._classes())
+        return X[keep], y[keep]
+
+    def _partial_fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        if self._classifier():
+            self.model.partial_fit(X, y, classes=self._classes())
+        else:
+            self.model.partial_fit(X, y)
+
+    def _save(self, result: dict, watermark: int) -> None:
+        update = {
+            'at': datetime.now().isoformat(timespec='seconds'), 'rows': result['rows'],
+            'watermark': watermark, 'fetch': round(result['fetch'], 3), 'train': round(result['train'], 3)
+        }
+        meta = { key: value for key, value in self.meta.items() if key not in ('name', 'target', 'kind') }
+        meta.update( # created_at of the first export stays
+            watermark=watermark, rows_seen=meta.get('rows_seen', 0) + result['rows'],
+            updates=(meta.get('updates', []) + [update])[-UPDATES_KEPT:], updated_at=update['at']
+        )
+        export_model(self.model, self.encoder, self.directory, name=self.meta['name'], **meta)
+        self.meta.update(meta)
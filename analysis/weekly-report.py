@@ -1,18 +1,19 @@
 # ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 import sys, getpass, traceback
+import atexit
+import signal
 import warnings 
+from argparse import ArgumentParser
 
-import pandas as pd
-import numpy as np
 # from sklearn.linear_model import LinearRegression
 
-from datetime import datetime, timedelta
-
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+from datetime import date
 
 from dotenv import dotenv_values
-from Client import Client # can be found in same dir as this file in repositorie
+from instrumentation import Metrics
+from reports import LOOKBACK, ReportBuilder # can be found in same dir as this file in repositorie
+from report_service import ReportService, log
+from rollups import PERIODS
 
 # ----- M E T A D A T A ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
@@ -26,7 +27,79 @@ __github__ = 'https://github.com/ProjectPepperHSB/Backend-Services.git'
 
 # ----- S E T T I N G S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-if sys.platform == 'linux' or sys.platform == 'linux2':
+parser = ArgumentParser(description=__description__)
+parser.add_argument(
+    '-m', '--mirror', dest='mirror', default=None,
+    help='sync new rows into this local SQLite mirror and build the report from it | default: None'
+)
+parser.add_argument(
+    '--offline', dest='offline', default=False, action='store_true',
+    help='build the report from the mirror without syncing it first | default: False'
+)
+parser.add_argument(
+    '--metrics', dest='metrics', default=False, action='store_true',
+    help='print timings, sizes and percentiles of all requests to the backend at exit | default: False'
+)
+parser.add_argument(
+    '-w', '--workers', dest='workers', default=None, type=int,
+    help='processes rendering the pages of the report, 0 renders them in this process | default: one per page and cpu'
+)
+parser.add_argument(
+    '-p', '--period', dest='period', default='rolling', choices=['rolling'] + list(PERIODS),
+    help=f'report the {LOOKBACK} days before today (rolling) or the last complete day, week (Monday - Sunday) '
+    'or month, all in UTC | default: rolling'
+)
+parser.add_argument(
+    '--start', dest='start', default=None, type=date.fromisoformat,
+    help='first day (YYYY-MM-DD) of a report over an arbitrary range, requires --end | default: None'
+)
+parser.add_argument(
+    '--end', dest='end', default=None, type=date.fromisoformat,
+    help='first day (YYYY-MM-DD) after the arbitrary range | default: None'
+)
+parser.add_argument(
+    '-r', '--rollups', dest='rollups', default=None,
+    help='append the daily aggregates of all complete days to this SQLite store and build the reports from it | default: None'
+)
+parser.add_argument(
+    '--backfill', dest='backfill', default=False, action='store_true',
+    help='build the reports of all complete periods since the first interaction, requires --rollups | default: False'
+)
+parser.add_argument(
+    '-o', '--out-dir', dest='out_dir', default=None,
+    help='directory the reports are written to | default: depends on the platform'
+)
+parser.add_argument(
+    '--no-cache', dest='cache', default=True, action='store_false',
+    help='render every report, even if a report or pages of the same panels are in {out_dir}/.cache | default: False'
+)
+parser.add_argument(
+    '--serve', dest='serve', default=None, nargs='?', const='127.0.0.1:8050', metavar='[HOST:]PORT',
+    help='keep running, build the scheduled reports and serve POST /report and GET /status | default: 127.0.0.1:8050'
+)
+parser.add_argument(
+    '--schedule', dest='schedule', default=[], nargs='*', choices=PERIODS,
+    help='periods whose reports the service builds as soon as they are complete | default: None'
+)
+parser.add_argument(
+    '--at', dest='at', default='06:00',
+    help='time of day (HH:MM, UTC) from which the service builds the scheduled reports | default: 06:00'
+)
+args = parser.parse_args()
+if args.offline and args.mirror is None and args.rollups is None:
+    parser.error('--offline requires --mirror or --rollups')
+if (args.start is None) != (args.end is None):
+    parser.error('--start and --end are required together')
+if args.backfill and args.rollups is None:
+    parser.error('--backfill requires --rollups')
+if args.backfill and args.period == 'rolling':
+    parser.error('--backfill requires --period day, week or month')
+if args.schedule and args.serve is None:
+    parser.error('--schedule requires --serve')
+
+if args.out_dir is not None:
+    out_dir = args.out_dir
+elif sys.platform == 'linux' or sys.platform == 'linux2':
     out_dir = f'/home/docker-hbv-kms/weekly-reports'
 elif sys.platform == 'darwin':
     out_dir = f'/Users/{getpass.getuser()}/repositories/Backend-Services/analysis/out'
@@ -35,166 +108,63 @@ elif sys.platform == 'win32':
 
 warnings.filterwarnings('ignore')
 
-plt.rcParams['figure.figsize'] = [10, 6]
-plt.rcParams['savefig.bbox'] = 'tight'
-plt.style.use('fivethirtyeight')
-
-_red, _orange, _gray, _green, _blue = '#fc4f30', '#e5ae38', '#8b8b8b', '#6d904f', '#30a2da'
-_weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-# ----- ----- -----
-LOOKBACK = 7 #days
-
-now = datetime.now()
-start_date = (now - timedelta(days=LOOKBACK)).strftime('%Y-%m-%d')
-out_fname = f'weekly_report_{start_date}_-_{now.strftime("%Y-%m-%d")}.pdf'
-
-# ----- S E T U P ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
-
-not_understand_df, emotion_states_df, use_case_df = None, None, None
+metrics = Metrics() # records every request to the backend
+if args.metrics:
+    atexit.register(metrics.dump)
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
-def init() -> None:
-    global not_understand_df, emotion_states_df, use_case_df
-
+def get_api_key() -> str:
     try:
         config = dotenv_values('.env') 
-        API_KEY = config['API_KEY']
+        return config['API_KEY']
     except KeyError:
         print('No .env file with API_KEY found!')
         exit()
 
+def _stop(signum, frame):
+    raise KeyboardInterrupt # stops the service like ctrl+c, e.g. on docker stop
+
+def serve(builder: ReportBuilder) -> None:
+    host, _, port = args.serve.rpartition(':')
+    service = ReportService(builder, host=host or '127.0.0.1', port=int(port), schedule=args.schedule, at=args.at)
     try:
-        client = Client(API_KEY, sandbox=False, verbose=1) # create client to connect with web-app 
+        builder.warm_up() # render processes and connections are ready before the first job
+    except Exception as error: # e.g. the backend is down, the jobs will try again
+        log.warning(f'Could not warm up: {error}')
+    log.info(
+        f'Serving {service.url} (schedule: {", ".join(args.schedule) or "-"} at {args.at} UTC, out: {out_dir})'
+    )
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        log.info('Stopped!')
+    finally:
+        service.stop()
 
-        query_str = f'WHERE ts > NOW() - INTERVAL {LOOKBACK} day'
-        
-        not_understand_df = pd.DataFrame(data=client.sql_query(f'SELECT * FROM pepper_did_not_understand_table {query_str}'))
-        emotion_states_df = pd.DataFrame(data=client.sql_query(f'SELECT * FROM pepper_emotion_table {query_str}'))
-        use_case_df = pd.DataFrame(data=client.sql_query(f'SELECT * FROM pepper_use_case_table {query_str}'))
+def main() -> None:
+    API_KEY = None if args.offline else get_api_key()
+    builder = ReportBuilder(
+        out_dir, API_KEY=API_KEY, mirror=args.mirror, rollups=args.rollups, workers=args.workers, hooks=[metrics],
+        cache=args.cache
+    )
+    if args.serve is not None:
+        return serve(builder)
 
-        # preprocessing
-        emotion_states_df['dialog_time'] = np.array([x for x in emotion_states_df['dialog_time']]).astype('float32')
+    try:
+        with builder:
+            result = builder.build(period=args.period, start=args.start, end=args.end, backfill=args.backfill)
     except:
         print(f'Could not fetch data from backend!\n{traceback.format_exc()}')
         print('Check your internet connection and check if the backend service is running!')
         exit()
 
-def plots(pdf) -> None:
-    # PIE ----- USE-CASE-USAGE -----
-    plt.figure()
-    fig = use_case_df['use_case'].value_counts().plot(kind='pie', autopct='%1.1f%%').get_figure()
-    plt.title('Use-Case usage'); plt.axis('off'); pdf.savefig(fig)
-
-    # PIE ----- GENDER-DISTRIBUTION -----
-    plt.figure()
-    fig = emotion_states_df.gender.value_counts().plot(kind='pie', autopct='%1.1f%%',colors = [ _red, _blue ]).get_figure()
-    plt.title('Gender distribution'); plt.axis('off'); pdf.savefig(fig)      
-
-    # PIE ----- BASIC-EMOTION -----
-    plt.figure()
-    fig = emotion_states_df['basic_emotion'].value_counts().plot(kind='pie', autopct='%1.1f%%',colors = [ _gray, _red, _orange, _green]).get_figure()
-    plt.title('Distribution of basic emotion occurrence'); plt.axis('off'); pdf.savefig()
-
-    # BARH ----- DISTRIBUTION OF EMOTION BY GENDER -----
-    plt.figure()
-    fig = pd.concat(
-        [emotion_states_df[['gender', 'basic_emotion']].pivot_table(index=['gender'], columns=col, aggfunc=len) for col in ['basic_emotion']], axis = 1
-    ).fillna(0).plot(kind = 'barh', color = { 'bad': _red, 'bored': _gray, 'excited': _orange, 'good': _green }).get_figure()
-    plt.title('Distributions of basic emotions grouped by gender'); plt.xlabel('count'); pdf.savefig()
-
-    # BARH ----- DISTRIBUTION OF PLEASURE STATES ------
-    plt.figure()
-    fig = pd.concat(
-        [emotion_states_df[['gender', 'pleasure_state']].pivot_table(index=['gender'], columns=col, aggfunc=len) for col in ['pleasure_state']], axis=1
-    ).fillna(0).plot(kind='barh', color={ 'bad': _red, 'medium': _gray, 'good': _orange, 'perfect': _green })
-    plt.title('Distribution of pleasure states grouped by gender'); pdf.savefig()
-
-    # ----- STATISTICS BY DAY OF WEEK ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ------ ----- ----- ----- ----- 
-    d = emotion_states_df[['distance', 'gender', 'age', 'basic_emotion', 'pleasure_state', 'excitement_state', 'smile_state', 'dialog_time', 'ts']]
-    d_use_case = use_case_df[['use_case', 'ts']]
-
-    for i, ts in enumerate(d['ts']):
-        date_obj = datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.000Z')
-        d['ts'][i] = f'{date_obj.day}.{date_obj.month}.{date_obj.year} {date_obj.hour}:{date_obj.minute}'
-    for i, ts in enumerate(d_use_case['ts']):
-        date_obj = datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.000Z')
-        d_use_case['ts'][i] = f'{date_obj.day}.{date_obj.month}.{date_obj.year} {date_obj.hour}:{date_obj.minute}'
-        
-    d['weekday'] = [datetime.strptime(ts, '%d.%m.%Y %H:%M').weekday() for ts in d['ts']]
-    d_use_case['weekday'] = [datetime.strptime(ts, '%d.%m.%Y %H:%M').weekday() for ts in d_use_case['ts']]
-    
-    # BAR ----- EMOTIONS BY WEEKDAY
-    plt.figure()
-    fig = pd.concat(
-        [d[['weekday', 'basic_emotion']].pivot_table(index=['weekday'], columns=col, aggfunc=len) for col in ['basic_emotion']], axis = 1
-    ).fillna(0).plot(kind = 'bar', color = { 'bad': _red, 'bored': _gray, 'excited': _orange, 'good': _green }, rot = 35)
-
-    plt.title('Distribution of basic emotions grouped by weekday')
-    plt.xticks(np.arange(len(plt.gca().get_xticklabels())), [_weekdays[int(i.get_text())] for i in plt.gca().get_xticklabels()])
-    plt.xlabel('weekday'); plt.ylabel('count'); pdf.savefig()
-
-    # BAR ----- GENDER BY WEEKDAY
-    plt.figure()    
-    fig = pd.concat(
-        [d[['weekday', 'gender']].pivot_table(index=['weekday'], columns=col, aggfunc=len) for col in ['gender']], axis = 1
-    ).fillna(0).plot(kind = 'bar', rot = 35)
-
-    plt.title('Usage by gender and weekday')
-    plt.xticks(np.arange(len(plt.gca().get_xticklabels())), [_weekdays[int(i.get_text())] for i in plt.gca().get_xticklabels()])
-    plt.xlabel('weekday'); plt.ylabel('count'); pdf.savefig()
-
-    # BAR ----- Dialog time by weekday
-    plt.figure()
-    fig = d[['weekday', 'dialog_time']].groupby('weekday').mean().plot(kind='bar', rot=35)
-    plt.title('Mean dialog time by weekday')
-    plt.xticks(np.arange(len(plt.gca().get_xticklabels())), [_weekdays[int(i.get_text())] for i in plt.gca().get_xticklabels()])
-    plt.xlabel('weekday'); plt.ylabel('dialog time in minutes'); pdf.savefig()
-
-    plt.figure()
-    fig = pd.concat(
-        [d_use_case[['weekday', 'use_case']].pivot_table(index=['weekday'], columns=col, aggfunc=len) for col in ['use_case']],axis = 1
-    ).fillna(0).plot(kind = 'bar', rot = 35)
-
-    plt.title('Use case by weekday')
-    plt.xticks(np.arange(len(plt.gca().get_xticklabels())), [_weekdays[int(i.get_text())] for i in plt.gca().get_xticklabels()])
-    plt.xlabel('weekday')
-    plt.ylabel('count')
-    pdf.savefig()
-
-    # ----- ----- ------ ----- ----- ----- ----- ----- ----- ------ ----- ----- ----- ----- ----- ----- ------ ----- ----- ----- ----- 
-
-    # SCATTER ----- LINEAR REGRESSION -----
-    # maybe not representative enough for 7 day period
-    
-    # data = emotion_states_df[['distance', 'age', 'gender', 'basic_emotion', 'pleasure_state', 'excitement_state', 'smile_state', 'dialog_time']]
-    # X = data.iloc[:, 1].values.reshape(-1, 1).astype('int') # age
-    # Y = data.iloc[:, -1].values.reshape(-1, 1).astype('float32') # dialog_time
-    # linear_regressor = LinearRegression(); linear_regressor.fit(X, Y) 
-    # Y_pred = linear_regressor.predict(X)  
-
-    # plt.figure()
-    # fig = plt.scatter(X, Y)
-    # plt.plot(X, Y_pred, color='red')
-    # plt.xlabel('age'); plt.ylabel('dialog time')
-    # plt.title('Linear regression on dialog time and age')
-    # pdf.savefig()
-
-
-def main() -> None:
-    init()
-
-    with PdfPages(f'{out_dir}/{out_fname}') as pdf:
-        plots(pdf)
-        
-        # metadata
-        d = pdf.infodict()
-        d['Title'] = f'Weekly report {start_date} - {now}'
-        d['Author'] = 'Team Pepper'
-        # d['Subject'] = '....'
-        d['Keywords'] = 'pepper robot matplotlib plots report'
-        d['CreationDate'] = now.strftime('%Y-%m-%d')
+    for report in result['reports']:
+        if report['path'] is None:
+            print(f'No interactions between {report["start"]} and {report["end"]}, skipped the report')
+    if args.metrics:
+        print(' | '.join(f'{stage} {seconds:.3f}s' for stage, seconds in result['timings'].items()), file=sys.stderr)
 
 
 if __name__ == '__main__':
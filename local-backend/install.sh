@@ -0,0 +1,3 @@
+#!/bin/bash
+
+python3 -m pip install -r requirements.txt
\ No newline at end of file
@@ -0,0 +1,445 @@
+__version__ = '1.0.0'
+__status__ = 'Development'
+__github__ = 'https://github.com/ProjectPepperHSB/Backend-Services.git'
+
+# ----- D E S C R I P T I O N ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+'''
+    local_backend.py
+    ===================================
+
+    Lightweight local stand-in of the Express web application, backed by SQLite. It
+    implements the endpoints the Python side talks to with the same contracts, so the
+    analysis Client and the dummy data sender can be benchmarked on one machine without
+    the node application and the mySQL database:
+
+        POST {PREFIX}/sql                        subject=test | subject=sql_query&query_str=...&auth_key=...
+        GET  {PREFIX}/saveEmotionData            identifier, distance, age, gender, basic_emotion, pleasure_state,
+                                                 excitement_state, smile_state, dialog_time
+        GET  {PREFIX}/saveUseCaseData            identifier, use_case
+        GET  {PREFIX}/saveNotUnderstandPhrases   identifier, phrase
+        POST {PREFIX}/saveAttributeData          identifier, data (json string)
+        POST {PREFIX}/<collector endpoint>/bulk  json body { "records": [{ identifier, ... }, ...] }
+
+    with PREFIX = /docker-hbv-kms-http/api/v1. The bulk endpoints insert many records of a
+    collector endpoint in one transaction (the bulk mode of create_dummy_conversation_data.py),
+    data of saveAttributeData records can be a json object. Like the web app, the sql endpoint only
+    runs SELECT statements on the pepper_* tables (400-Invalid SQL command! otherwise).
+    The MySQL functions used by the analysis scripts (NOW() - INTERVAL n day, DAYOFWEEK,
+    WEEKDAY, HOUR, ...) are translated for SQLite and ts is returned as the mysql driver
+    of the web app returns it ('%Y-%m-%dT%H:%M:%S.000Z').
+
+    Responses of the sql endpoint honor the Accept header (json, columnar json, ndjson
+    and Arrow IPC if pyarrow is installed) and Accept-Encoding: gzip, like the Client
+    negotiates them. An artificial latency can be added to every request, so ingestion
+    and reporting throughput can be measured reproducibly.
+
+    ----- A R G U M E N T S -----
+    optional arguments:
+        -h, --help            show help message and exit
+        --host HOST           interface to listen on | default: 127.0.0.1
+        --port PORT           port to listen on | default: 3000
+        --db DB               SQLite database file | default: :memory:
+        --api-key API_KEY     auth_key accepted by the sql endpoint | default: sandbox
+        --latency MS          artificial latency added to every request in ms | default: 0
+        --jitter MS           uniform random jitter added to the latency in ms | default: 0
+
+    ----- E X A M P L E -----
+    ╰─ python3 local_backend.py --db pepper.db --latency 20
+    2026-10-18 09:51:25 local_backend,line: 404     INFO | Serving http://127.0.0.1:3000/docker-hbv-kms-http/api/v1 (db: pepper.db, latency: 20.0ms)
+
+    > from local_backend import LocalBackend
+    > with LocalBackend(port=0, latency=0.005) as backend:
+    >     client = Client('sandbox', url=backend.url)
+
+'''
+
+# ----- I M P O R T S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+import sys
+import io, re
+import gzip
+import json
+import time
+import random
+import logging
+import sqlite3
+import threading
+import argparse
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import pyarrow
+except ImportError: # optional, only needed to answer with arrow
+    pyarrow = None
+
+# ----- Logger -----
+formatter = logging.Formatter(
+    fmt='%(asctime)s %(module)s,line: %(lineno)d %(levelname)8s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+log = logging.getLogger('local_backend')
+log.setLevel(logging.INFO)
+screen_handler = logging.StreamHandler(stream=sys.stdout)
+screen_handler.setFormatter(formatter)
+log.addHandler(screen_handler)
+
+# ----- D E F I N I T I O N S ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+PREFIX = '/docker-hbv-kms-http/api/v1'
+
+TABLES = {
+    'pepper_emotion_table': {
+        'identifier': 'TEXT',
+        'distance': 'REAL',
+        'age': 'INTEGER',
+        'gender': 'TEXT',
+        'basic_emotion': 'TEXT',
+        'pleasure_state': 'TEXT',
+        'excitement_state': 'TEXT',
+        'smile_state': 'TEXT',
+        'dialog_time': 'REAL'
+    },
+    'pepper_use_case_table': {
+        'identifier': 'TEXT',
+        'use_case': 'TEXT'
+    },
+    'pepper_did_not_understand_table': {
+        'identifier': 'TEXT',
+        'phrase': 'TEXT'
+    },
+    'pepper_conversation_table': {
+        'identifier': 'TEXT',
+        'data': 'TEXT'
+    }
+}
+
+# collector endpoint -> (http method, table)
+ENDPOINTS = {
+    'saveEmotionData': ('GET', 'pepper_emotion_table'),
+    'saveUseCaseData': ('GET', 'pepper_use_case_table'),
+    'saveNotUnderstandPhrases': ('GET', 'pepper_did_not_understand_table'),
+    'saveAttributeData': ('POST', 'pepper_conversation_table')
+}
+
+JSON = 'application/json'
+COLUMNS_JSON = 'application/vnd.pepper.columns+json'
+NDJSON = 'application/x-ndjson'
+ARROW = 'application/vnd.apache.arrow.stream'
+
+_INTERVAL = re.compile(r'(NOW\(\)|CURDATE\(\))\s*([-+])\s*INTERVAL\s+(\d+)\s+(SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)S?\b', re.IGNORECASE)
+_TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+([`\w.]+)', re.IGNORECASE)
+_FORBIDDEN = re.compile(r'\b(INSERT|UPDATE|DELETE|DROP|ALTER|CREATE|REPLACE|ATTACH|PRAGMA)\b', re.IGNORECASE)
+_SQLITE_TS = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+# ----- S Q L ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def translate_query(query: str) -> str:
+    '''Returns {query} with the MySQL specific syntax used by the analysis scripts rewritten for SQLite.'''
+    def interval(match) -> str:
+        base = "'now'" if match.group(1).upper() == 'NOW()' else "'now', 'start of day'"
+        amount, unit = int(match.group(3)), match.group(4).lower()
+        if unit == 'week':
+            amount, unit = amount * 7, 'day'
+        return f"datetime({base}, '{match.group(2)}{amount} {unit}')"
+
+    query = _INTERVAL.sub(interval, query.strip().rstrip(';'))
+    return re.sub(r'\bNOW\(\)', "datetime('now')", query, flags=re.IGNORECASE).replace('`', '"')
+
+def is_allowed(query: str) -> bool:
+    '''Like the web app: only single SELECT statements on pepper_* tables (or sub queries).'''
+    if not query.lstrip().upper().startswith('SELECT') or ';' in query.strip().rstrip(';') or _FORBIDDEN.search(query):
+        return False
+    tables = [table.strip('`') for table in _TABLE_REFERENCE.findall(query)]
+    return all(table.startswith('pepper_') for table in tables)
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value[:19]) # called per row by GROUP BY queries, much faster than strptime
+
+def _register_functions(connection: sqlite3.Connection) -> None:
+    '''MySQL date functions used by the analysis scripts.'''
+    connection.create_function('DAYOFWEEK', 1, lambda ts: None if ts is None else (_parse_ts(ts).weekday() + 1) % 7 + 1)
+    connection.create_function('WEEKDAY', 1, lambda ts: None if ts is None else _parse_ts(ts).weekday())
+    connection.create_function('HOUR', 1, lambda ts: None if ts is None else _parse_ts(ts).hour)
+    connection.create_function('DAYOFMONTH', 1, lambda ts: None if ts is None else _parse_ts(ts).day)
+    connection.create_function('MONTH', 1, lambda ts: None if ts is None else _parse_ts(ts).month)
+    connection.create_function('YEAR', 1, lambda ts: None if ts is None else _parse_ts(ts).year)
+    # only the specifiers MySQL shares with strftime (%Y, %m, %d, %H)
+    connection.create_function('DATE_FORMAT', 2, lambda ts, format: None if ts is None else _parse_ts(ts).strftime(format))
+
+# ----- R E S P O N S E - F O R M A T S ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def encode(columns: list, rows: list, accept: str) -> tuple:
+    '''Returns (content type, body) of the result in the first format of {accept} that is supported.'''
+    accepted = [part.split(';')[0].strip() for part in (accept or JSON).split(',')]
+    for content_type in accepted:
+        if content_type == COLUMNS_JSON:
+            return content_type, json.dumps({ 'columns': columns, 'data': [list(values) for values in zip(*rows)] or [[] for _ in columns] }).encode()
+        if content_type == NDJSON:
+            return content_type, '\n'.join(json.dumps(dict(zip(columns, row))) for row in rows).encode()
+        if content_type == ARROW and pyarrow is not None:
+            table = pyarrow.table({ column: list(values) for column, values in zip(columns, zip(*rows) if rows else [[] for _ in columns]) })
+            sink = io.BytesIO()
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return content_type, sink.getvalue()
+    return JSON, json.dumps([dict(zip(columns, row)) for row in rows]).encode()
+
+# ----- S E R V E R ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+class LocalBackend(object):
+    '''
+        Runs the stand-in web app in a background thread.
+
+        ------ P A R A M E T E R S ------
+        :param host: str | optional
+        :param port: int | optional
+            0 picks a free port
+        :param db: str | optional
+            SQLite database file, ':memory:' keeps everything in memory
+        :param api_key: str | optional
+            auth_key the sql endpoint accepts
+        :param latency: float | optional
+            Artificial latency of every request in seconds
+        :param jitter: float | optional
+            Uniform random jitter added to the latency in seconds
+        :param seed: int | optional
+            Seed of the jitter
+
+        ------ E X A M P L E ------
+        > with LocalBackend(port=0, latency=0.01) as backend:
+        >     requests.get(f'{backend.api_url}/saveUseCaseData?identifier=abc&use_case=Mensa')
+        >     backend.count('pepper_use_case_table')
+        1
+    '''
+
+    def __init__(
+        self, host: str='127.0.0.1', port: int=3000, db: str=':memory:', api_key: str='sandbox',
+        latency: float=0.0, jitter: float=0.0, seed: int=None
+    ):
+        self.db, self.api_key = db, api_key
+        self.latency, self.jitter = latency, jitter
+        self._random = random.Random(seed)
+
+        self.connection = sqlite3.connect(db, check_same_thread=False)
+        self.lock = threading.Lock()
+        _register_functions(self.connection)
+        self._create_tables()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        '''Base url for the analysis Client (Client(url=...)).'''
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/docker-hbv-kms-http'
+
+    @property
+    def api_url(self) -> str:
+        '''Base url of the collector endpoints (BASE_URL of the dummy data sender).'''
+        return f'{self.url}/api/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.connection.close()
+
+    def count(self, table: str) -> int:
+        with self.lock:
+            return self.connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def _create_tables(self) -> None:
+        with self.lock, self.connection:
+            for table, columns in TABLES.items():
+                definition = ', '.join(f'{column} {dtype}' for column, dtype in columns.items())
+                self.connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} (data_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    f'{definition}, ts TEXT DEFAULT CURRENT_TIMESTAMP)'
+                )
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_ts ON {table} (ts)')
+
+    def _delay(self) -> None:
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ----- endpoints -----
+
+    def sql(self, params: dict) -> tuple:
+        '''Returns (status, columns, rows or message) like the sql endpoint of the web app.'''
+        if params.get('auth_key') != self.api_key:
+            return 401, None, 'Unauthorized!'
+        if params.get('subject') == 'test':
+            return 200, None, { 'message': 'Connection established!' }
+        if params.get('subject') != 'sql_query':
+            return 400, None, 'Unknown subject!'
+
+        query = params.get('query_str', '')
+        if not is_allowed(query):
+            return 400, None, 'Invalid SQL command!'
+        try:
+            with self.lock:
+                cursor = self.connection.execute(translate_query(query))
+                columns = [column[0] for column in cursor.description]
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            return 400, None, f'Invalid SQL command! {e}'
+
+        ts_columns = [i for i, column in enumerate(columns) if column == 'ts' or column.endswith('(ts)')]
+        if ts_columns and rows:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for i in ts_columns:
+                    if isinstance(row[i], str) and _SQLITE_TS.match(row[i]):
+                        row[i] = f'{row[i].replace(" ", "T")}.000Z'
+        return 200, columns, rows
+
+    def save(self, endpoint: str, params: dict) -> tuple:
+        '''Inserts one record of a collector endpoint, returns (status, message).'''
+        table = ENDPOINTS[endpoint][1]
+        columns = [column for column in TABLES[table] if column in params]
+        if 'identifier' not in columns:
+            return 400, 'Missing identifier!'
+        with self.lock, self.connection:
+            self.connection.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+                [params[column] for column in columns]
+            )
+        return 200, 'Success!'
+
+    def save_many(self, endpoint: str, payload) -> tuple:
+        '''Inserts the records of a bulk request of a collector endpoint in one transaction, returns (status, message).'''
+        records = payload.get('records') if isinstance(payload, dict) else None
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            return 400, 'Expected { "records": [...] }!'
+        if not all('identifier' in record for record in records):
+            return 400, 'Missing identifier!'
+
+        table = ENDPOINTS[endpoint][1]
+        columns = list(TABLES[table])
+        rows = [
+            [
+                json.dumps(value) if isinstance(value, (dict, list)) else value
+                for value in (record.get(column) for column in columns)
+            ] for record in records
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})', rows
+            )
+        return 200, { 'message': 'Success!', 'inserted': len(rows) }
+
+    def _handler(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def _dispatch(self, method: str) -> None:
+                url = urlsplit(self.path)
+                params = { key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items() }
+                payload = None
+                if method == 'POST':
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                    if self.headers.get('Content-Type', '').startswith(JSON):
+                        try:
+                            payload = json.loads(body)
+                        except ValueError:
+                            return self._send(400, 'Invalid json!')
+                    else:
+                        params.update({ key: values[-1] for key, values in parse_qs(body, keep_blank_values=True).items() })
+
+                backend._delay()
+                if not url.path.startswith(PREFIX):
+                    return self._send(404, 'Not found!')
+
+                endpoint = url.path[len(PREFIX):].strip('/')
+                if endpoint == 'sql' and method == 'POST':
+                    status, columns, result = backend.sql(params)
+                    if columns is None:
+                        return self._send(status, result)
+                    content_type, body = encode(columns, result, self.headers.get('Accept'))
+                    return self._send(status, body, content_type)
+                if endpoint in ENDPOINTS and ENDPOINTS[endpoint][0] == method:
+                    return self._send(*backend.save(endpoint, params))
+                if endpoint.endswith('/bulk') and endpoint[:-len('/bulk')] in ENDPOINTS and method == 'POST':
+                    return self._send(*backend.save_many(endpoint[:-len('/bulk')], payload))
+                return self._send(404, 'Not found!')
+
+            def _send(self, status: int, body, content_type: str=None) -> None:
+                if not isinstance(body, bytes):
+                    if isinstance(body, (dict, list)):
+                        body, content_type = json.dumps(body).encode(), JSON
+                    else:
+                        body, content_type = str(body).encode(), 'text/plain; charset=utf-8'
+                if 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 1024:
+                    body = gzip.compress(body, compresslevel=6)
+                    self.send_response(status)
+                    self.send_header('Content-Encoding', 'gzip')
+                else:
+                    self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+# ----- M A I N ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+def main() -> None:
+    '''Main function'''
+    parser = argparse.ArgumentParser(description='Local stand-in of the web app for offline benchmarking')
+    parser.add_argument('--host', dest='host', default='127.0.0.1', help='interface to listen on | default: 127.0.0.1')
+    parser.add_argument('--port', type=int, dest='port', default=3000, help='port to listen on | default: 3000')
+    parser.add_argument('--db', dest='db', default=':memory:', help='SQLite database file | default: :memory:')
+    parser.add_argument('--api-key', dest='api_key', default='sandbox', help='auth_key accepted by the sql endpoint | default: sandbox')
+    parser.add_argument('--latency', type=float, dest='latency', default=0, help='artificial latency added to every request in ms | default: 0')
+    parser.add_argument('--jitter', type=float, dest='jitter', default=0, help='uniform random jitter added to the latency in ms | default: 0')
+    args = parser.parse_args()
+
+    backend = LocalBackend(
+        host=args.host, port=args.port, db=args.db, api_key=args.api_key,
+        latency=args.latency / 1000, jitter=args.jitter / 1000
+    )
+    log.info(f'Serving {backend.api_url} (db: {args.db}, latency: {args.latency}ms)')
+    try:
+        backend.serve_forever()
+    except KeyboardInterrupt:
+        log.info('Stopped!')
+
+
+if __name__ == '__main__':
+    '''Function to mark standalone script'''
+    main()
+
+
+# ----- E O F ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----